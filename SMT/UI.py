@@ -1,25 +1,320 @@
 #file:c:\Codes\OSCproj\SMT\UI.py
+import os
+import struct
 import sys
-from PySide6.QtWidgets import QApplication, QMainWindow, QPushButton, QLabel, QVBoxLayout, QWidget, QStackedWidget, QListWidget, QListWidgetItem
+import threading
+import time
+
+from PySide6.QtCore import QObject, QThread, QTimer, Qt, Signal, Slot
+from PySide6.QtGui import QImage, QPixmap
+from PySide6.QtWidgets import (QApplication, QMainWindow, QPushButton, QLabel, QVBoxLayout, QHBoxLayout, QGridLayout,
+                               QWidget, QStackedWidget, QListWidget, QListWidgetItem, QComboBox, QCheckBox,
+                               QProgressBar, QFileDialog, QPlainTextEdit, QLineEdit)
+from serial.tools import list_ports
+
+from uart_connector import UARTConnector
+from protocol import (Batch, FRAME_STATUS, FRAME_TELEMETRY, STATUS_FORMAT, STATUS_MOVING, STATUS_AIR_PUMP, STATUS_UP_LIGHT,
+                      STATUS_DOWN_LIGHT, STATUS_HOMED, OP_MOVE_XY, OP_MOVE_Z, OP_MOVE_R, OP_AIR_PUMP, OP_UP_LIGHT,
+                      OP_DOWN_LIGHT, OP_HOME)
+from telemetry import TelemetryBuffer, status_position
+from calibration import Calibration
+
+# 贴片机操作界面
+# 串口只在 ControllerWorker 所在的线程里读写，界面线程通过信号发出请求、接收结果，
+# 任何串口等待都不会卡住界面。控制器的状态帧在串口读取线程里到达，频率可能很高
+# （遥测打开时每 TELEMETRY_INTERVAL_MS 一条），这里只记下最新的一帧，由定时器按 STATUS_REFRESH_HZ 转成信号，
+# 相机预览同样在单独的线程里按 PREVIEW_FPS 取帧、缩小后送给界面。
+
+STATUS_REFRESH_HZ = 30
+PREVIEW_FPS = 10
+PREVIEW_WIDTH = 480
+SIM_PORT = "模拟控制器"
+JOG_STEPS = (0.1, 1.0, 10.0)
+TELEMETRY_INTERVAL_MS = 20
+STATUS_SIZE = struct.calcsize(STATUS_FORMAT)
+
+
+class ControllerWorker(QObject):
+    """
+    独占 UARTConnector 的工作对象，移到 QThread 后运行，所有槽都在该线程中执行
+
+    作业在单独的 Python 线程中运行，工作线程的事件循环保持空闲，停止请求和状态刷新不受影响。
+    """
+
+    connected = Signal(bool, str)
+    status_changed = Signal(tuple)
+    telemetry_changed = Signal(tuple)
+    log = Signal(str)
+    job_progress = Signal(int, int)
+    job_finished = Signal(str)
+
+    def __init__(self):
+        super().__init__()
+        self.uart = None
+        self.sim = None
+        self.latest = None       # 读取线程写入的最新状态，定时器取走
+        self.emitted = None
+        self.telemetry = TelemetryBuffer()
+        self.telemetry_emitted = 0
+        self.calibration = Calibration()  # 连接时从控制器读取，位置显示按它换算
+        self.timer = None
+        self.runner = None
+        self.job_thread = None
+
+    @Slot()
+    def start(self):
+        """线程启动后调用，定时器必须在工作线程中创建"""
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self._flush_status)
+        self.timer.start(int(1000 / STATUS_REFRESH_HZ))
+
+    @Slot()
+    def stop(self):
+        """结束线程前调用，定时器只能在所属线程中停止"""
+        self.close_port()
+        self.timer.stop()
+
+    def _on_frame(self, seq, frame_type, payload):
+        # 串口读取线程中调用，只保存，不发信号；遥测记录的开头就是一帧状态
+        if frame_type == FRAME_STATUS or frame_type == FRAME_TELEMETRY:
+            self.latest = payload[:STATUS_SIZE]
+
+    def _flush_status(self):
+        latest = self.latest
+        if latest is not None and latest != self.emitted:
+            self.emitted = latest
+            self.status_changed.emit(struct.unpack(STATUS_FORMAT, latest))
+        telemetry = self.telemetry
+        if telemetry.count != self.telemetry_emitted:
+            self.telemetry_emitted = telemetry.count
+            record = telemetry.latest()
+            self.telemetry_changed.emit((telemetry.rate(), int(record['loop_avg']), int(record['loop_max']),
+                                         telemetry.lost, telemetry.coalesced))
+
+    @Slot(bool)
+    def set_telemetry(self, on):
+        """开关控制器遥测，开启后位置显示按遥测周期刷新，并显示控制器的调度延迟"""
+        if self.uart is None:
+            return
+        try:
+            if on:
+                self.telemetry.attach(self.uart, TELEMETRY_INTERVAL_MS)
+            else:
+                self.telemetry.detach()
+        except (TimeoutError, ConnectionError) as e:
+            self.log.emit(str(e))
+
+    @Slot(str)
+    def open_port(self, port):
+        self.close_port()
+        if port == SIM_PORT:
+            import tty
+            from sim_controller import SimController
+            master, slave = os.openpty()
+            tty.setraw(master)
+            self.sim = SimController(master)
+            port = os.ttyname(slave)
+        uart = UARTConnector(port)
+        uart.connect()
+        if not uart.serial_connection or not uart.serial_connection.is_open:
+            self.connected.emit(False, f"无法打开 {port}")
+            return
+        uart.subscribe(self._on_frame)
+        self.uart = uart
+        try:
+            self.calibration = uart.request_calibration()
+            self.latest = struct.pack(STATUS_FORMAT, *uart.request_status())
+        except TimeoutError:
+            self.log.emit("控制器无应答")
+        self.connected.emit(True, port)
+
+    @Slot()
+    def close_port(self):
+        if self.runner is not None:
+            self.runner.cancel()
+        job_thread = self.job_thread
+        if job_thread is not None:
+            job_thread.join()
+        if self.uart is not None:
+            self.telemetry.detach()
+            self.uart.unsubscribe(self._on_frame)
+            self.uart.disconnect()
+            self.uart = None
+            self.connected.emit(False, "已断开")
+        if self.sim is not None:
+            self.sim.stop()
+            self.sim = None
+
+    def _send(self, batch):
+        if self.uart is None:
+            self.log.emit("未连接")
+            return
+        if self.job_thread is not None:
+            self.log.emit("作业进行中")
+            return
+        try:
+            self.uart.send_batch(batch)
+        except (TimeoutError, ConnectionError) as e:
+            self.log.emit(str(e))
+
+    @Slot(str, float)
+    def jog(self, axis, distance):
+        if axis == 'X':
+            batch = Batch().add(OP_MOVE_XY, distance, 0.0, 0.0)
+        elif axis == 'Y':
+            batch = Batch().add(OP_MOVE_XY, 0.0, distance, 0.0)
+        elif axis == 'Z':
+            batch = Batch().add(OP_MOVE_Z, distance)
+        else:
+            batch = Batch().add(OP_MOVE_R, distance)
+        self._send(batch)
+
+    @Slot(int, bool)
+    def set_output(self, op, on):
+        self._send(Batch().add(op, 1 if on else 0))
+
+    @Slot()
+    def home(self):
+        # 应答在控制器收下命令时就返回，回零过程通过状态帧显示
+        self._send(Batch().add(OP_HOME, 0))
+
+    @Slot(str, bool)
+    def start_job(self, path, optimize):
+        from job_runner import JobRunner, load_centroids, normalize_board, assign_feeders
+
+        if self.uart is None or self.job_thread is not None:
+            return
+        try:
+            parts = normalize_board([part for part in load_centroids(path) if part.top])
+        except (OSError, ValueError) as e:
+            self.job_finished.emit(f"读取失败: {e}")
+            return
+        parts = [part for part in parts if not part.designator.upper().startswith('FID')]
+        if optimize:
+            from optimizer import feeder_slots, optimize as optimize_order
+            placements, skipped = assign_feeders(parts, feeder_slots(parts))
+            placements = optimize_order(placements)
+        else:
+            placements, skipped = assign_feeders(parts)
+        if skipped:
+            self.log.emit(f"料槽不足, 跳过 {len(skipped)} 个元件")
+        self.runner = JobRunner(self.uart)
+        self.job_thread = threading.Thread(target=self._run_job, args=(placements,), daemon=True)
+        self.job_thread.start()
+
+    def _run_job(self, placements):
+        try:
+            if not self.runner.sync_position():
+                self.log.emit("控制器未回零，按当前位置作为原点")
+            stats = self.runner.run(placements, self.job_progress.emit)
+            message = f"完成 {stats.parts} 个元件, 用时 {stats.elapsed:.1f} s, {stats.parts_per_hour:.0f} 个/小时"
+        except (TimeoutError, ConnectionError) as e:
+            message = f"作业中断: {e}"
+        self.runner = None
+        self.job_thread = None
+        self.job_finished.emit(message)
+
+    @Slot()
+    def stop_job(self):
+        if self.runner is not None:
+            self.runner.cancel()
+
+
+class PreviewWorker(QObject):
+    """相机预览：按 PREVIEW_FPS 取帧，缩小到 PREVIEW_WIDTH 后发给界面，缓冲区重复使用"""
+
+    frame_ready = Signal(QImage)
+    log = Signal(str)
+
+    def __init__(self):
+        super().__init__()
+        self.source = None
+        self.timer = None
+        self.frame = None
+        self.small = None
+
+    @Slot(str)
+    def open_source(self, spec):
+        from vision import open_source
+
+        self.close_source()
+        try:
+            self.source = open_source(spec)
+        except OSError as e:
+            self.log.emit(str(e))
+            return
+        self.frame = None
+        self.small = None
+        if self.timer is None:
+            self.timer = QTimer(self)
+            self.timer.timeout.connect(self._grab)
+        self.timer.start(int(1000 / PREVIEW_FPS))
+
+    @Slot()
+    def close_source(self):
+        if self.timer is not None:
+            self.timer.stop()
+        if self.source is not None:
+            self.source.close()
+            self.source = None
+
+    def _grab(self):
+        import cv2
+
+        try:
+            self.frame = self.source.read(self.frame)
+        except (OSError, EOFError) as e:
+            self.log.emit(f"相机: {e}")
+            self.close_source()
+            return
+        height, width = self.frame.shape
+        size = (PREVIEW_WIDTH, max(1, height * PREVIEW_WIDTH // width))
+        self.small = cv2.resize(self.frame, size, dst=self.small, interpolation=cv2.INTER_AREA)
+        # QImage 只引用缓冲区，下一帧会覆盖它，发出前复制一份
+        image = QImage(self.small.data, size[0], size[1], self.small.strides[0], QImage.Format_Grayscale8)
+        self.frame_ready.emit(image.copy())
+
 
 class MainWindow(QMainWindow):
+    open_port = Signal(str)
+    close_port = Signal()
+    set_telemetry = Signal(bool)
+    shutdown = Signal()
+    jog = Signal(str, float)
+    set_output = Signal(int, bool)
+    home = Signal()
+    start_job = Signal(str, bool)
+    stop_job = Signal()
+    open_camera = Signal(str)
+    close_camera = Signal()
+
     def __init__(self):
         super().__init__()
 
-        self.setWindowTitle("PySide6 多界面示例")
-        self.setGeometry(100, 100, 600, 400)
+        self.setWindowTitle("SMT 贴片机")
+        self.setGeometry(100, 100, 900, 600)
+
+        # 串口与相机各一个工作线程
+        self.worker_thread = QThread(self)
+        self.worker = ControllerWorker()
+        self.worker.moveToThread(self.worker_thread)
+        self.worker_thread.started.connect(self.worker.start)
+        self.preview_thread = QThread(self)
+        self.preview = PreviewWorker()
+        self.preview.moveToThread(self.preview_thread)
 
         # 创建一个 QStackedWidget 来管理多个界面
         self.stacked_widget = QStackedWidget()
 
         # 创建一个 QListWidget 作为目录
         self.directory_list = QListWidget()
+        self.directory_list.setMaximumWidth(120)
         self.directory_list.currentRowChanged.connect(self.display_page)
 
         # 创建各个界面
-        self.page1 = self.create_page1()
-        self.page2 = self.create_page2()
-        self.page3 = self.create_page3()
+        self.page1 = self.create_control_page()
+        self.page2 = self.create_job_page()
+        self.page3 = self.create_camera_page()
 
         # 将界面添加到 QStackedWidget
         self.stacked_widget.addWidget(self.page1)
@@ -27,63 +322,269 @@ class MainWindow(QMainWindow):
         self.stacked_widget.addWidget(self.page3)
 
         # 将目录项添加到 QListWidget
-        self.directory_list.addItem(QListWidgetItem("界面1"))
-        self.directory_list.addItem(QListWidgetItem("界面2"))
-        self.directory_list.addItem(QListWidgetItem("界面3"))
+        self.directory_list.addItem(QListWidgetItem("手动控制"))
+        self.directory_list.addItem(QListWidgetItem("贴片作业"))
+        self.directory_list.addItem(QListWidgetItem("相机"))
 
-        # 设置主布局
+        # 设置主布局：左侧目录，右侧页面，底部日志
+        self.log_view = QPlainTextEdit()
+        self.log_view.setReadOnly(True)
+        self.log_view.setMaximumBlockCount(500)
+        self.log_view.setMaximumHeight(120)
+        body = QHBoxLayout()
+        body.addWidget(self.directory_list)
+        body.addWidget(self.stacked_widget)
         main_layout = QVBoxLayout()
-        main_layout.addWidget(self.directory_list)
-        main_layout.addWidget(self.stacked_widget)
+        main_layout.addLayout(self.create_connection_bar())
+        main_layout.addLayout(body)
+        main_layout.addWidget(self.log_view)
 
         container = QWidget()
         container.setLayout(main_layout)
         self.setCentralWidget(container)
 
-    def create_page1(self):
+        # 界面 -> 工作线程
+        self.open_port.connect(self.worker.open_port)
+        self.close_port.connect(self.worker.close_port)
+        self.set_telemetry.connect(self.worker.set_telemetry)
+        self.shutdown.connect(self.worker.stop)
+        self.jog.connect(self.worker.jog)
+        self.set_output.connect(self.worker.set_output)
+        self.home.connect(self.worker.home)
+        self.start_job.connect(self.worker.start_job)
+        self.stop_job.connect(self.worker.stop_job)
+        self.open_camera.connect(self.preview.open_source)
+        self.close_camera.connect(self.preview.close_source)
+        # 工作线程 -> 界面
+        self.worker.connected.connect(self.on_connected)
+        self.worker.status_changed.connect(self.on_status)
+        self.worker.telemetry_changed.connect(self.on_telemetry)
+        self.worker.log.connect(self.append_log)
+        self.worker.job_progress.connect(self.on_job_progress)
+        self.worker.job_finished.connect(self.on_job_finished)
+        self.preview.frame_ready.connect(self.on_frame)
+        self.preview.log.connect(self.append_log)
+
+        self.worker_thread.start()
+        self.preview_thread.start()
+        self.set_connected(False)
+
+    def create_connection_bar(self):
+        layout = QHBoxLayout()
+        self.port_box = QComboBox()
+        self.port_box.setEditable(True)
+        self.port_box.addItems([port.device for port in list_ports.comports()])
+        if hasattr(os, 'openpty'):
+            self.port_box.addItem(SIM_PORT)
+        self.connect_button = QPushButton("连接")
+        self.connect_button.clicked.connect(self.toggle_connection)
+        self.state_label = QLabel()
+        self.telemetry_box = QCheckBox("遥测")
+        self.telemetry_box.clicked.connect(self.set_telemetry.emit)
+        self.telemetry_label = QLabel()
+        self.position_label = QLabel()
+        self.position_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        layout.addWidget(QLabel("串口"))
+        layout.addWidget(self.port_box)
+        layout.addWidget(self.connect_button)
+        layout.addWidget(self.state_label)
+        layout.addWidget(self.telemetry_box)
+        layout.addWidget(self.telemetry_label)
+        layout.addStretch()
+        layout.addWidget(self.position_label)
+        return layout
+
+    def create_control_page(self):
         page = QWidget()
         layout = QVBoxLayout()
 
-        label = QLabel("这是界面1", page)
-        button = QPushButton("按钮1", page)
-        button.clicked.connect(lambda: self.label.setText("按钮1已点击"))
+        step_row = QHBoxLayout()
+        step_row.addWidget(QLabel("步距"))
+        self.step_box = QComboBox()
+        self.step_box.addItems([f"{step:g}" for step in JOG_STEPS])
+        self.step_box.setCurrentIndex(1)
+        step_row.addWidget(self.step_box)
+        home_button = QPushButton("回零", page)
+        home_button.clicked.connect(self.home.emit)
+        step_row.addWidget(home_button)
+        step_row.addStretch()
+
+        # 点动按钮：方向键布局的 XY，右侧一列 Z 与 R
+        pad = QGridLayout()
+        for text, axis, sign, row, column in (("Y+", 'Y', 1, 0, 1), ("X-", 'X', -1, 1, 0), ("X+", 'X', 1, 1, 2),
+                                              ("Y-", 'Y', -1, 2, 1), ("Z+", 'Z', 1, 0, 4), ("Z-", 'Z', -1, 2, 4),
+                                              ("R+", 'R', 1, 0, 5), ("R-", 'R', -1, 2, 5)):
+            button = QPushButton(text, page)
+            button.setFixedSize(60, 40)
+            button.clicked.connect(lambda _=False, a=axis, s=sign: self.jog.emit(a, s * float(self.step_box.currentText())))
+            pad.addWidget(button, row, column)
+
+        outputs = QHBoxLayout()
+        self.output_boxes = {}
+        for text, op, flag in (("气泵", OP_AIR_PUMP, STATUS_AIR_PUMP), ("仰视灯", OP_UP_LIGHT, STATUS_UP_LIGHT),
+                               ("俯视灯", OP_DOWN_LIGHT, STATUS_DOWN_LIGHT)):
+            box = QCheckBox(text, page)
+            box.clicked.connect(lambda checked, o=op: self.set_output.emit(o, checked))
+            outputs.addWidget(box)
+            self.output_boxes[flag] = box
+        outputs.addStretch()
 
-        layout.addWidget(label)
-        layout.addWidget(button)
+        layout.addLayout(step_row)
+        layout.addLayout(pad)
+        layout.addLayout(outputs)
+        layout.addStretch()
         page.setLayout(layout)
         return page
 
-    def create_page2(self):
+    def create_job_page(self):
         page = QWidget()
         layout = QVBoxLayout()
 
-        label = QLabel("这是界面2", page)
-        button = QPushButton("按钮2", page)
-        button.clicked.connect(lambda: self.label.setText("按钮2已点击"))
+        file_row = QHBoxLayout()
+        self.job_path = QLineEdit(page)
+        browse = QPushButton("选择坐标文件", page)
+        browse.clicked.connect(self.browse_job)
+        file_row.addWidget(self.job_path)
+        file_row.addWidget(browse)
 
-        layout.addWidget(label)
-        layout.addWidget(button)
+        self.optimize_box = QCheckBox("优化贴装顺序", page)
+        self.optimize_box.setChecked(True)
+        buttons = QHBoxLayout()
+        self.start_button = QPushButton("开始", page)
+        self.start_button.clicked.connect(self.on_start_job)
+        self.stop_button = QPushButton("停止", page)
+        self.stop_button.clicked.connect(self.stop_job.emit)
+        self.stop_button.setEnabled(False)
+        buttons.addWidget(self.start_button)
+        buttons.addWidget(self.stop_button)
+        buttons.addStretch()
+
+        self.progress_bar = QProgressBar(page)
+        self.job_label = QLabel(page)
+
+        layout.addLayout(file_row)
+        layout.addWidget(self.optimize_box)
+        layout.addLayout(buttons)
+        layout.addWidget(self.progress_bar)
+        layout.addWidget(self.job_label)
+        layout.addStretch()
         page.setLayout(layout)
         return page
 
-    def create_page3(self):
+    def create_camera_page(self):
         page = QWidget()
         layout = QVBoxLayout()
 
-        label = QLabel("这是界面3", page)
-        button = QPushButton("按钮3", page)
-        button.clicked.connect(lambda: self.label.setText("按钮3已点击"))
+        row = QHBoxLayout()
+        self.camera_box = QComboBox(page)
+        self.camera_box.setEditable(True)
+        self.camera_box.addItems(["0", "1"])
+        start = QPushButton("打开", page)
+        start.clicked.connect(lambda: self.open_camera.emit(self.camera_box.currentText()))
+        stop = QPushButton("关闭", page)
+        stop.clicked.connect(self.close_camera.emit)
+        row.addWidget(QLabel("相机编号或文件"))
+        row.addWidget(self.camera_box)
+        row.addWidget(start)
+        row.addWidget(stop)
+        row.addStretch()
 
-        layout.addWidget(label)
-        layout.addWidget(button)
+        self.preview_label = QLabel(page)
+        self.preview_label.setAlignment(Qt.AlignCenter)
+        self.preview_label.setMinimumSize(PREVIEW_WIDTH, PREVIEW_WIDTH * 3 // 4)
+
+        layout.addLayout(row)
+        layout.addWidget(self.preview_label)
         page.setLayout(layout)
         return page
 
     def display_page(self, index):
         self.stacked_widget.setCurrentIndex(index)
 
+    def set_connected(self, connected):
+        self.connect_button.setText("断开" if connected else "连接")
+        self.page1.setEnabled(connected)
+        self.start_button.setEnabled(connected)
+        self.telemetry_box.setEnabled(connected)
+        if not connected:
+            self.telemetry_box.setChecked(False)
+            self.telemetry_label.clear()
+
+    def toggle_connection(self):
+        if self.connect_button.text() == "连接":
+            self.connect_button.setEnabled(False)
+            self.open_port.emit(self.port_box.currentText())
+        else:
+            self.close_port.emit()
+
+    def browse_job(self):
+        path, _ = QFileDialog.getOpenFileName(self, "选择坐标文件", "", "坐标文件 (*.csv *.pos *.txt);;所有文件 (*)")
+        if path:
+            self.job_path.setText(path)
+
+    def on_start_job(self):
+        if not self.job_path.text():
+            self.append_log("请先选择坐标文件")
+            return
+        self.start_button.setEnabled(False)
+        self.stop_button.setEnabled(True)
+        self.page1.setEnabled(False)
+        self.progress_bar.setValue(0)
+        self.start_job.emit(self.job_path.text(), self.optimize_box.isChecked())
+
+    @Slot(bool, str)
+    def on_connected(self, connected, message):
+        self.connect_button.setEnabled(True)
+        self.set_connected(connected)
+        self.state_label.setText(message)
+
+    @Slot(tuple)
+    def on_status(self, status):
+        x, y, z, r = status_position(status, self.worker.calibration)
+        flags = status[0]
+        self.position_label.setText(f"X {x:8.3f}  Y {y:8.3f}  Z {z:7.3f}  R {r:7.2f}  "
+                                    f"{'运动中' if flags & STATUS_MOVING else '空闲'}  队列 {status[1]}  "
+                                    f"{'已回零' if flags & STATUS_HOMED else '未回零'}")
+        for flag, box in self.output_boxes.items():
+            box.setChecked(bool(flags & flag))
+
+    @Slot(tuple)
+    def on_telemetry(self, telemetry):
+        rate, loop_avg, loop_max, lost, coalesced = telemetry
+        self.telemetry_label.setText(f"{rate:.0f} Hz  调度 {loop_avg}/{loop_max} us  丢失 {lost}  合并 {coalesced}")
+
+    @Slot(int, int)
+    def on_job_progress(self, done, total):
+        self.progress_bar.setMaximum(total)
+        self.progress_bar.setValue(done)
+        self.job_label.setText(f"{done} / {total}")
+
+    @Slot(str)
+    def on_job_finished(self, message):
+        self.start_button.setEnabled(True)
+        self.stop_button.setEnabled(False)
+        self.page1.setEnabled(True)
+        self.append_log(message)
+
+    @Slot(QImage)
+    def on_frame(self, image):
+        self.preview_label.setPixmap(QPixmap.fromImage(image))
+
+    @Slot(str)
+    def append_log(self, text):
+        self.log_view.appendPlainText(time.strftime("%H:%M:%S ") + text)
+
+    def closeEvent(self, event):
+        # 先在各自线程里关闭串口和相机，再结束线程
+        self.close_camera.emit()
+        self.shutdown.emit()
+        for thread in (self.preview_thread, self.worker_thread):
+            thread.quit()
+            thread.wait()
+        super().closeEvent(event)
+
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
-    sys.exit(app.exec())
\ No newline at end of file
+    sys.exit(app.exec())
@@ -0,0 +1,377 @@
+#file:c:\Codes\OSCproj\SMT\cycle_sim.py
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import types
+
+# 离线节拍仿真
+# 直接导入固件 esp32/SMT/smtcontroller.py，用假的 machine/esp32 模块代替硬件，
+# 把 CoreXY/OneAxis 的步进后端换成 RecordingBackend：不发脉冲，只按步进间隔推进一个虚拟时钟，
+# 记录每一段移动的开始时刻、耗时、各电机步数和峰值步速。
+# 作业由 job_runner.JobRunner 生成与上位机完全相同的批量命令，逐条交给 SmtController 的命令表执行，
+# 前瞻队列、拐角速度、Z/R 跟随插补都走固件自己的代码，改动规划器后重新运行即可比较节拍。
+# 结果可以写成 CSV（逐段）和 JSON（汇总），--baseline 与上一次的 JSON 比较，节拍变慢时返回非零退出码，
+# 可以直接放进 Linux 上的 CI。
+
+FIRMWARE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'esp32', 'SMT')
+if FIRMWARE_DIR not in sys.path:
+    sys.path.insert(0, FIRMWARE_DIR)
+
+MOTORS = ('A', 'B', 'Z', 'R')
+
+
+class _Pin:
+    OUT = 1
+    IN = 0
+    PULL_UP = 1
+
+    def __init__(self, pin, mode=None, pull=None):
+        self.pin = pin
+        self.level = 1 if pull else 0
+
+    def init(self, *args, **kwargs):
+        pass
+
+    def value(self, level=None):
+        if level is None:
+            return self.level
+        self.level = level
+
+    def on(self):
+        self.level = 1
+
+    def off(self):
+        self.level = 0
+
+
+class _UART:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def write(self, data):
+        return len(data)
+
+    def any(self):
+        return 0
+
+    def read(self, *args):
+        return None
+
+    def txdone(self):
+        return True
+
+
+class _Timer:
+    PERIODIC = 1
+
+    def __init__(self, *args):
+        pass
+
+    def init(self, **kwargs):
+        raise RuntimeError("仿真中不使用 Timer 后端")
+
+    def deinit(self):
+        pass
+
+
+class _RMT:
+    def __init__(self, *args, **kwargs):
+        raise RuntimeError("仿真中不使用 RMT 后端")
+
+
+def install_mocks():
+    """在 sys.modules 中放入假的 machine 和 esp32 模块，必须在导入 smtcontroller 之前调用"""
+    if 'machine' not in sys.modules:
+        machine = types.ModuleType('machine')
+        machine.Pin = _Pin
+        machine.UART = _UART
+        machine.Timer = _Timer
+        machine.I2C = object
+        sys.modules['machine'] = machine
+    if 'esp32' not in sys.modules:
+        esp32 = types.ModuleType('esp32')
+        esp32.RMT = _RMT
+        sys.modules['esp32'] = esp32
+
+
+class VirtualClock:
+    """代替固件里的 time 模块，只提供 ticks_* 系列函数，时间由后端推进，单位微秒"""
+
+    def __init__(self):
+        self.now = 0
+
+    def ticks_us(self):
+        return self.now
+
+    def ticks_ms(self):
+        return self.now // 1000
+
+    @staticmethod
+    def ticks_add(ticks, delta):
+        return ticks + delta
+
+    @staticmethod
+    def ticks_diff(a, b):
+        return a - b
+
+    def sleep_ms(self, ms):
+        self.now += ms * 1000
+
+
+class RecordingBackend:
+    """
+    步进后端接口的仿真实现（见 stepgen.py），取完 StepStream 的全部间隔，按总时长推进虚拟时钟
+
+    concurrent=True 对应 RMT/Timer 后端：与真实后端一样等上一段结束、这一段开始后 commit 才返回，
+    多个轴同时运动；False 对应忙等后端：commit 返回时移动已经结束。
+    """
+
+    def __init__(self, sim, name, concurrent=True):
+        self.sim = sim
+        self.name = name
+        self.concurrent = concurrent
+        self.end = 0
+        self.pending = None
+
+    @property
+    def busy(self):
+        return self.end > self.sim.clock.now
+
+    def prepare(self, step_major, minors, stream, count, minor_counts):
+        if count <= 0:
+            self.pending = None
+            return
+        intervals = [stream.next() for _ in range(count)]
+        steps = {self.sim.motor_name(step_major): count}
+        for k in range(len(minors)):
+            steps[self.sim.motor_name(minors[k])] = minor_counts[k]
+        self.pending = (steps, sum(intervals), 1e6 / min(intervals))
+
+    def commit(self):
+        if self.pending is None:
+            return
+        steps, duration, peak = self.pending
+        self.pending = None
+        clock = self.sim.clock
+        start = max(clock.now, self.end)
+        self.end = start + duration
+        clock.now = start if self.concurrent else self.end
+        self.sim.record(self.name, start, duration, steps, peak)
+
+    def start(self, step_major, minors, stream, count, minor_counts):
+        self.prepare(step_major, minors, stream, count, minor_counts)
+        self.commit()
+
+    def wait(self):
+        clock = self.sim.clock
+        if self.end > clock.now:
+            clock.now = self.end
+
+    def deinit(self):
+        self.wait()
+
+
+class CycleSimulator:
+    """
+    用固件代码回放作业
+
+    :param concurrent: True 模拟 RMT 后端（XY/Z/R 各自独立运动），False 模拟忙等后端
+    """
+
+    def __init__(self, concurrent=True):
+        install_mocks()
+        import smtcontroller
+        import stepgen
+        from calibration import Calibration
+
+        self.clock = VirtualClock()
+        smtcontroller.time = self.clock
+        stepgen.time = self.clock
+        # 固件构造时会打印调试信息
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.controller = smtcontroller.SmtController()
+        controller = self.controller
+        # 不读取本机上可能存在的标定文件，始终用默认值，保证结果可复现
+        controller.calibration = Calibration()
+        controller.apply_calibration()
+        self.pins = {
+            id(controller.corexy.motar_a.step): 'A',
+            id(controller.corexy.motar_b.step): 'B',
+            id(controller.zaxis.motar.step): 'Z',
+            id(controller.raxis.motar.step): 'R',
+        }
+        controller.corexy.set_backend(RecordingBackend(self, 'xy', concurrent))
+        controller.zaxis.set_backend(RecordingBackend(self, 'z', concurrent))
+        controller.raxis.set_backend(RecordingBackend(self, 'r', concurrent))
+        self.moves = []
+        self.part = 0
+        self.part_times = []   # 每个元件结束的时刻，微秒
+
+    def motor_name(self, pin):
+        return self.pins[id(pin)]
+
+    def record(self, axis, start, duration, steps, peak):
+        major = max(steps, key=steps.get)
+        count = steps[major]
+        self.moves.append({
+            'part': self.part,
+            'axis': axis,
+            'start_ms': start / 1000,
+            'duration_ms': duration / 1000,
+            'steps': steps,
+            # DDA 下从轴的步速与步数成正比
+            'peak': {motor: peak * n / count for motor, n in steps.items()},
+        })
+
+    @property
+    def end(self):
+        """所有轴都停下的时刻，微秒"""
+        controller = self.controller
+        return max(self.clock.now, controller.corexy.backend.end, controller.zaxis.backend.end,
+                   controller.raxis.backend.end)
+
+    def execute(self, payload):
+        """按 action_task 的顺序执行一帧批量命令；drain_motion 在这里就是 flush_motion"""
+        from protocol import OPS, iter_ops
+        from smtcontroller import IMMEDIATE_COMMANDS, QUEUED_COMMANDS
+
+        controller = self.controller
+        commands = controller.commands
+        for op, args in iter_ops(payload):
+            name = OPS[op][0]
+            if name not in QUEUED_COMMANDS and name not in IMMEDIATE_COMMANDS:
+                controller.flush_motion()
+            commands[name](*args)
+
+    def run(self, runner, placements):
+        """
+        回放作业
+
+        :param runner: job_runner.JobRunner，只用它生成批量命令
+        :param placements: [(Part, 料槽号), ...]
+        """
+        for index, (part, feeder) in enumerate(placements):
+            self.part = index + 1
+            self.execute(runner.part_batch(part, feeder).payload)
+            self.part_times.append(self.end)
+        self.controller.flush_motion()
+
+    def summary(self):
+        total = self.end / 1e6
+        parts = len(self.part_times)
+        durations = [(b - a) / 1e6 for a, b in zip([0] + self.part_times, self.part_times)]
+        peaks = {motor: max((move['peak'].get(motor, 0.0) for move in self.moves), default=0.0)
+                 for motor in MOTORS}
+        return {
+            'parts': parts,
+            'moves': len(self.moves),
+            'cycle_time_s': total,
+            'parts_per_hour': parts / total * 3600 if total > 0 else 0.0,
+            'part_time_s': {
+                'mean': sum(durations) / parts if parts else 0.0,
+                'min': min(durations, default=0.0),
+                'max': max(durations, default=0.0),
+            },
+            'peak_steps_per_sec': peaks,
+        }
+
+    def write_csv(self, path):
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['part', 'axis', 'start_ms', 'duration_ms']
+                            + [f'steps_{motor}' for motor in MOTORS] + [f'peak_{motor}' for motor in MOTORS])
+            for move in self.moves:
+                writer.writerow([move['part'], move['axis'], f"{move['start_ms']:.3f}", f"{move['duration_ms']:.3f}"]
+                                + [move['steps'].get(motor, 0) for motor in MOTORS]
+                                + [f"{move['peak'].get(motor, 0.0):.0f}" for motor in MOTORS])
+
+
+def compare(summary, baseline, tolerance):
+    """
+    与基准结果比较
+
+    :param tolerance: 允许的节拍变慢比例，例如 0.005 表示 0.5%
+    :return: 是否在允许范围内
+    """
+    ok = True
+    for key in ('cycle_time_s', 'host_time_s'):
+        old = baseline.get(key)
+        new = summary[key]
+        if not old:
+            continue
+        change = (new - old) / old
+        print(f"{key}: {old:.3f} -> {new:.3f} ({change * 100:+.2f}%)")
+        # 主机耗时受机器负载影响，只作参考；节拍是确定的，超出容差即视为退步
+        if key == 'cycle_time_s' and change > tolerance:
+            ok = False
+    return ok
+
+
+def main():
+    from job_runner import JobRunner, load_centroids, normalize_board, assign_feeders, demo_centroids
+
+    parser = argparse.ArgumentParser(description="用固件规划代码离线估算贴片作业节拍")
+    parser.add_argument('file', nargs='?', help="坐标文件（KiCad / 嘉立创 EDA CSV）")
+    parser.add_argument('--demo', type=int, metavar='PARTS', help="改为用随机生成的作业")
+    parser.add_argument('--optimize', action='store_true', help="重新安排料槽和贴装顺序")
+    parser.add_argument('--feed', type=float, default=0.0, help="XY 进给速度 mm/s，0 为控制器默认值")
+    parser.add_argument('--backend', choices=('rmt', 'busy'), default='rmt',
+                        help="模拟的步进后端：rmt 各轴同时运动，busy 忙等（Z/R 跟随 XY 插补）")
+    parser.add_argument('--csv', help="逐段结果写入该 CSV 文件")
+    parser.add_argument('--json', help="汇总结果写入该 JSON 文件")
+    parser.add_argument('--baseline', help="与之前输出的 JSON 比较，节拍变慢超过容差时退出码为 1")
+    parser.add_argument('--tolerance', type=float, default=0.5, help="允许的节拍变慢，百分比")
+    args = parser.parse_args()
+
+    if args.demo:
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'demo.csv')
+            demo_centroids(path, args.demo)
+            parts = load_centroids(path)
+    elif args.file:
+        parts = load_centroids(args.file)
+    else:
+        parser.error("需要坐标文件或 --demo")
+    parts = normalize_board([part for part in parts if part.top and not part.designator.upper().startswith('FID')])
+    if args.optimize:
+        from optimizer import feeder_slots, optimize
+        placements, _ = assign_feeders(parts, feeder_slots(parts))
+        placements = optimize(placements)
+    else:
+        placements, _ = assign_feeders(parts)
+
+    sim = CycleSimulator(concurrent=args.backend == 'rmt')
+    start = time.perf_counter()
+    sim.run(JobRunner(None, args.feed), placements)
+    summary = sim.summary()
+    summary['host_time_s'] = time.perf_counter() - start
+    summary['backend'] = args.backend
+    summary['feed'] = args.feed
+
+    print(f"{summary['parts']} 个元件, {summary['moves']} 段移动, 步进后端 {args.backend}")
+    print(f"节拍 {summary['cycle_time_s']:.2f} s, {summary['parts_per_hour']:.0f} 个/小时, 每个元件 "
+          f"平均 {summary['part_time_s']['mean']:.3f} s 最长 {summary['part_time_s']['max']:.3f} s")
+    print("峰值步速: " + ", ".join(f"{motor} {rate:.0f}" for motor, rate in summary['peak_steps_per_sec'].items())
+          + " 步/秒")
+    print(f"本机规划耗时 {summary['host_time_s']:.2f} s")
+    if args.csv:
+        sim.write_csv(args.csv)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if not compare(summary, baseline, args.tolerance / 100):
+            print("节拍变慢，超出容差")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
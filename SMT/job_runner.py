@@ -0,0 +1,530 @@
+#file:c:\Codes\OSCproj\SMT\job_runner.py
+import argparse
+import csv
+import io
+import os
+import random
+import struct
+import tempfile
+import threading
+import time
+
+from uart_connector import UARTConnector
+from pipeline import PlacementPipeline
+from protocol import (Batch, FRAME_BATCH, FRAME_STATUS, FRAME_TELEMETRY, STATUS_FORMAT, STATUS_MOVING, STATUS_HOMED,
+                      OP_MOVE_XY, OP_MOVE_Z, OP_MOVE_XYZR, OP_AIR_PUMP, OP_DOWN_LIGHT, OP_HOME)
+from telemetry import status_position
+from calibration import Calibration
+from layout import (FEEDER_COUNT, CAMERA_POS, BOARD_ORIGIN, BOARD_SIZE, TRAVEL_Y, PICK_DEPTH, PLACE_DEPTH,
+                    feeder_position)
+
+# 贴片作业执行器
+# 读取 KiCad / 嘉立创 EDA 导出的坐标文件，把每个元件换算成一帧批量命令
+# （取料 → 安全通道 → 仰视相机 → 贴装），按控制器报告的待执行帧数连续下发，
+# 控制器手里始终有下一批命令，运动不会因为等待上位机而中断。
+
+# 坐标文件表头别名，统一到 designator/value/footprint/x/y/rotation/layer
+COLUMN_ALIASES = {
+    'designator': ('designator', 'ref', 'reference'),
+    'value': ('comment', 'val', 'value'),
+    'footprint': ('footprint', 'package'),
+    'x': ('mid x', 'posx', 'center-x(mm)', 'center x'),
+    'y': ('mid y', 'posy', 'center-y(mm)', 'center y'),
+    'rotation': ('rotation', 'rot'),
+    'layer': ('layer', 'side'),
+}
+
+
+class Part:
+    """坐标文件中的一个元件，坐标单位 mm，角度单位度"""
+
+    def __init__(self, designator, value, footprint, x, y, rotation, layer):
+        self.designator = designator
+        self.value = value
+        self.footprint = footprint
+        self.x = x
+        self.y = y
+        self.rotation = rotation
+        self.layer = layer
+
+    @property
+    def kind(self):
+        """同一种物料（同值同封装）放在同一个料槽里"""
+        return (self.value, self.footprint)
+
+    @property
+    def top(self):
+        return self.layer.lower() in ('top', 't', 'toplayer', 'f.cu', '')
+
+    def __repr__(self):
+        return f"Part({self.designator}, {self.value}, {self.footprint}, {self.x:.3f}, {self.y:.3f}, {self.rotation:.1f})"
+
+
+def _decode(raw):
+    # 嘉立创 EDA 标准版导出 UTF-16（带 BOM），专业版与 KiCad 为 UTF-8，老文件可能是 GBK
+    if raw.startswith((b'\xff\xfe', b'\xfe\xff')):
+        return raw.decode('utf-16')
+    for encoding in ('utf-8-sig', 'gbk'):
+        try:
+            return raw.decode(encoding)
+        except UnicodeDecodeError:
+            pass
+    return raw.decode('latin-1')
+
+
+def _length(text):
+    """解析带单位的长度，返回 mm"""
+    text = text.strip().lower()
+    if text.endswith('mm'):
+        return float(text[:-2])
+    if text.endswith('mil'):
+        return float(text[:-3]) * 0.0254
+    return float(text)
+
+
+def load_centroids(path):
+    """
+    读取坐标文件
+
+    :param path: KiCad .pos/.csv 或嘉立创 EDA 导出的 CSV
+    :return: Part 列表，保持文件中的顺序
+    """
+    with open(path, 'rb') as f:
+        text = _decode(f.read())
+    first = text.splitlines()[0] if text else ''
+    delimiter = '\t' if first.count('\t') > first.count(',') else ','
+    reader = csv.reader(io.StringIO(text), delimiter=delimiter)
+    header = None
+    columns = {}
+    parts = []
+    for row in reader:
+        row = [cell.strip().strip('"') for cell in row]
+        if not any(row) or row[0].startswith('#'):
+            continue
+        if header is None:
+            header = [cell.lower() for cell in row]
+            for key, aliases in COLUMN_ALIASES.items():
+                for index, name in enumerate(header):
+                    if name in aliases:
+                        columns[key] = index
+                        break
+            missing = {'designator', 'x', 'y'} - set(columns)
+            if missing:
+                raise ValueError(f"坐标文件缺少列: {', '.join(sorted(missing))}")
+            continue
+
+        def cell(key, default=''):
+            index = columns.get(key)
+            return row[index] if index is not None and index < len(row) else default
+
+        parts.append(Part(cell('designator'), cell('value'), cell('footprint'),
+                          _length(cell('x')), _length(cell('y')),
+                          float(cell('rotation', '0') or 0), cell('layer', 'top')))
+    return parts
+
+
+def assign_feeders(parts, feeders=None):
+    """
+    给每种物料分配料槽
+
+    :param parts: Part 列表
+    :param feeders: 已知的 {(值, 封装): 料槽号}，没有列出的物料按出现顺序依次分配空闲料槽
+    :return: ([(Part, 料槽号), ...], 因料槽不够而跳过的 Part 列表)
+    """
+    feeders = dict(feeders or {})
+    used = set(feeders.values())
+    placements = []
+    skipped = []
+    for part in parts:
+        feeder = feeders.get(part.kind)
+        if feeder is None:
+            free = [i for i in range(FEEDER_COUNT) if i not in used]
+            if not free:
+                skipped.append(part)
+                continue
+            feeder = free[0]
+            feeders[part.kind] = feeder
+            used.add(feeder)
+        placements.append((part, feeder))
+    return placements, skipped
+
+
+def normalize_board(parts):
+    """把元件坐标平移到以最左下角元件为原点，适用于 CAD 原点不在板角的文件"""
+    if not parts:
+        return parts
+    min_x = min(part.x for part in parts)
+    min_y = min(part.y for part in parts)
+    for part in parts:
+        part.x -= min_x
+        part.y -= min_y
+    return parts
+
+
+class JobStats:
+    """一次作业的统计结果，时间单位秒"""
+
+    def __init__(self, parts, frames, elapsed, idle, idle_count):
+        self.parts = parts
+        self.frames = frames
+        self.elapsed = elapsed
+        self.idle = idle              # 作业过程中控制器无事可做的总时间
+        self.idle_count = idle_count  # 空闲的次数
+
+    @property
+    def parts_per_hour(self):
+        return self.parts / self.elapsed * 3600 if self.elapsed > 0 else 0.0
+
+    def __repr__(self):
+        return (f"JobStats(parts={self.parts}, elapsed={self.elapsed:.2f}s, {self.parts_per_hour:.0f} parts/h, "
+                f"idle={self.idle:.2f}s x{self.idle_count})")
+
+
+class JobRunner:
+    """
+    把贴片作业流式下发给控制器
+
+    每个元件一帧；发送窗口由 UARTConnector.post_frame 按控制器报告的待执行帧数控制。
+    作业期间根据控制器的状态帧统计空闲时间：没有在运动、前瞻队列和待执行队列都为空，
+    说明控制器在等上位机。
+
+    vision 带仰视相机时每个元件拆成三帧：取料并飞到仰视相机 → 拍照后立即下发飞往贴装点的移动 →
+    图像处理与这段移动并行，算出补偿后下发贴装，由 pipeline.PlacementPipeline 分阶段执行。
+    """
+
+    def __init__(self, uart, feed_rate=0.0, board_origin=BOARD_ORIGIN, vision=None):
+        self.uart = uart
+        self.feed_rate = feed_rate     # 0 表示使用控制器的默认进给
+        self.board_origin = board_origin
+        self.vision = vision
+        self.board_transform = None    # Mark 点定位得到的 2x3 变换，None 表示按理论位置贴装
+        self.pipeline = None           # 最近一次视觉贴装的流水线，保留各阶段统计
+        self.calibration = Calibration()  # 控制器的标定数据，sync_position 时读取，之前为默认值
+        self.cancelled = False
+        # 上位机记录的贴片头位置，命令都是相对移动
+        self.x = 0.0
+        self.y = 0.0
+        self.r = 0.0
+        self.lock = threading.Lock()
+        self.running = False
+        self.idle_since = None
+        self.idle = 0.0
+        self.idle_count = 0
+
+    def _move_to(self, batch, x, y):
+        dx = x - self.x
+        dy = y - self.y
+        if dx or dy:
+            batch.add(OP_MOVE_XY, dx, dy, self.feed_rate)
+        self.x = x
+        self.y = y
+
+    def board_point(self, part):
+        """元件贴装点的机器坐标"""
+        x = self.board_origin[0] + part.x
+        y = self.board_origin[1] + part.y
+        if self.board_transform is not None:
+            m = self.board_transform
+            x, y = m[0, 0] * x + m[0, 1] * y + m[0, 2], m[1, 0] * x + m[1, 1] * y + m[1, 2]
+        return x, y
+
+    def pick_batch(self, part, feeder, batch=None):
+        """取料并飞到仰视相机上方，吸嘴同时转到贴装角度"""
+        batch = batch or Batch()
+        fx, fy = feeder_position(feeder)
+        self._move_to(batch, fx, fy)
+        batch.add(OP_MOVE_Z, -PICK_DEPTH)
+        batch.add(OP_AIR_PUMP, 1)
+        batch.add(OP_MOVE_Z, PICK_DEPTH)
+        self._move_to(batch, fx, TRAVEL_Y)
+        dr = (part.rotation - self.r + 180.0) % 360.0 - 180.0
+        batch.add(OP_MOVE_XYZR, CAMERA_POS[0] - self.x, CAMERA_POS[1] - self.y, 0.0, dr)
+        self.x, self.y = CAMERA_POS
+        self.r += dr
+        return batch
+
+    def travel_batch(self, part, batch=None):
+        """从相机飞往理论贴装点"""
+        batch = batch or Batch()
+        self._move_to(batch, *self.board_point(part))
+        return batch
+
+    def place_batch(self, correction=None, batch=None):
+        """
+        按视觉补偿微调后贴装
+
+        :param correction: Vision.part_correction 的结果 (dx, dy, dr)，None 表示不补偿
+        """
+        batch = batch or Batch()
+        if correction is not None and any(correction):
+            dx, dy, dr = correction
+            batch.add(OP_MOVE_XYZR, dx, dy, 0.0, dr)
+            self.x += dx
+            self.y += dy
+            self.r += dr
+        batch.add(OP_MOVE_Z, -PLACE_DEPTH)
+        batch.add(OP_AIR_PUMP, 0)
+        batch.add(OP_MOVE_Z, PLACE_DEPTH)
+        return batch
+
+    def part_batch(self, part, feeder):
+        """生成不经视觉补偿、贴装一个元件的批量命令"""
+        batch = self.pick_batch(part, feeder)
+        self.travel_batch(part, batch)
+        return self.place_batch(batch=batch)
+
+    def cancel(self):
+        """请求停止作业：已下发的元件贴完后 run 返回，可以从其他线程调用"""
+        self.cancelled = True
+
+    def sync_position(self):
+        """
+        以控制器报告的位置作为上位机记录的贴片头位置
+
+        控制器回零后位置即为机器坐标，上电后不需要手动把贴片头移到原点。
+        同时读取控制器的标定数据，步数换算和俯视相机偏移都以控制器为准。
+        :return: 控制器是否已回零
+        """
+        self.calibration = self.uart.request_calibration()
+        status = self.uart.request_status()
+        self.x, self.y, _, self.r = status_position(status, self.calibration)
+        return bool(status[0] & STATUS_HOMED)
+
+    def home(self):
+        """让控制器回零，等回零完成后同步位置"""
+        self.uart.post_frame(FRAME_BATCH, Batch().add(OP_HOME, 0).payload)
+        self.wait_idle(0.05)
+        return self.sync_position()
+
+    def wait_idle(self, poll=0.005):
+        """等控制器执行完所有已下发的命令"""
+        self.uart.wait_acked()
+        while not self._controller_idle():
+            time.sleep(poll)
+
+    def locate_board(self, fiducials):
+        """
+        用俯视相机测量 Mark 点，求电路板的实际位置
+
+        :param fiducials: Mark 点的 Part 列表，坐标与元件相同
+        :return: 各 Mark 点实测与理论位置的偏差，mm；没有找到任何 Mark 点时返回 None
+        """
+        from vision import fit_transform
+
+        self.board_transform = None
+        nominal = []
+        measured = []
+        for fiducial in fiducials:
+            x, y = self.board_point(fiducial)
+            batch = Batch().add(OP_DOWN_LIGHT, 1)
+            # 让俯视相机中心对准 Mark 点，偏移取自控制器的标定数据
+            self._move_to(batch, x - self.calibration.camera_dx, y - self.calibration.camera_dy)
+            self.uart.post_frame(FRAME_BATCH, batch.payload)
+            self.wait_idle()
+            offset = self.vision.fiducial()
+            if offset is not None:
+                nominal.append((x, y))
+                measured.append((x + offset[0], y + offset[1]))
+        self.uart.post_frame(FRAME_BATCH, Batch().add(OP_DOWN_LIGHT, 0).payload)
+        if not nominal:
+            return None
+        self.board_transform = fit_transform(nominal, measured)
+        return [((mx - x) ** 2 + (my - y) ** 2) ** 0.5 for (x, y), (mx, my) in zip(nominal, measured)]
+
+    def _on_frame(self, seq, frame_type, payload):
+        # 遥测记录的开头与状态帧相同，开启遥测后空闲统计的分辨率就是遥测周期
+        if frame_type != FRAME_STATUS and frame_type != FRAME_TELEMETRY:
+            return
+        flags, queue_len, pending = struct.unpack_from(STATUS_FORMAT, payload)[:3]
+        starved = not (flags & STATUS_MOVING) and queue_len == 0 and pending == 0
+        now = time.monotonic()
+        with self.lock:
+            if not self.running:
+                return
+            if starved and self.idle_since is None:
+                self.idle_since = now
+            elif not starved and self.idle_since is not None:
+                self.idle += now - self.idle_since
+                self.idle_count += 1
+                self.idle_since = None
+
+    def _controller_idle(self):
+        flags, queue_len, pending = self.uart.request_status()[:3]
+        return not (flags & STATUS_MOVING) and queue_len == 0 and pending == 0
+
+    def run(self, placements, progress=None):
+        """
+        执行作业，阻塞到控制器完成最后一个元件
+
+        :param placements: [(Part, 料槽号), ...]
+        :param progress: 可选回调 progress(已下发元件数, 总数)
+        :return: JobStats
+        """
+        total = len(placements)
+        self.cancelled = False
+        self.uart.subscribe(self._on_frame)
+        start = time.monotonic()
+        with self.lock:
+            self.running = True
+            self.idle_since = None
+            self.idle = 0.0
+            self.idle_count = 0
+        frames = 0
+        placed = 0
+        try:
+            if self.vision is not None and self.vision.up_source is not None:
+                self.pipeline = PlacementPipeline(self, self.vision)
+                frames = self.pipeline.run(placements, progress)
+                placed = frames // 3
+            else:
+                for index, (part, feeder) in enumerate(placements):
+                    if self.cancelled:
+                        break
+                    self.uart.post_frame(FRAME_BATCH, self.part_batch(part, feeder).payload)
+                    frames += 1
+                    placed += 1
+                    if progress:
+                        progress(index + 1, total)
+            # 最后几帧还在控制器里执行，等它彻底停下
+            with self.lock:
+                self.running = False
+            self.wait_idle(0.05)
+        finally:
+            with self.lock:
+                self.running = False
+            self.uart.unsubscribe(self._on_frame)
+        elapsed = time.monotonic() - start
+        with self.lock:
+            return JobStats(placed, frames, elapsed, self.idle, self.idle_count)
+
+
+def demo_centroids(path, parts=50, kinds=8, seed=0):
+    """生成一个 KiCad 格式的示例坐标文件，用于离线测试"""
+    rng = random.Random(seed)
+    values = [(f"{rng.choice((10, 22, 47, 100))}{rng.choice(('R', 'nF', 'K'))}",
+               rng.choice(('R_0805', 'C_0805', 'C_0603'))) for _ in range(kinds)]
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Ref', 'Val', 'Package', 'PosX', 'PosY', 'Rot', 'Side'])
+        for i in range(parts):
+            value, footprint = rng.choice(values)
+            writer.writerow([f"U{i + 1}", value, footprint, f"{rng.random() * BOARD_SIZE[0]:.4f}",
+                             f"{rng.random() * BOARD_SIZE[1]:.4f}", rng.choice((0, 90, 180, 270)), 'top'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="贴片作业执行器")
+    parser.add_argument('file', nargs='?', help="坐标文件（KiCad / 嘉立创 EDA CSV）")
+    parser.add_argument('--port', help="控制器串口，例如 COM10；不指定时使用模拟控制器")
+    parser.add_argument('--feed', type=float, default=0.0, help="XY 进给速度 mm/s，0 为控制器默认值")
+    parser.add_argument('--window', type=int, help="未完成帧数上限，默认等于控制器待执行队列容量")
+    parser.add_argument('--speedup', type=float, default=20.0, help="模拟控制器的时间加速倍数")
+    parser.add_argument('--demo', type=int, metavar='PARTS', help="生成示例坐标文件并执行")
+    parser.add_argument('--out', help="--demo 生成的坐标文件保存到该路径，不指定时使用临时文件")
+    parser.add_argument('--keep-origin', action='store_true', help="不把元件坐标平移到板角")
+    parser.add_argument('--optimize', action='store_true', help="重新安排料槽和贴装顺序")
+    parser.add_argument('--group', action='store_true', help="优化时同一料槽的元件排在一起")
+    parser.add_argument('--up-camera', help="仰视相机：摄像头编号或回放的图片/视频路径，指定后按视觉补偿贴装")
+    parser.add_argument('--down-camera', help="俯视相机：摄像头编号或回放路径，指定后先定位 Mark 点")
+    parser.add_argument('--telemetry', type=int, metavar='MS', help="开启控制器遥测，周期为 MS 毫秒")
+    parser.add_argument('--home', action='store_true', help="控制器尚未回零时先回零")
+    args = parser.parse_args()
+
+    if args.demo:
+        out = args.out or args.file
+        if out:
+            demo_centroids(out, args.demo)
+            parts = load_centroids(out)
+        else:
+            with tempfile.TemporaryDirectory() as folder:
+                path = os.path.join(folder, 'demo_centroids.csv')
+                demo_centroids(path, args.demo)
+                parts = load_centroids(path)
+    elif args.file:
+        parts = load_centroids(args.file)
+    else:
+        parser.error("需要坐标文件或 --demo")
+
+    parts = [part for part in parts if part.top]
+    if not args.keep_origin:
+        normalize_board(parts)
+    # 坐标文件中的 Mark 点（FID1、FID2…）只用于定位，不贴装
+    fiducials = [part for part in parts if part.designator.upper().startswith('FID')]
+    parts = [part for part in parts if not part.designator.upper().startswith('FID')]
+    if args.optimize:
+        from optimizer import GROUP_PENALTY, feeder_slots, optimize
+        placements, skipped = assign_feeders(parts, feeder_slots(parts))
+        placements = optimize(placements, GROUP_PENALTY if args.group else 0.0)
+    else:
+        placements, skipped = assign_feeders(parts)
+    print(f"{len(placements)} 个元件, {len({part.kind for part, _ in placements})} 种物料")
+    if skipped:
+        print(f"料槽不足, 跳过 {len(skipped)} 个元件: {', '.join(part.designator for part in skipped)}")
+
+    sim = None
+    speedup = 1.0
+    if args.port:
+        uart = UARTConnector(args.port)
+    else:
+        import tty
+        from sim_controller import SimController
+        master, slave = os.openpty()
+        tty.setraw(master)
+        sim = SimController(master, args.speedup)
+        speedup = args.speedup
+        uart = UARTConnector(os.ttyname(slave))
+    uart.connect()
+    if args.window:
+        uart.window = args.window
+
+    vision = None
+    if args.up_camera or args.down_camera:
+        from vision import Vision, open_source
+        vision = Vision(open_source(args.up_camera), open_source(args.down_camera))
+    telemetry = None
+    if args.telemetry:
+        from telemetry import TelemetryBuffer
+        telemetry = TelemetryBuffer()
+        telemetry.attach(uart, args.telemetry)
+    runner = JobRunner(uart, args.feed, vision=vision)
+    homed = runner.sync_position()
+    if args.home and not homed:
+        homed = runner.home()
+    print(f"贴片头位置 X {runner.x:.2f} Y {runner.y:.2f}" + ("" if homed else "（未回零）"))
+    if args.down_camera and fiducials:
+        errors = runner.locate_board(fiducials)
+        if errors is None:
+            print("没有找到 Mark 点，按理论位置贴装")
+        else:
+            print("Mark 点偏差: " + ", ".join(f"{error:.3f}" for error in errors) + " mm")
+
+    stats = runner.run(placements)
+    if telemetry is not None:
+        telemetry.detach()
+        uart.wait_acked()
+    uart.disconnect()
+    if vision is not None:
+        vision.close()
+        if args.up_camera:
+            print(f"视觉: {vision.misses} 个元件未识别")
+    if runner.pipeline is not None:
+        # 各阶段耗时为实际时间，不按模拟加速换算
+        for line in runner.pipeline.report(stats.elapsed):
+            print("  " + line)
+    if telemetry is not None and len(telemetry):
+        records = telemetry.snapshot()
+        print(f"遥测: {telemetry.count} 条, 丢失 {telemetry.lost}, 合并 {telemetry.coalesced}, "
+              f"调度延迟 平均 {records['loop_avg'].mean():.0f} us 最大 {records['loop_max'].max()} us")
+    if sim is not None:
+        sim.stop()
+        print(f"模拟控制器: 加速 {speedup:g} 倍, 运动时间 {sim.motion_time:.1f} s, 错误 {sim.errors}")
+
+    # 模拟控制器加速运行，统计换算回真实时间
+    elapsed = stats.elapsed * speedup
+    idle = stats.idle * speedup
+    print(f"用时 {elapsed:.1f} s, {stats.parts / elapsed * 3600:.0f} 个/小时")
+    print(f"控制器空闲 {idle:.2f} s ({idle / elapsed * 100:.1f}%), {stats.idle_count} 次")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+#file:c:\Codes\OSCproj\SMT\layout.py
+
+# 贴片机工作台布局，单位 mm，坐标原点为 XY 回零位置
+# 仿真、作业执行和排序优化共用这一份定义
+
+FEEDER_ORIGIN = (20.0, 10.0)   # 第一个料槽的取料点
+FEEDER_PITCH = 12.0            # 料槽间距
+FEEDER_COUNT = 12
+CAMERA_POS = (160.0, 40.0)     # 仰视相机
+BOARD_ORIGIN = (60.0, 120.0)   # 电路板左下角
+BOARD_SIZE = (100.0, 80.0)
+TRAVEL_Y = 60.0                # 离开料槽区后进入的安全通道
+
+PICK_DEPTH = 5.0               # 取料时 Z 轴下降距离
+PLACE_DEPTH = 5.0              # 贴装时 Z 轴下降距离
+
+
+def feeder_position(index):
+    """第 index 个料槽的取料点"""
+    return (FEEDER_ORIGIN[0] + index * FEEDER_PITCH, FEEDER_ORIGIN[1])
+
+# 相机，像素坐标原点在图像左上角，图像 x 向右对应机器 +X，图像 y 向下对应机器 -Y
+UP_CAMERA_SCALE = 0.02         # 仰视相机 mm/像素，图像中心为吸嘴中心
+DOWN_CAMERA_SCALE = 0.04       # 俯视相机 mm/像素
+# 俯视相机中心相对吸嘴的偏移属于机器标定，由控制器保存（calibration.py 的 camera_dx/camera_dy）
+FIDUCIAL_DIAMETER = 1.0        # Mark 点直径
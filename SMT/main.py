@@ -0,0 +1,5 @@
+#file:c:\Codes\OSCproj\SMT\main.py
+from job_runner import main
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+#file:c:\Codes\OSCproj\SMT\motion_sim.py
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+# 直接复用下位机的规划代码，保证仿真和固件用的是同一份曲线
+FIRMWARE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'esp32', 'SMT')
+if FIRMWARE_DIR not in sys.path:
+    sys.path.insert(0, FIRMWARE_DIR)
+
+from planner import TRAPEZOID, SCURVE, plan_profile, step_intervals, corexy_steps, dda_times
+from motionqueue import MotionQueue
+from layout import FEEDER_COUNT, CAMERA_POS, BOARD_ORIGIN, BOARD_SIZE, TRAVEL_Y, feeder_position
+
+
+def simulate_table(table, count, loop_us=12.0, pulse_us=3.0):
+    """
+    模拟固件中 run_dda 主轴的执行过程。
+
+    固件循环每转一圈耗时 loop_us，发出一个脉冲额外耗时 pulse_us。
+    某一步只有在截止时间之后的第一次轮询才会真正发出，
+    下一步的截止时间在上一步的截止时间上累加（与固件一致）。
+
+    :return: (理想时间列表, 实际时间列表)，单位微秒
+    """
+    ideal = []
+    actual = []
+    now = 0.0
+    deadline = 0
+    for i in range(count):
+        deadline += table[i]
+        ideal.append(deadline)
+        if now < deadline:
+            # 轮询落在截止时间之后的第一个循环节拍上
+            loops = int((deadline - now) / loop_us) + 1
+            now += loops * loop_us
+        actual.append(now)
+        now += pulse_us
+    return ideal, actual
+
+
+def report(ideal, actual):
+    """
+    根据理想与实际的步进时间统计步速和抖动
+
+    峰值步速按规划的（理想）步进时刻计算，不超过曲线的最大速度。
+    实际时刻被轮询节拍量化，某一步晚发、下一步按时发时两步的实际间隔会短于规划间隔，
+    这只是单步的时序抖动，不是电机真的跑得更快，单独以 min_interval_us 给出。
+    """
+    count = len(actual)
+    if count == 0:
+        return {'steps': 0, 'duration_ms': 0.0, 'steps_per_sec': 0.0, 'peak_steps_per_sec': 0.0,
+                'min_interval_us': 0.0, 'jitter_max_us': 0.0, 'jitter_rms_us': 0.0, 'overrun_ms': 0.0}
+    errors = [a - i for i, a in zip(ideal, actual)]
+    duration = actual[-1]
+    shortest = min(b - a for a, b in zip([0] + ideal, ideal))
+    shortest_actual = min(b - a for a, b in zip([0.0] + actual, actual))
+    rms = (sum(e * e for e in errors) / count) ** 0.5
+    return {
+        'steps': count,
+        'duration_ms': duration / 1000,
+        'steps_per_sec': count / (duration / 1e6) if duration > 0 else 0.0,
+        'peak_steps_per_sec': 1e6 / shortest if shortest > 0 else 0.0,
+        'min_interval_us': shortest_actual,
+        'jitter_max_us': max(errors),
+        'jitter_rms_us': rms,
+        'overrun_ms': (actual[-1] - ideal[-1]) / 1000,
+    }
+
+
+def simulate_xy(dx_mm, dy_mm, steps_per_mm=80, feed_rate=100, acceleration=2000, kind=TRAPEZOID):
+    """
+    按固件 CoreXY.move_xy 的方式规划一次笛卡尔移动，并用 DDA 模型展开两个电机的步进时刻。
+
+    :return: 字典，包含 A/B 步数、各自结束时间以及路径上的平均进给速度
+    """
+    a, b = corexy_steps(round(dx_mm * steps_per_mm), round(dy_mm * steps_per_mm))
+    count = max(abs(a), abs(b))
+    minor = min(abs(a), abs(b))
+    length_mm = math.hypot(dx_mm, dy_mm)
+    if count == 0 or length_mm == 0:
+        return {'a': a, 'b': b, 'a_steps': 0, 'b_steps': 0, 'a_end_ms': 0.0, 'b_end_ms': 0.0,
+                'duration_ms': 0.0, 'feed_mm_s': 0.0, 'profile': None}
+    ratio = count / length_mm
+    profile = plan_profile(count, feed_rate * ratio, acceleration * ratio, kind=kind)
+    major_times, minor_times = dda_times(step_intervals(profile), count, minor)
+    if abs(a) >= abs(b):
+        a_times, b_times = major_times, minor_times
+    else:
+        a_times, b_times = minor_times, major_times
+    duration = major_times[-1]
+    return {
+        'a': a,
+        'b': b,
+        'a_steps': len(a_times),
+        'b_steps': len(b_times),
+        'a_end_ms': a_times[-1] / 1000 if a_times else 0.0,
+        'b_end_ms': b_times[-1] / 1000 if b_times else 0.0,
+        'duration_ms': duration / 1000,
+        'feed_mm_s': length_mm / (duration / 1e6),
+        'profile': profile,
+    }
+
+
+def placement_job(parts=100, seed=0):
+    """
+    生成一个有代表性的贴片作业路径。
+
+    每个元件：取料点（停，吸料）→ 进入安全通道 → 飞过仰视相机 → 贴装点（停，放料）。
+    :return: 列表，元素为 (x, y, stop)，stop 表示到达该点后吸嘴需要动作
+    """
+    rng = random.Random(seed)
+    path = [(0.0, 0.0, True)]
+    for _ in range(parts):
+        fx, fy = feeder_position(rng.randrange(FEEDER_COUNT))
+        bx = BOARD_ORIGIN[0] + rng.random() * BOARD_SIZE[0]
+        by = BOARD_ORIGIN[1] + rng.random() * BOARD_SIZE[1]
+        path.append((fx, fy, True))
+        path.append((fx, TRAVEL_Y, False))
+        path.append((CAMERA_POS[0], CAMERA_POS[1] + TRAVEL_Y, False))
+        path.append((bx, by, True))
+    return path
+
+
+def job_time(path, feed_rate=300, acceleration=3000, lookahead=True, queue_size=16, camera_stop=False):
+    """
+    估算作业路径的纯运动时间（秒）。
+
+    lookahead=False 时每段都从 0 加速再减速到 0（原 move_motors 的行为）；
+    否则按固件 SmtController 的方式经过 MotionQueue 规划段间速度。
+    """
+    segments = []
+    for (x0, y0, _), (x1, y1, stop) in zip(path, path[1:]):
+        is_camera = (x1, y1) == (CAMERA_POS[0], CAMERA_POS[1] + TRAVEL_Y)
+        segments.append((x1 - x0, y1 - y0, stop or (camera_stop and is_camera)))
+
+    total = 0.0
+    if not lookahead:
+        for dx, dy, _ in segments:
+            length = math.hypot(dx, dy)
+            if length > 0:
+                total += plan_profile(length, feed_rate, acceleration).duration
+        return total
+
+    queue = MotionQueue(queue_size)
+
+    def run(seg):
+        return plan_profile(seg.length, seg.feed, seg.acceleration, seg.entry, seg.exit).duration
+
+    for dx, dy, stop in segments:
+        if queue.full:
+            total += run(queue.pop())
+        queue.push(dx, dy, feed_rate, acceleration)
+        if stop:
+            # 吸嘴动作前必须停稳并排空队列
+            queue.mark_stop()
+            while len(queue):
+                total += run(queue.pop())
+    while len(queue):
+        total += run(queue.pop())
+    return total
+
+
+def benchmark_planning(steps, speed, accel, kind, repeat=20):
+    """测量在本机上用 StepStream 逐步算出整个移动全部间隔的耗时，毫秒"""
+    profile = plan_profile(steps, speed, accel, kind=kind)
+    out = step_intervals(profile)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        step_intervals(profile, out)
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="步进间隔仿真与基准测试")
+    parser.add_argument('--steps', type=int, default=8000, help="移动步数")
+    parser.add_argument('--speed', type=float, default=20000, help="最大速度，步/秒")
+    parser.add_argument('--accel', type=float, default=80000, help="加速度，步/秒²")
+    parser.add_argument('--scurve', action='store_true', help="使用 S 曲线")
+    parser.add_argument('--xy', type=float, nargs=2, metavar=('DX', 'DY'),
+                        help="改为仿真一次笛卡尔移动，单位 mm")
+    parser.add_argument('--steps-per-mm', type=float, default=80, help="每毫米步数")
+    parser.add_argument('--feed', type=float, default=100, help="进给速度，mm/s")
+    parser.add_argument('--xy-accel', type=float, default=2000, help="笛卡尔加速度，mm/s²")
+    parser.add_argument('--placement', type=int, metavar='PARTS',
+                        help="改为估算贴片作业在有/无前瞻队列时的运动时间")
+    parser.add_argument('--camera-stop', action='store_true', help="在仰视相机处停稳拍照")
+    parser.add_argument('--loop-us', type=float, default=12.0, help="固件单次轮询耗时，微秒")
+    parser.add_argument('--pulse-us', type=float, default=3.0, help="单个脉冲耗时，微秒")
+    args = parser.parse_args()
+
+    kind = SCURVE if args.scurve else TRAPEZOID
+    if args.placement:
+        path = placement_job(args.placement)
+        plain = job_time(path, args.feed, args.xy_accel, lookahead=False)
+        blended = job_time(path, args.feed, args.xy_accel, camera_stop=args.camera_stop)
+        print(f"{args.placement} 个元件, {len(path) - 1} 段移动")
+        print(f"逐段启停: {plain:.2f} s")
+        print(f"前瞻队列: {blended:.2f} s")
+        print(f"节省: {plain - blended:.2f} s ({(plain - blended) / plain * 100:.1f}%)")
+        return
+
+    if args.xy:
+        result = simulate_xy(args.xy[0], args.xy[1], args.steps_per_mm, args.feed, args.xy_accel, kind)
+        print(result['profile'])
+        print(f"A: {result['a']} 步, 实际 {result['a_steps']} 步, 结束于 {result['a_end_ms']:.2f} ms")
+        print(f"B: {result['b']} 步, 实际 {result['b_steps']} 步, 结束于 {result['b_end_ms']:.2f} ms")
+        print(f"总耗时: {result['duration_ms']:.2f} ms, 平均进给 {result['feed_mm_s']:.1f} mm/s")
+        return
+
+    profile = plan_profile(args.steps, args.speed, args.accel, kind=kind)
+    table = step_intervals(profile)
+    ideal, actual = simulate_table(table, args.steps, args.loop_us, args.pulse_us)
+    stats = report(ideal, actual)
+
+    print(profile)
+    print(f"理论耗时: {profile.duration * 1000:.2f} ms")
+    print(f"实际耗时: {stats['duration_ms']:.2f} ms (超出 {stats['overrun_ms']:.3f} ms)")
+    print(f"平均步速: {stats['steps_per_sec']:.0f} 步/秒, 峰值步速: {stats['peak_steps_per_sec']:.0f} 步/秒")
+    print(f"时序抖动: 最大 {stats['jitter_max_us']:.1f} us, 均方根 {stats['jitter_rms_us']:.1f} us, "
+          f"轮询量化后最短的实际间隔 {stats['min_interval_us']:.1f} us")
+    print(f"本机逐步计算全部间隔耗时 {benchmark_planning(args.steps, args.speed, args.accel, kind):.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
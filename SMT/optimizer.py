@@ -0,0 +1,291 @@
+#file:c:\Codes\OSCproj\SMT\optimizer.py
+import argparse
+import time
+
+import numpy as np
+
+from layout import FEEDER_COUNT, CAMERA_POS, BOARD_ORIGIN, BOARD_SIZE, TRAVEL_Y, feeder_position
+
+# 贴装顺序优化
+# 单吸嘴贴片头每个元件走一圈：料槽 → 安全通道 → 仰视相机 → 贴装点 → 下一个元件的料槽。
+# 前三段只取决于元件自身（料槽和贴装点），与顺序无关；与顺序有关的只有“贴装点 → 下一个料槽”
+# 这一段，因此把问题写成非对称 TSP：代价为贴完 i 之后去取 j 的空程距离。
+# 先用最近邻构造初始顺序，再交替做 2-opt（区间反转）和 Or-opt（移动 1~3 个元件的片段），
+# 所有候选位置的增益都用 NumPy 一次算出，2000 个元件在 1 秒内完成。
+
+HOME = (0.0, 0.0)
+OR_OPT_LENGTHS = (1, 2, 3)
+GROUP_PENALTY = 1e4   # 要求同一料槽的元件连续贴装时使用的换料槽代价，mm
+
+
+def feeder_slots(placements):
+    """
+    按贴装位置安排料槽：元件平均 X 坐标越靠左的物料放在越靠左的料槽，缩短回程
+
+    :param placements: Part 列表（坐标已相对板角）
+    :return: {(值, 封装): 料槽号}，可直接传给 job_runner.assign_feeders
+    """
+    kinds = {}
+    for part in placements:
+        kinds.setdefault(part.kind, []).append(part.x)
+    order = sorted(kinds, key=lambda kind: sum(kinds[kind]) / len(kinds[kind]))
+    return {kind: slot for slot, kind in enumerate(order[:FEEDER_COUNT])}
+
+
+def positions(placements, board_origin=BOARD_ORIGIN):
+    """返回 (取料点数组, 贴装点数组)，形状均为 (n, 2)"""
+    picks = np.array([feeder_position(feeder) for _, feeder in placements], dtype=float).reshape(-1, 2)
+    places = np.array([(board_origin[0] + part.x, board_origin[1] + part.y) for part, _ in placements],
+                      dtype=float).reshape(-1, 2)
+    return picks, places
+
+
+def travel_matrix(picks, places, feeder_change=0.0):
+    """
+    计算与顺序有关的空程代价
+
+    取料点只有料槽数那么几个，贴完 i 之后去取 j 的代价只取决于 j 的取料点，
+    因此用 n×K 的小矩阵表示，完整的 n×n 矩阵为 dist[:, column]，所有查表都落在缓存里。
+
+    :param feeder_change: 换料槽的附加代价（mm），取很大的值时同一料槽的元件会排在一起
+    :return: (dist, column, start)，dist[i, c] 为贴完 i 后去第 c 个取料点的代价，
+             column[j] 为元件 j 的取料点编号，start[j] 为从原点出发取 j 的距离
+    """
+    points, column = np.unique(picks, axis=0, return_inverse=True)
+    column = column.ravel()
+    diff = places[:, None, :] - points[None, :, :]
+    dist = np.hypot(diff[..., 0], diff[..., 1])
+    if feeder_change:
+        dist += feeder_change * (column[:, None] != np.arange(len(points))[None, :])
+    start = np.hypot(picks[:, 0] - HOME[0], picks[:, 1] - HOME[1])
+    return dist, column, start
+
+
+def tour_cost(order, dist, column, start):
+    """按 order 执行时与顺序有关的总代价"""
+    if len(order) == 0:
+        return 0.0
+    return float(start[order[0]] + dist[order[:-1], column[order[1:]]].sum())
+
+
+def nearest_neighbour(dist, column, start):
+    """最近邻构造：每次去代价最小的未贴元件"""
+    n = len(start)
+    order = np.empty(n, dtype=np.intp)
+    if n == 0:
+        return order
+    visited = np.zeros(n, dtype=bool)
+    current = int(np.argmin(start))
+    for k in range(n):
+        order[k] = current
+        visited[current] = True
+        if k == n - 1:
+            break
+        row = np.where(visited, np.inf, dist[current, column])
+        current = int(np.argmin(row))
+    return order
+
+
+def two_opt(order, dist, column, start, deadline):
+    """
+    一轮 2-opt：把 order[k..m] 反转。非对称代价下片段内部的边也会改变方向，
+    用正反两个方向的前缀和在 O(1) 内算出内部代价的变化。
+
+    :return: 是否有改进
+    """
+    n = len(order)
+    improved = False
+    forward = backward = None
+    k = 0
+    while k < n - 1 and time.perf_counter() < deadline:
+        if forward is None:
+            cols = column[order]
+            forward = np.concatenate(([0.0], np.cumsum(dist[order[:-1], cols[1:]])))
+            backward = np.concatenate(([0.0], np.cumsum(dist[order[1:], cols[:-1]])))
+        m = np.arange(k + 1, n)
+        first = order[k]
+        tail = order[m]
+        # 进入片段的边
+        if k == 0:
+            delta = start[tail] - start[first]
+        else:
+            prev = dist[order[k - 1]]
+            delta = prev[cols[m]] - prev[cols[k]]
+        # 离开片段的边，片段在末尾时没有
+        after = np.empty(len(m))
+        following = cols[m[:-1] + 1]
+        after[:-1] = dist[first, following] - dist[tail[:-1], following]
+        after[-1] = 0.0
+        delta = delta + after + (backward[m] - backward[k]) - (forward[m] - forward[k])
+        best = int(np.argmin(delta))
+        if delta[best] < -1e-9:
+            order[k:m[best] + 1] = order[k:m[best] + 1][::-1].copy()
+            forward = None
+            improved = True
+        else:
+            k += 1
+    return improved
+
+
+def or_opt(order, dist, column, start, deadline):
+    """
+    一轮 Or-opt：把连续 1~3 个元件整体挪到别的位置（不反转）
+
+    :return: 是否有改进
+    """
+    improved = False
+    n = len(order)
+    if n < 2:
+        return False
+    # by_column[c] 为各元件贴完后去第 c 个取料点的代价
+    by_column = np.ascontiguousarray(dist.T)
+    cols = column[order]
+    # edges[p] 为 order[p-1] -> order[p] 的代价，p = 0 从原点出发，p = n 为结束
+    edges = np.concatenate(([start[order[0]]], dist[order[:-1], cols[1:]], [0.0]))
+    enter = np.empty(n + 1)
+    leave = np.empty(n + 1)
+    leave[n] = 0.0
+    delta = np.empty(n + 1)
+    for length in OR_OPT_LENGTHS:
+        if length >= n:
+            break
+        k = 0
+        while k + length <= n and time.perf_counter() < deadline:
+            first = order[k]
+            last = order[k + length - 1]
+            # 取出片段的收益
+            if k + length < n:
+                following = order[k + length]
+                bridge = start[following] if k == 0 else dist[order[k - 1], cols[k + length]]
+            else:
+                bridge = 0.0
+            gain = edges[k] + edges[k + length] - bridge
+            # 插入到 order[p-1] 与 order[p] 之间，片段自身所在的位置除外
+            enter[0] = start[first]
+            np.take(by_column[cols[k]], order, out=enter[1:])
+            np.take(dist[last], cols, out=leave[:n])
+            np.add(enter, leave, out=delta)
+            np.subtract(delta, edges, out=delta)
+            delta[k:k + length + 1] = np.inf
+            best = int(delta.argmin())
+            if delta[best] < gain - 1e-9:
+                segment = order[k:k + length].copy()
+                if best < k:
+                    lo, hi = best, k + length
+                    order[best + length:hi] = order[best:k]
+                    order[best:best + length] = segment
+                else:
+                    lo, hi = k, best
+                    order[k:best - length] = order[k + length:best]
+                    order[best - length:best] = segment
+                cols[lo:hi] = column[order[lo:hi]]
+                # 只有 lo..hi 之间的边发生了变化
+                if lo == 0:
+                    edges[0] = start[order[0]]
+                    lo = 1
+                hi = min(hi, n - 1)
+                edges[lo:hi + 1] = dist[order[lo - 1:hi], cols[lo:hi + 1]]
+                improved = True
+            else:
+                k += 1
+    return improved
+
+
+def optimize_order(dist, column, start, time_limit=0.5):
+    """
+    求贴装顺序
+
+    :param time_limit: 局部搜索的时间上限，秒；到时返回当前最好的顺序
+    :return: 元件下标数组
+    """
+    deadline = time.perf_counter() + time_limit
+    order = nearest_neighbour(dist, column, start)
+    if len(order) < 3:
+        return order
+    while time.perf_counter() < deadline:
+        moved = or_opt(order, dist, column, start, deadline)
+        improved = two_opt(order, dist, column, start, deadline)
+        if not (improved or moved):
+            break
+    return order
+
+
+def optimize(placements, feeder_change=0.0, time_limit=0.5, board_origin=BOARD_ORIGIN):
+    """
+    重新排列作业中的元件
+
+    :param placements: [(Part, 料槽号), ...]
+    :param feeder_change: 换料槽的附加代价（mm）
+    :return: 排序后的 [(Part, 料槽号), ...]
+    """
+    picks, places = positions(placements, board_origin)
+    dist, column, start = travel_matrix(picks, places, feeder_change)
+    order = optimize_order(dist, column, start, time_limit)
+    # 局部搜索从最近邻出发，不保证比原顺序好；没有缩短时保持原顺序
+    original = np.arange(len(placements))
+    if tour_cost(order, dist, column, start) >= tour_cost(original, dist, column, start) - 1e-9:
+        return list(placements)
+    return [placements[i] for i in order]
+
+
+def job_path(placements, board_origin=BOARD_ORIGIN):
+    """
+    按 job_runner.JobRunner 的走法展开贴片头路径
+
+    :return: 列表，元素为 (x, y, stop)，与 motion_sim.job_time 的输入相同
+    """
+    path = [(HOME[0], HOME[1], True)]
+    for part, feeder in placements:
+        fx, fy = feeder_position(feeder)
+        path.append((fx, fy, True))
+        path.append((fx, TRAVEL_Y, False))
+        path.append((CAMERA_POS[0], CAMERA_POS[1] + TRAVEL_Y, False))
+        path.append((board_origin[0] + part.x, board_origin[1] + part.y, True))
+    return path
+
+
+def path_length(path):
+    xy = np.array([(x, y) for x, y, _ in path], dtype=float)
+    return float(np.hypot(*np.diff(xy, axis=0).T).sum())
+
+
+def main():
+    from job_runner import load_centroids, assign_feeders, normalize_board, Part
+    from motion_sim import job_time
+
+    parser = argparse.ArgumentParser(description="贴装顺序优化")
+    parser.add_argument('file', nargs='?', help="坐标文件（KiCad / 嘉立创 EDA CSV）")
+    parser.add_argument('--demo', type=int, metavar='PARTS', help="改为随机生成元件")
+    parser.add_argument('--kinds', type=int, default=FEEDER_COUNT, help="随机生成时的物料种数")
+    parser.add_argument('--group', action='store_true', help="同一料槽的元件排在一起")
+    parser.add_argument('--time-limit', type=float, default=0.5, help="搜索时间上限，秒")
+    parser.add_argument('--feed', type=float, default=300, help="估算用的进给速度，mm/s")
+    parser.add_argument('--accel', type=float, default=3000, help="估算用的加速度，mm/s²")
+    args = parser.parse_args()
+
+    if args.demo:
+        rng = np.random.default_rng(0)
+        kinds = rng.integers(args.kinds, size=args.demo)
+        xy = rng.random((args.demo, 2)) * BOARD_SIZE
+        parts = [Part(f"U{i + 1}", f"V{kinds[i]}", 'C_0603', xy[i, 0], xy[i, 1], 0.0, 'top')
+                 for i in range(args.demo)]
+    elif args.file:
+        parts = normalize_board([part for part in load_centroids(args.file) if part.top])
+    else:
+        parser.error("需要坐标文件或 --demo")
+
+    # 两种顺序使用同一套料槽分配，差别只来自贴装顺序
+    before, _ = assign_feeders(parts, feeder_slots(parts))
+    start = time.perf_counter()
+    after = optimize(before, GROUP_PENALTY if args.group else 0.0, args.time_limit)
+    elapsed = time.perf_counter() - start
+
+    print(f"{len(after)} 个元件, 优化耗时 {elapsed * 1000:.0f} ms")
+    for name, placements in (("原顺序", before), ("优化后", after)):
+        path = job_path(placements)
+        print(f"{name}: 空程 {path_length(path) / 1000:.2f} m, "
+              f"运动时间 {job_time(path, args.feed, args.accel):.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+#file:c:\Codes\OSCproj\SMT\pipeline.py
+import os
+import queue
+import sys
+import threading
+import time
+
+# 帧协议与下位机共用同一份定义
+FIRMWARE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'esp32', 'SMT')
+if FIRMWARE_DIR not in sys.path:
+    sys.path.insert(0, FIRMWARE_DIR)
+
+from protocol import Batch, FRAME_BATCH, OP_UP_LIGHT
+
+# 带视觉补偿的贴装流水线
+# 三个阶段各占一个线程，之间用有界队列连接：
+#   运动：下发取料帧（飞到相机）→ 通知拍照 → 收到“已拍照”后立即下发飞往贴装点的帧 → 取补偿、下发贴装帧
+#   拍照：等贴片头停在相机上方，读一帧到复用的缓冲区，交给处理阶段
+#   处理：求元件偏移，补偿交回运动阶段，缓冲区放回缓冲池
+# 元件 N 的图像处理与飞往贴装点的移动并行；只要处理比这段移动快，控制器就不会停下来等上位机。
+# 每个阶段分别统计忙碌时间和等待上游的时间，忙碌占比最高的阶段就是限制产能的阶段。
+
+
+class StageStats:
+    """一个流水线阶段的耗时统计，单位秒"""
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.busy = 0.0      # 干活的时间
+        self.wait = 0.0      # 等上游数据或等控制器的时间
+        self.max_busy = 0.0
+
+    def add(self, busy, wait=0.0):
+        self.count += 1
+        self.busy += busy
+        self.wait += wait
+        if busy > self.max_busy:
+            self.max_busy = busy
+
+    def report(self, elapsed):
+        count = max(self.count, 1)
+        return (f"{self.name}: {self.count} 次, 忙碌 平均 {self.busy / count * 1000:.2f} ms "
+                f"最大 {self.max_busy * 1000:.2f} ms, 等待 平均 {self.wait / count * 1000:.2f} ms, "
+                f"占用 {self.busy / elapsed * 100 if elapsed > 0 else 0.0:.1f}%")
+
+
+class FramePool:
+    """
+    预先分配的帧缓冲区池，拍照阶段取出、处理阶段用完放回，运行中不再分配图像内存
+
+    缓冲区在第一帧到来时按其尺寸分配（之前不知道相机分辨率）。
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.free = queue.Queue(size)
+        self.allocated = 0
+
+    def get(self):
+        """取一个空闲缓冲区；尚未分配满时返回 None，由拍照阶段让帧源分配"""
+        if self.allocated < self.size:
+            self.allocated += 1
+            return None
+        return self.free.get()
+
+    def put(self, frame):
+        self.free.put(frame)
+
+
+class PlacementPipeline:
+    """
+    把 JobRunner 的视觉贴装拆成并行的三个阶段
+
+    :param runner: JobRunner，提供批量命令生成和 uart
+    :param vision: Vision，需带仰视相机
+    :param depth: 阶段之间队列的长度，也是帧缓冲区的数量
+    """
+
+    def __init__(self, runner, vision, depth=2):
+        self.runner = runner
+        self.vision = vision
+        self.depth = depth
+        self.pool = FramePool(depth + 1)
+        self.capture_requests = queue.Queue(depth)
+        self.frames = queue.Queue(depth)
+        self.captured = queue.Queue(depth)
+        self.corrections = queue.Queue(depth)
+        self.stats = {name: StageStats(name) for name in ('运动', '拍照', '处理')}
+        self.stall = 0.0     # 运动阶段等补偿的总时间；每个元件只要短于飞往贴装点的移动，控制器就不会停
+        self.error = None
+
+    def _capture_loop(self):
+        stats = self.stats['拍照']
+        source = self.vision.up_source
+        while True:
+            t0 = time.perf_counter()
+            index = self.capture_requests.get()
+            if index is None:
+                self.frames.put(None)
+                return
+            # 等贴片头停在相机上方，这段时间算作等待
+            self.runner.wait_idle()
+            t1 = time.perf_counter()
+            frame = source.read(self.pool.get())
+            self.captured.put(index)
+            self.frames.put((index, frame))
+            stats.add(time.perf_counter() - t1, t1 - t0)
+
+    def _process_loop(self):
+        stats = self.stats['处理']
+        while True:
+            t0 = time.perf_counter()
+            item = self.frames.get()
+            if item is None:
+                return
+            t1 = time.perf_counter()
+            index, frame = item
+            correction = self.vision.part_correction(frame)
+            self.pool.put(frame)
+            self.corrections.put((index, correction))
+            stats.add(time.perf_counter() - t1, t1 - t0)
+
+    def _run_thread(self, target):
+        def run():
+            try:
+                target()
+            except Exception as e:
+                # 出错时让运动阶段尽快结束，不要一直等补偿
+                self.error = e
+                self.captured.put(None)
+                self.corrections.put(None)
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    def _get(self, q, index):
+        item = q.get()
+        if item is None:
+            raise RuntimeError("流水线异常退出") from self.error
+        got = item[0] if isinstance(item, tuple) else item
+        if got != index:
+            raise RuntimeError(f"流水线顺序错乱: 期望 {index}, 收到 {got}")
+        return item
+
+    def run(self, placements, progress=None):
+        """
+        在调用线程里运行运动阶段，阻塞到最后一个元件下发完
+
+        :return: 下发的帧数
+        """
+        runner = self.runner
+        post = runner.uart.post_frame
+        stats = self.stats['运动']
+        threads = [self._run_thread(self._capture_loop), self._run_thread(self._process_loop)]
+        frames = 0
+        try:
+            for index, (part, feeder) in enumerate(placements):
+                if runner.cancelled:
+                    break
+                t0 = time.perf_counter()
+                post(FRAME_BATCH, runner.pick_batch(part, feeder).add(OP_UP_LIGHT, 1).payload)
+                self.capture_requests.put(index)
+                busy = time.perf_counter() - t0
+                t1 = time.perf_counter()
+                self._get(self.captured, index)
+                t2 = time.perf_counter()
+                post(FRAME_BATCH, runner.travel_batch(part, Batch().add(OP_UP_LIGHT, 0)).payload)
+                busy += time.perf_counter() - t2
+                wait = t2 - t1
+                # 处理阶段与这段移动并行，控制器此时仍在执行飞往贴装点的移动
+                t3 = time.perf_counter()
+                _, correction = self._get(self.corrections, index)
+                t4 = time.perf_counter()
+                self.stall += t4 - t3
+                post(FRAME_BATCH, runner.place_batch(correction).payload)
+                stats.add(busy + time.perf_counter() - t4, wait + t4 - t3)
+                frames += 3
+                if progress:
+                    progress(index + 1, len(placements))
+        finally:
+            self.capture_requests.put(None)
+            for thread in threads:
+                thread.join(1.0)
+        return frames
+
+    def report(self, elapsed):
+        lines = [stats.report(elapsed) for stats in self.stats.values()]
+        count = max(self.stats['运动'].count, 1)
+        lines.append(f"等待补偿: 共 {self.stall * 1000:.1f} ms, 平均 {self.stall / count * 1000:.2f} ms/元件")
+        return lines
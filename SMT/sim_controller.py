@@ -0,0 +1,358 @@
+#file:c:\Codes\OSCproj\SMT\sim_controller.py
+import collections
+import os
+import struct
+import sys
+import threading
+import time
+
+FIRMWARE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'esp32', 'SMT')
+if FIRMWARE_DIR not in sys.path:
+    sys.path.insert(0, FIRMWARE_DIR)
+
+from protocol import (FrameParser, encode_frame, iter_ops, OPS, FRAME_BATCH, FRAME_ACK, FRAME_NAK, FRAME_TEXT,
+                      FRAME_STATUS, FRAME_SYNC, FRAME_TELEMETRY, FRAME_CALIBRATION, PENDING_FRAMES, RESEND_WINDOW,
+                      ACK_FORMAT, ACK_OK, ACK_ERROR, STATUS_FORMAT, STATUS_MOVING, STATUS_AIR_PUMP, STATUS_UP_LIGHT,
+                      STATUS_DOWN_LIGHT, STATUS_HOMED, TELEMETRY_FORMAT, HOME_X, HOME_Y, HOME_Z, HOME_R, HOME_ALL)
+from calibration import Calibration
+from planner import plan_profile
+from motionqueue import MotionQueue
+
+# 模拟控制器
+# 在 pty 主端按固件 SmtController 的协议行为应答：按序接收、回退 N 帧、待执行帧队列、
+# 状态变化上报；动作不驱动电机，而是按 planner 算出的运动时间睡眠，用于离线测试上位机。
+# 以下参数与 esp32/SMT/smtcontroller.py 的默认值保持一致；步数换算取自 self.calibration，与固件相同。
+
+FEED_RATE = 100
+XY_ACCELERATION = 2000
+MOTION_QUEUE_SIZE = 16
+AXIS_STEPS_PER_SECOND = 1000
+AXIS_ACCELERATION = 4000
+STATUS_INTERVAL = 0.05
+TELEMETRY_TICK = 0.005
+TELEMETRY_MIN_MS = 10
+HOMING_FAST_MM_S = 20
+HOMING_SLOW_MM_S = 2
+HOMING_BACKOFF_MM = 2
+
+IMMEDIATE_COMMANDS = ('up_light', 'up_light_on', 'up_light_off', 'down_light', 'down_light_on', 'down_light_off',
+                      'telemetry')
+
+
+def axis_time(steps):
+    """Z/R 单轴移动的耗时，秒"""
+    steps = abs(round(steps))
+    if steps == 0:
+        return 0.0
+    return plan_profile(steps, AXIS_STEPS_PER_SECOND, AXIS_ACCELERATION).duration
+
+
+class SimController:
+    """
+    模拟控制器
+
+    :param fd: pty 主端文件描述符
+    :param speedup: 时间加速倍数，运动耗时除以该值后再睡眠
+    """
+
+    def __init__(self, fd, speedup=1.0):
+        self.fd = fd
+        self.speedup = speedup
+        self.parser = FrameParser()
+        self.write_lock = threading.Lock()
+        self.cond = threading.Condition()
+        self.pending_frames = collections.deque()
+        self.last_seq = None
+        self.errors = 0
+        self.motion_queue = MotionQueue(MOTION_QUEUE_SIZE)
+        self.busy = False
+        self.x = self.y = self.z = self.r = 0.0
+        self.air_pump = self.up_light = self.down_light = 0
+        # 模拟控制器不读写 Flash，标定数据取默认值；回零后按它检查软限位
+        self.calibration = Calibration()
+        self.homed = 0
+        self.target_x = self.target_y = 0.0   # 包括前瞻队列中尚未执行的移动
+        self.motion_time = 0.0    # 累计运动时间（模拟时间），秒
+        self.telemetry_interval = 0   # 遥测周期 ms，0 关闭
+        self.telemetry_coalesced = 0  # 累计合并掉的遥测记录数
+        self.running = True
+        for target in (self._reader_loop, self._action_loop, self._status_loop, self._telemetry_loop):
+            threading.Thread(target=target, daemon=True).start()
+
+    def stop(self):
+        self.running = False
+        with self.cond:
+            self.cond.notify_all()
+
+    def _write(self, frame):
+        with self.write_lock:
+            os.write(self.fd, frame)
+
+    def _send_ack(self, seq, status):
+        self._write(encode_frame(seq, FRAME_ACK, struct.pack(ACK_FORMAT, status, len(self.pending_frames))))
+
+    def status_flags(self):
+        flags = 0
+        if self.busy or len(self.motion_queue):
+            flags |= STATUS_MOVING
+        if self.air_pump:
+            flags |= STATUS_AIR_PUMP
+        if self.up_light:
+            flags |= STATUS_UP_LIGHT
+        if self.down_light:
+            flags |= STATUS_DOWN_LIGHT
+        if self.homed & (HOME_X | HOME_Y | HOME_Z) == HOME_X | HOME_Y | HOME_Z:
+            flags |= STATUS_HOMED
+        return flags
+
+    def steps(self):
+        """A/B/Z/R 电机步数"""
+        cal = self.calibration
+        x = round(self.x * cal.steps_per_mm)
+        y = round(self.y * cal.steps_per_mm)
+        return x + y, x - y, round(self.z * cal.z_steps_per_mm), round(self.r * cal.r_steps_per_degree)
+
+    def status_payload(self):
+        return struct.pack(STATUS_FORMAT, self.status_flags(), len(self.motion_queue), len(self.pending_frames),
+                           self.errors & 0xFF, *self.steps())
+
+    def _reader_loop(self):
+        while self.running:
+            try:
+                data = os.read(self.fd, 4096)
+            except OSError:
+                break
+            self.parser.feed(data)
+            frame = self.parser.next_frame()
+            while frame is not None:
+                self._handle_frame(*frame)
+                frame = self.parser.next_frame()
+
+    def _handle_frame(self, seq, frame_type, payload):
+        # 与 SmtController.handle_frame 相同的接收规则
+        if seq is None:
+            self._write(encode_frame(self.last_seq or 0, FRAME_NAK))
+            return
+        if frame_type == FRAME_STATUS:
+            self._write(encode_frame(seq, FRAME_STATUS, self.status_payload()))
+            return
+        if frame_type == FRAME_CALIBRATION:
+            self._write(encode_frame(seq, FRAME_CALIBRATION, bytes(self.calibration.pack())))
+            return
+        if frame_type == FRAME_SYNC:
+            self.last_seq = seq
+            self._send_ack(seq, ACK_OK)
+            return
+        if self.last_seq is not None and seq != (self.last_seq + 1) & 0xFF:
+            if (self.last_seq - seq) & 0xFF < RESEND_WINDOW:
+                self._send_ack(seq, ACK_OK)
+            else:
+                self._write(encode_frame(self.last_seq, FRAME_NAK))
+            return
+        status = ACK_OK
+        try:
+            if frame_type == FRAME_BATCH:
+                for _ in iter_ops(payload):
+                    pass
+            elif frame_type != FRAME_TEXT:
+                status = ACK_ERROR
+        except ValueError:
+            status = ACK_ERROR
+        if status == ACK_OK:
+            with self.cond:
+                if len(self.pending_frames) >= PENDING_FRAMES:
+                    # 固件在这种情况下会暂缓接收，这里直接计为错误，便于发现上位机流控问题
+                    self.errors += 1
+                self.pending_frames.append((frame_type, payload))
+                self.cond.notify_all()
+        self.last_seq = seq
+        self._send_ack(seq, status)
+
+    def _action_loop(self):
+        while self.running:
+            with self.cond:
+                while self.running and not self.pending_frames and not len(self.motion_queue):
+                    self.cond.wait()
+                if not self.running:
+                    return
+                frame = self.pending_frames[0] if self.pending_frames else None
+            self.busy = True
+            if frame is None:
+                # 没有新命令时和固件的运动任务一样逐段消化前瞻队列
+                self._execute(self.motion_queue.pop())
+                self.busy = False
+                continue
+            frame_type, payload = frame
+            try:
+                if frame_type == FRAME_BATCH:
+                    for op, args in iter_ops(payload):
+                        self._run_action(OPS[op][0], args)
+                else:
+                    parts = payload.decode().split()
+                    if parts:
+                        self._run_action(parts[0], parts[1:])
+            except (TypeError, ValueError):
+                self.errors += 1
+            with self.cond:
+                self.pending_frames.popleft()
+            self.busy = False
+
+    def _sleep(self, seconds):
+        self.motion_time += seconds
+        if seconds > 0:
+            time.sleep(seconds / self.speedup)
+
+    def _execute(self, seg):
+        if seg is None:
+            return
+        duration = plan_profile(seg.length, seg.feed, seg.acceleration, seg.entry, seg.exit).duration
+        if seg.riders:
+            dz, dr = seg.riders
+            cal = self.calibration
+            duration = max(duration, axis_time(dz * cal.z_steps_per_mm), axis_time(dr * cal.r_steps_per_degree))
+            self.z += dz
+            self.r += dr
+        self._sleep(duration)
+        self.x += seg.dx
+        self.y += seg.dy
+
+    def _flush(self):
+        self.motion_queue.mark_stop()
+        while len(self.motion_queue):
+            self._execute(self.motion_queue.pop())
+
+    def _check_limits(self, x=None, y=None, z=None):
+        # 与 SmtController.check_limits 相同，只检查已回零的轴
+        cal = self.calibration
+        if x is not None and self.homed & HOME_X and not cal.x_min <= x <= cal.x_max:
+            raise ValueError("X soft limit")
+        if y is not None and self.homed & HOME_Y and not cal.y_min <= y <= cal.y_max:
+            raise ValueError("Y soft limit")
+        if z is not None and self.homed & HOME_Z and not cal.z_min <= z <= cal.z_max:
+            raise ValueError("Z soft limit")
+
+    def _home(self, axes):
+        axes = axes or HOME_ALL
+        cal = self.calibration
+        # 快速靠近，再以慢速走三段回零距离（退开、再靠近、离开开关）
+        self._sleep(max(abs(self.x - cal.home_x), abs(self.y - cal.home_y), abs(self.z - cal.home_z))
+                    / HOMING_FAST_MM_S + 3 * HOMING_BACKOFF_MM / HOMING_SLOW_MM_S)
+        if axes & HOME_Z:
+            self.z = cal.home_z - HOMING_BACKOFF_MM
+        if axes & HOME_X:
+            self.x = self.target_x = cal.home_x + HOMING_BACKOFF_MM
+        if axes & HOME_Y:
+            self.y = self.target_y = cal.home_y + HOMING_BACKOFF_MM
+        if axes & HOME_R:
+            self.r = 0.0
+        self.homed |= axes
+
+    def _run_action(self, name, args):
+        if name == 'move_xy':
+            dx, dy, feed = (list(map(float, args)) + [0.0])[:3]
+            self._check_limits(self.target_x + dx, self.target_y + dy)
+            self.target_x += dx
+            self.target_y += dy
+            if self.motion_queue.full:
+                self._execute(self.motion_queue.pop())
+            self.motion_queue.push(dx, dy, feed if feed > 0 else FEED_RATE, XY_ACCELERATION)
+            return
+        if name == 'move_xyzr' and any(map(float, args[:2])):
+            # 与固件一样带着 Z/R 进入前瞻队列，Z/R 与这一段 XY 同时运动
+            dx, dy, dz, dr = (list(map(float, args)) + [0.0, 0.0])[:4]
+            self._check_limits(self.target_x + dx, self.target_y + dy, self.z + dz)
+            self.target_x += dx
+            self.target_y += dy
+            if self.motion_queue.full:
+                self._execute(self.motion_queue.pop())
+            self.motion_queue.push(dx, dy, FEED_RATE, XY_ACCELERATION, riders=(dz, dr))
+            return
+        if name == 'telemetry':
+            interval = int(args[0]) if args else 0
+            self.telemetry_interval = max(interval, TELEMETRY_MIN_MS) if interval > 0 else 0
+            return
+        if name in IMMEDIATE_COMMANDS:
+            on = int(args[0]) if args else name.endswith('_on')
+            if name.startswith('up_light'):
+                self.up_light = 1 if on else 0
+            else:
+                self.down_light = 1 if on else 0
+            return
+        if name == 'calibrate':
+            self.calibration.set(args[0], args[1])
+            return
+        self._flush()
+        if name == 'home':
+            self._home(int(args[0]) if args else 0)
+        elif name == 'move_z':
+            dz = float(args[0])
+            self._check_limits(z=self.z + dz)
+            self._sleep(axis_time(dz * self.calibration.z_steps_per_mm))
+            self.z += dz
+        elif name == 'move_r':
+            dr = float(args[0])
+            self._sleep(axis_time(dr * self.calibration.r_steps_per_degree))
+            self.r += dr
+        elif name == 'move_xyzr':
+            # 没有 XY 移动，Z/R 同时运动，耗时取较长的一组
+            dz, dr = (list(map(float, args[2:])) + [0.0, 0.0])[:2]
+            self._check_limits(z=self.z + dz)
+            cal = self.calibration
+            self._sleep(max(axis_time(dz * cal.z_steps_per_mm), axis_time(dr * cal.r_steps_per_degree)))
+            self.z += dz
+            self.r += dr
+        elif name in ('air_pump', 'air_pump_on', 'air_pump_off'):
+            on = int(args[0]) if args else name == 'air_pump_on'
+            self.air_pump = 1 if on else 0
+        elif name in ('flush', 'step_backend', 'calibration', 'save_calibration'):
+            pass
+        else:
+            self.errors += 1
+
+    def _status_loop(self):
+        last = None
+        while self.running:
+            time.sleep(STATUS_INTERVAL)
+            payload = self.status_payload()
+            if payload != last:
+                self._write(encode_frame(0, FRAME_STATUS, payload))
+                last = payload
+
+    def _telemetry_loop(self):
+        # 与 SmtController.telemetry_task 相同：按固定节拍醒来并统计调度延迟，
+        # 到发送时刻有别的线程正在写串口时本条并入下一条
+        seq = 0
+        coalesced = 0
+        lags = []
+        due = time.monotonic()
+        while self.running:
+            interval = self.telemetry_interval / 1000
+            t0 = time.monotonic()
+            time.sleep(TELEMETRY_TICK)
+            now = time.monotonic()
+            if not interval:
+                lags.clear()
+                coalesced = 0
+                due = now
+                continue
+            lags.append(max(0.0, now - t0 - TELEMETRY_TICK) * 1e6)
+            if now < due:
+                continue
+            due += interval
+            if now >= due:
+                due = now + interval
+            if not self.write_lock.acquire(blocking=False):
+                coalesced += 1
+                self.telemetry_coalesced += 1
+                continue
+            try:
+                payload = struct.pack(TELEMETRY_FORMAT, self.status_flags(), len(self.motion_queue),
+                                      len(self.pending_frames), self.errors & 0xFF, *self.steps(),
+                                      int(now * 1000) & 0xFFFF, min(int(sum(lags) / len(lags)), 0xFFFF),
+                                      min(int(max(lags)), 0xFFFF), min(coalesced, 0xFFFF))
+                os.write(self.fd, encode_frame(seq, FRAME_TELEMETRY, payload))
+            finally:
+                self.write_lock.release()
+            seq = (seq + 1) & 0xFF
+            coalesced = 0
+            lags.clear()
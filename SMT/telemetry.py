@@ -0,0 +1,162 @@
+#file:c:\Codes\OSCproj\SMT\telemetry.py
+import os
+import struct
+import sys
+import threading
+import time
+
+import numpy as np
+
+# 帧协议与下位机共用同一份定义
+FIRMWARE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'esp32', 'SMT')
+if FIRMWARE_DIR not in sys.path:
+    sys.path.insert(0, FIRMWARE_DIR)
+
+from protocol import Batch, FRAME_BATCH, FRAME_TELEMETRY, TELEMETRY_FORMAT, OP_TELEMETRY
+
+# 控制器遥测的上位机端
+# 控制器开启遥测后按固定周期推送 FRAME_TELEMETRY（定长记录，见 protocol.TELEMETRY_FORMAT），
+# 在 UARTConnector 的读取线程里解码后写入一个预分配的 NumPy 环形缓冲区，
+# 界面和作业执行器可以随时取最近一条或最近一段，也可以订阅每一条新记录。
+
+TELEMETRY_DTYPE = np.dtype([
+    ('time', 'f8'),          # 上位机收到的时刻，time.monotonic()，秒
+    ('controller_ms', 'i8'), # 控制器时刻，ms，已展开 16 位回绕
+    ('flags', 'u1'),
+    ('queue', 'u1'),         # 前瞻队列段数
+    ('pending', 'u1'),       # 待执行帧数
+    ('errors', 'u1'),
+    ('a', 'i4'),             # A/B/Z/R 电机位置，步
+    ('b', 'i4'),
+    ('z', 'i4'),
+    ('r', 'i4'),
+    ('loop_avg', 'u2'),      # 控制器调度延迟，us
+    ('loop_max', 'u2'),
+    ('coalesced', 'u2'),     # 这条记录之前因串口忙而合并掉的记录数
+])
+
+
+def status_position(status, calibration):
+    """
+    把状态帧或遥测记录中的电机步数换算为 (X mm, Y mm, Z mm, R 度)，CoreXY：A = X + Y，B = X - Y
+
+    :param calibration: 控制器的标定数据，UARTConnector.request_calibration() 的结果
+    """
+    a, b, z, r = status[4:8]
+    spm = calibration.steps_per_mm
+    return ((a + b) / 2 / spm, (a - b) / 2 / spm, z / calibration.z_steps_per_mm, r / calibration.r_steps_per_degree)
+
+
+class TelemetryBuffer:
+    """
+    遥测记录的环形缓冲区
+
+    :param capacity: 保留的记录条数，写满后覆盖最旧的记录
+    """
+
+    def __init__(self, capacity=4096):
+        self.records = np.zeros(capacity, dtype=TELEMETRY_DTYPE)
+        self.capacity = capacity
+        self.count = 0           # 累计收到的记录数，写入位置为 count % capacity
+        self.lost = 0            # 按序号推算出的、串口上丢失的记录数
+        self.coalesced = 0       # 控制器累计合并掉的记录数
+        self.lock = threading.Lock()
+        self.callbacks = []
+        self.uart = None
+        self.last_seq = None
+        self.last_ms = None      # 上一条记录展开后的控制器时刻
+
+    def subscribe(self, callback):
+        """
+        注册回调，每收到一条记录在读取线程中以 callback(record) 调用，回调内不要阻塞
+
+        :param callback: 回调函数，record 为 TELEMETRY_DTYPE 的一行（numpy.void）
+        """
+        self.callbacks.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self.callbacks:
+            self.callbacks.remove(callback)
+
+    def attach(self, uart, interval_ms=20):
+        """
+        开始接收 uart 上的遥测，并让控制器按 interval_ms 推送
+
+        :param uart: 已连接的 UARTConnector
+        :param interval_ms: 遥测周期，毫秒
+        """
+        self.detach()
+        self.uart = uart
+        self.last_seq = None
+        self.last_ms = None
+        uart.subscribe(self.on_frame)
+        uart.post_frame(FRAME_BATCH, Batch().add(OP_TELEMETRY, interval_ms).payload)
+
+    def detach(self):
+        """关闭控制器的遥测并停止接收；串口已断开时只停止接收"""
+        uart = self.uart
+        if uart is None:
+            return
+        self.uart = None
+        uart.unsubscribe(self.on_frame)
+        try:
+            uart.post_frame(FRAME_BATCH, Batch().add(OP_TELEMETRY, 0).payload)
+        except ConnectionError:
+            pass
+
+    def on_frame(self, seq, frame_type, payload):
+        """UARTConnector 的帧回调"""
+        if frame_type != FRAME_TELEMETRY:
+            return
+        fields = struct.unpack(TELEMETRY_FORMAT, payload)
+        now = time.monotonic()
+        with self.lock:
+            if self.last_seq is not None:
+                self.lost += (seq - self.last_seq - 1) & 0xFF
+            self.last_seq = seq
+            # 控制器时刻只有低 16 位，按与上一条的差值展开
+            ms = fields[8]
+            if self.last_ms is None:
+                self.last_ms = ms
+            else:
+                self.last_ms += (ms - self.last_ms) & 0xFFFF
+            self.coalesced += fields[11]
+            index = self.count % self.capacity
+            self.records[index] = (now, self.last_ms) + fields[:8] + fields[9:]
+            self.count += 1
+            record = self.records[index].copy()
+        for callback in self.callbacks:
+            callback(record)
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def latest(self):
+        """最近一条记录，还没有收到时返回 None"""
+        with self.lock:
+            if not self.count:
+                return None
+            return self.records[(self.count - 1) % self.capacity].copy()
+
+    def snapshot(self, n=None):
+        """
+        按时间顺序返回最近 n 条记录的副本
+
+        :param n: 条数，默认为缓冲区中的全部记录
+        :return: TELEMETRY_DTYPE 数组
+        """
+        with self.lock:
+            size = len(self)
+            n = size if n is None else min(n, size)
+            end = self.count % self.capacity
+            if n <= end:
+                return self.records[end - n:end].copy()
+            return np.concatenate((self.records[end - n:], self.records[:end]))
+
+    def rate(self):
+        """最近一段记录的实际到达频率，Hz"""
+        records = self.snapshot(64)
+        if len(records) < 2:
+            return 0.0
+        span = records['time'][-1] - records['time'][0]
+        return (len(records) - 1) / span if span > 0 else 0.0
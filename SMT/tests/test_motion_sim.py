@@ -0,0 +1,116 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from motion_sim import simulate_table, simulate_xy, report
+from planner import (TRAPEZOID, SCURVE, MIN_INTERVAL_US, StepStream, plan_profile, profile_time, step_intervals,
+                     dda_times, dda_intervals, corexy_steps)
+
+KINDS = (TRAPEZOID, SCURVE)
+
+
+def exact_intervals(profile):
+    """逐步用解析式求时刻再取整求差，作为 StepStream 的参考"""
+    out = []
+    prev = 0
+    for i in range(profile.total_steps):
+        interval = max(int(profile_time(profile, i + 1) * 1000000 + 0.5) - prev, MIN_INTERVAL_US)
+        out.append(interval)
+        prev += interval
+    return out
+
+
+def random_profiles(n, seed=0):
+    """随机的移动参数，入口/出口速度与前瞻队列给出的一样，在这段距离内可以达到"""
+    rng = random.Random(seed)
+    while n:
+        steps, speed, accel = rng.randrange(1, 20000), rng.uniform(500, 25000), rng.uniform(1000, 400000)
+        start, end = rng.uniform(0, 10000), rng.uniform(0, 10000)
+        # S 曲线的加速距离是梯形的 1.5 倍，按 S 曲线的条件筛选
+        if abs(end * end - start * start) * 0.75 <= accel * steps:
+            n -= 1
+            yield steps, speed, accel, start, end
+
+
+@pytest.mark.parametrize('kind', KINDS)
+def test_step_count_and_duration(kind):
+    for args in random_profiles(50):
+        profile = plan_profile(*args, kind=kind)
+        table = step_intervals(profile)
+        assert len(table) == profile.total_steps
+        assert abs(sum(table) - profile.duration * 1e6) <= 1
+
+
+@pytest.mark.parametrize('kind', KINDS)
+def test_rate_limit(kind):
+    for steps, speed, accel, start, end in random_profiles(50, seed=1):
+        profile = plan_profile(steps, speed, accel, start, end, kind)
+        # 累计时间取整后单步间隔最多比理论值短 1 us
+        assert min(step_intervals(profile)) >= int(1e6 / speed) - 1
+
+
+@pytest.mark.parametrize('kind', KINDS)
+def test_stream_matches_closed_form(kind):
+    for args in random_profiles(100, seed=2):
+        profile = plan_profile(*args, kind=kind)
+        expected = exact_intervals(profile)
+        actual = list(step_intervals(profile))
+        drift = 0
+        for e, a in zip(expected, actual):
+            assert abs(e - a) <= 1
+            drift += a - e
+            assert abs(drift) <= 1
+
+
+def test_stream_chunks():
+    profile = plan_profile(5000, 20000, 80000, 1000, 0)
+    whole = list(step_intervals(profile))
+    stream = StepStream().start(profile)
+    buf = [0] * 256
+    chunks = []
+    n = stream.fill(buf)
+    while n:
+        chunks.extend(buf[:n])
+        n = stream.fill(buf)
+    assert chunks == whole
+    assert stream.remaining == 0 and stream.next() == 0
+
+
+def test_dda_minor_steps():
+    table = step_intervals(plan_profile(1000, 10000, 50000))
+    for minor in (0, 1, 3, 500, 999, 1000):
+        major_times, minor_times = dda_times(table, 1000, minor)
+        assert len(major_times) == 1000
+        assert len(minor_times) == minor
+        # 从轴只在主轴的步进时刻上走，步速不会超过主轴
+        assert set(minor_times) <= set(major_times)
+        assert list(dda_intervals(table, 1000, minor))[:minor] == [
+            b - a for a, b in zip([0] + minor_times, minor_times)]
+
+
+@pytest.mark.parametrize('dx, dy', [(10, 0), (0, -10), (7.3, 2.1), (-3.3, 12.8), (5, 5), (0.0125, 0)])
+def test_simulate_xy_steps(dx, dy):
+    result = simulate_xy(dx, dy)
+    a, b = corexy_steps(round(dx * 80), round(dy * 80))
+    assert (result['a'], result['b']) == (a, b)
+    assert result['a_steps'] == abs(a)
+    assert result['b_steps'] == abs(b)
+    # 两个电机同时开始，步数少的不会晚于步数多的结束
+    assert max(result['a_end_ms'], result['b_end_ms']) == pytest.approx(result['duration_ms'])
+    assert result['feed_mm_s'] <= 100 * 1.001
+
+
+def test_report_peak_within_limit():
+    profile = plan_profile(8000, 20000, 80000)
+    ideal, actual = simulate_table(step_intervals(profile), 8000)
+    stats = report(ideal, actual)
+    assert stats['steps'] == 8000
+    assert stats['peak_steps_per_sec'] <= 20000
+    # 轮询量化让个别实际间隔短于规划间隔，但每一步都不会早于规划时刻
+    assert stats['min_interval_us'] < 50
+    assert all(a >= i for i, a in zip(ideal, actual))
+    assert stats['jitter_max_us'] <= 12.0
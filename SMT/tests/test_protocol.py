@@ -0,0 +1,118 @@
+import os
+import struct
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'esp32', 'SMT'))
+
+from protocol import (Batch, FrameParser, encode_frame, iter_ops, FRAME_BATCH, FRAME_NAK, FRAME_STATUS, FRAME_TEXT,
+                      HEADER_SIZE, MAX_PAYLOAD, OP_MOVE_XY, OP_AIR_PUMP, OP_FLUSH, OP_SIZES, STATUS_FORMAT)
+
+
+def parse_all(parser):
+    frames = []
+    frame = parser.next_frame()
+    while frame is not None:
+        frames.append(frame)
+        frame = parser.next_frame()
+    return frames
+
+
+@pytest.mark.parametrize('payload', [b'', b'\x00', bytes(range(256)) * 4])
+def test_round_trip(payload):
+    parser = FrameParser()
+    parser.feed(encode_frame(300, FRAME_TEXT, payload))
+    # 序号只保留低 8 位
+    assert parse_all(parser) == [(300 & 0xFF, FRAME_TEXT, payload)]
+    assert parser.length == 0 and parser.crc_errors == 0
+
+
+def test_encode_rejects_large_payload():
+    with pytest.raises(ValueError):
+        encode_frame(0, FRAME_TEXT, bytes(MAX_PAYLOAD + 1))
+
+
+def test_crc_error_then_resync():
+    bad = encode_frame(1, FRAME_TEXT, b'hello')
+    bad[HEADER_SIZE] ^= 0x01
+    good = encode_frame(2, FRAME_STATUS, struct.pack(STATUS_FORMAT, 1, 2, 3, 4, 5, 6, 7, 8))
+    parser = FrameParser()
+    parser.feed(bytes(bad) + bytes(good))
+    assert parser.next_frame() == (None, FRAME_NAK, b'')
+    assert parser.crc_errors == 1
+    # 损坏帧的其余字节被当作杂散数据跳过，下一帧照常取出
+    assert parse_all(parser) == [(2, FRAME_STATUS, bytes(good[HEADER_SIZE:-2]))]
+
+
+def test_corrupt_length():
+    bad = bytearray(b'\xa5\x5a') + struct.pack('<HBB', MAX_PAYLOAD + 1, 0, FRAME_TEXT) + bytes(8)
+    parser = FrameParser()
+    parser.feed(bytes(bad) + bytes(encode_frame(3, FRAME_TEXT, b'ok')))
+    # 长度字段超出 MAX_PAYLOAD 时不等待后续数据，直接重新寻找同步字
+    assert parse_all(parser) == [(3, FRAME_TEXT, b'ok')]
+    assert parser.crc_errors == 1
+
+
+def test_split_feed():
+    data = bytes(encode_frame(4, FRAME_TEXT, b'split')) + bytes(encode_frame(5, FRAME_TEXT, b'frames'))
+    parser = FrameParser()
+    frames = []
+    for i in range(len(data)):
+        parser.feed(data[i:i + 1])
+        frames.extend(parse_all(parser))
+    assert frames == [(4, FRAME_TEXT, b'split'), (5, FRAME_TEXT, b'frames')]
+
+
+def test_feed_with_length():
+    frame = bytes(encode_frame(6, FRAME_TEXT, b'into'))
+    buf = bytearray(64)
+    buf[:len(frame)] = frame
+    parser = FrameParser()
+    parser.feed(buf, len(frame))
+    assert parse_all(parser) == [(6, FRAME_TEXT, b'into')]
+
+
+@pytest.mark.parametrize('keep_text', [False, True])
+def test_keep_text(keep_text):
+    parser = FrameParser(keep_text=keep_text)
+    parser.feed(b'ok\n' + bytes(encode_frame(7, FRAME_TEXT, b'x')) + b'done\n\xa5')
+    assert parse_all(parser) == [(7, FRAME_TEXT, b'x')]
+    if keep_text:
+        assert parser.text == b'ok\ndone\n'
+        assert parser.dropped == 0
+    else:
+        assert parser.text == b''
+        assert parser.dropped == len(b'ok\ndone\n')
+    # 末尾的 0xA5 可能是下一帧同步字的前半，留在缓冲区中
+    assert parser.length == 1
+
+
+def test_batch_round_trip():
+    batch = Batch().add(OP_MOVE_XY, 1.5, -2.0, 0.0).add(OP_FLUSH).add(OP_AIR_PUMP, 1)
+    assert len(batch) == 3
+    ops = list(iter_ops(batch.payload))
+    assert ops == [(OP_MOVE_XY, (1.5, -2.0, 0.0)), (OP_FLUSH, ()), (OP_AIR_PUMP, (1,))]
+    parser = FrameParser()
+    parser.feed(encode_frame(8, FRAME_BATCH, batch.payload))
+    assert parse_all(parser) == [(8, FRAME_BATCH, bytes(batch.payload))]
+
+
+def test_batch_full():
+    batch = Batch()
+    size = 1 + OP_SIZES[OP_MOVE_XY]
+    for _ in range(MAX_PAYLOAD // size):
+        batch.add(OP_MOVE_XY, 1.0, 1.0, 0.0)
+    assert not batch.fits(OP_MOVE_XY)
+    with pytest.raises(ValueError):
+        batch.add(OP_MOVE_XY, 1.0, 1.0, 0.0)
+    assert len(batch) == MAX_PAYLOAD // size
+    assert len(batch.payload) <= MAX_PAYLOAD
+
+
+def test_iter_ops_unknown_opcode():
+    payload = Batch().add(OP_AIR_PUMP, 0).payload + b'\xff'
+    ops = iter_ops(payload)
+    assert next(ops) == (OP_AIR_PUMP, (0,))
+    with pytest.raises(ValueError):
+        next(ops)
@@ -0,0 +1,64 @@
+import os
+import struct
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from telemetry import TelemetryBuffer, status_position
+from protocol import FRAME_STATUS, FRAME_TELEMETRY, TELEMETRY_FORMAT
+from calibration import Calibration
+
+
+def record(ms, coalesced=0, a=0, b=0):
+    return struct.pack(TELEMETRY_FORMAT, 1, 2, 3, 0, a, b, 400, 10, ms, 40, 90, coalesced)
+
+
+def test_record_fields():
+    buf = TelemetryBuffer(8)
+    buf.on_frame(0, FRAME_TELEMETRY, record(1000, a=160, b=-80))
+    latest = buf.latest()
+    assert latest['controller_ms'] == 1000
+    assert (latest['flags'], latest['queue'], latest['pending']) == (1, 2, 3)
+    assert (latest['a'], latest['b'], latest['z'], latest['r']) == (160, -80, 400, 10)
+    assert (latest['loop_avg'], latest['loop_max']) == (40, 90)
+    # 其他类型的帧不写入
+    buf.on_frame(1, FRAME_STATUS, b'')
+    assert len(buf) == 1
+
+
+def test_controller_ms_unwrap():
+    buf = TelemetryBuffer(8)
+    for seq, ms in enumerate((65000, 65500, 464, 1000)):
+        buf.on_frame(seq, FRAME_TELEMETRY, record(ms))
+    # 16 位时刻回绕后继续递增
+    assert list(buf.snapshot()['controller_ms']) == [65000, 65500, 65536 + 464, 65536 + 1000]
+
+
+def test_lost_and_coalesced():
+    buf = TelemetryBuffer(8)
+    seqs = (254, 255, 2, 3, 7)
+    for i, seq in enumerate(seqs):
+        buf.on_frame(seq, FRAME_TELEMETRY, record(i * 20, coalesced=i))
+    # 序号 8 位回绕：255 之后缺 0、1，3 之后缺 4、5、6
+    assert buf.lost == 5
+    assert buf.coalesced == sum(range(len(seqs)))
+    assert list(buf.snapshot()['coalesced']) == list(range(len(seqs)))
+
+
+def test_ring_overwrite():
+    buf = TelemetryBuffer(4)
+    for seq in range(10):
+        buf.on_frame(seq, FRAME_TELEMETRY, record(seq))
+    assert len(buf) == 4 and buf.count == 10 and buf.lost == 0
+    assert list(buf.snapshot()['controller_ms']) == [6, 7, 8, 9]
+    assert list(buf.snapshot(2)['controller_ms']) == [8, 9]
+
+
+def test_status_position():
+    calibration = Calibration()
+    x, y, z, r = status_position(struct.unpack(TELEMETRY_FORMAT, record(0, a=160, b=-80)), calibration)
+    assert (x, y) == pytest.approx((40 / calibration.steps_per_mm, 120 / calibration.steps_per_mm))
+    assert z == pytest.approx(400 / calibration.z_steps_per_mm)
+    assert r == pytest.approx(10 / calibration.r_steps_per_degree)
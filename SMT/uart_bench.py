@@ -0,0 +1,174 @@
+#file:c:\Codes\OSCproj\SMT\uart_bench.py
+import argparse
+import os
+import statistics
+import struct
+import threading
+import time
+import tty
+
+from uart_connector import UARTConnector
+from protocol import (FrameParser, encode_frame, FRAME_ACK, FRAME_STATUS, FRAME_TEXT, ACK_FORMAT, ACK_OK,
+                      STATUS_FORMAT)
+
+# 串口收发基准测试
+# 用伪终端（pty）对接一个模拟控制器，不需要真实硬件，只能在 Linux/macOS 上运行。
+#   往返：上位机逐条发送文本命令帧，等待应答后再发下一条
+#   帧流：模拟控制器连续发送状态帧，上位机后台线程解析后经回调送出
+#   文本行：模拟控制器连续发送文本行，分别用 read_until 和逐字节读取（原实现）接收
+
+
+class FakeController:
+    """在 pty 主端模拟控制器：收到帧立即应答，也可以主动发送状态帧或文本行"""
+
+    def __init__(self, fd):
+        self.fd = fd
+        self.parser = FrameParser()
+        self.running = True
+        self.send_times = []
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def _loop(self):
+        while self.running:
+            try:
+                data = os.read(self.fd, 4096)
+            except OSError:
+                break
+            self.parser.feed(data)
+            frame = self.parser.next_frame()
+            while frame is not None:
+                seq, frame_type, _ = frame
+                if frame_type == FRAME_STATUS:
+                    os.write(self.fd, encode_frame(seq, FRAME_STATUS, struct.pack(STATUS_FORMAT, 0, 0, 0, 0, 0, 0, 0, 0)))
+                else:
+                    os.write(self.fd, encode_frame(seq, FRAME_ACK, struct.pack(ACK_FORMAT, ACK_OK, 0)))
+                frame = self.parser.next_frame()
+
+    def stream_status(self, count):
+        """连续发送 count 个状态帧，A 位置字段携带序号，记录每帧的发送时间"""
+        self.send_times = [0.0] * count
+        for i in range(count):
+            self.send_times[i] = time.perf_counter()
+            os.write(self.fd, encode_frame(0, FRAME_STATUS, struct.pack(STATUS_FORMAT, 0, 0, 0, 0, i, 0, 0, 0)))
+
+    def stream_lines(self, count):
+        self.send_times = [0.0] * count
+        for i in range(count):
+            self.send_times[i] = time.perf_counter()
+            os.write(self.fd, f"line {i}\n".encode())
+
+
+def summarize(name, latencies, elapsed):
+    latencies = sorted(latencies)
+    count = len(latencies)
+    if count == 0:
+        print(f"{name}: 没有收到数据")
+        return
+    p99 = latencies[min(count - 1, int(count * 0.99))]
+    print(f"{name}: {count} 条, {count / elapsed:.0f} 条/秒, 延迟 平均 {statistics.mean(latencies) * 1e3:.3f} ms, "
+          f"中位 {statistics.median(latencies) * 1e3:.3f} ms, p99 {p99 * 1e3:.3f} ms")
+
+
+def bench_round_trip(uart, count):
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(count):
+        t0 = time.perf_counter()
+        uart.send_frame(FRAME_TEXT, b'noop')
+        latencies.append(time.perf_counter() - t0)
+    summarize("往返", latencies, time.perf_counter() - start)
+
+
+def bench_status_stream(uart, fake, count):
+    received = [0.0] * count
+    done = threading.Event()
+    got = [0]
+
+    def on_frame(seq, frame_type, payload):
+        if frame_type == FRAME_STATUS:
+            index = struct.unpack(STATUS_FORMAT, payload)[4]
+            received[index] = time.perf_counter()
+            got[0] += 1
+            if got[0] == count:
+                done.set()
+
+    uart.subscribe(on_frame)
+    start = time.perf_counter()
+    fake.stream_status(count)
+    done.wait(10)
+    elapsed = time.perf_counter() - start
+    uart.unsubscribe(on_frame)
+    summarize("帧流", [r - s for r, s in zip(received, fake.send_times) if r], elapsed)
+
+
+def bench_lines(uart, fake, count):
+    latencies = []
+    writer = threading.Thread(target=fake.stream_lines, args=(count,))
+    start = time.perf_counter()
+    writer.start()
+    for _ in range(count):
+        line = uart.read_until(timeout=5)
+        if line is None:
+            break
+        index = int(line.split()[1])
+        latencies.append(time.perf_counter() - fake.send_times[index])
+    writer.join()
+    summarize("文本行 read_until", latencies, time.perf_counter() - start)
+
+
+def legacy_read_until(connection, terminator=b'\n'):
+    """原 read_until 的实现：每字节一次 read(1) 并拼接 bytearray"""
+    data = bytearray()
+    while True:
+        byte = connection.read(1)
+        if byte:
+            data += byte
+            if data.endswith(terminator):
+                break
+        else:
+            break
+    return bytes(data).decode('utf-8')
+
+
+def bench_legacy_lines(uart, fake, count):
+    latencies = []
+    writer = threading.Thread(target=fake.stream_lines, args=(count,))
+    start = time.perf_counter()
+    writer.start()
+    for _ in range(count):
+        line = legacy_read_until(uart.serial_connection)
+        if not line:
+            break
+        index = int(line.split()[1])
+        latencies.append(time.perf_counter() - fake.send_times[index])
+    writer.join()
+    summarize("文本行 逐字节读取", latencies, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="UARTConnector pty 回环基准测试")
+    parser.add_argument('--count', type=int, default=2000, help="每项测试的消息数")
+    args = parser.parse_args()
+
+    master, slave = os.openpty()
+    tty.setraw(master)
+    fake = FakeController(master)
+    uart = UARTConnector(os.ttyname(slave))
+    uart.connect()
+
+    bench_round_trip(uart, args.count)
+    bench_status_stream(uart, fake, args.count)
+    bench_lines(uart, fake, args.count)
+
+    # 原实现需要独占串口，先停掉后台线程
+    uart.stop_reader()
+    fake.running = False
+    bench_legacy_lines(uart, fake, args.count)
+    uart.disconnect()
+    os.close(master)
+    os.close(slave)
+
+
+if __name__ == "__main__":
+    main()
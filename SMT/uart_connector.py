@@ -1,15 +1,37 @@
 #file:c:\Codes\OSCproj\SMT\uart_connector.py
+import collections
+import os
+import queue
+import struct
+import sys
+import threading
 import serial
 import time
 
+# 帧协议与下位机共用同一份定义
+FIRMWARE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'esp32', 'SMT')
+if FIRMWARE_DIR not in sys.path:
+    sys.path.insert(0, FIRMWARE_DIR)
+
+from protocol import (Batch, FrameParser, encode_frame, FRAME_BATCH, FRAME_ACK, FRAME_NAK, FRAME_TEXT,
+                      FRAME_STATUS, FRAME_SYNC, FRAME_CALIBRATION, PENDING_FRAMES, ACK_FORMAT, ACK_OK, STATUS_FORMAT,
+                      OP_MOVE_XY, OP_UP_LIGHT)
+from calibration import Calibration
+
+READ_POLL = 0.02     # 底层串口读超时，秒；只决定后台线程响应停止请求的速度
+LINE_QUEUE_SIZE = 1024
+STATUS_SIZE = struct.calcsize(STATUS_FORMAT)
+ACK_SIZE = struct.calcsize(ACK_FORMAT)
+
 class UARTConnector:
-    def __init__(self, port, baudrate=115200, timeout=1):
+    def __init__(self, port, baudrate=115200, timeout=1, verbose=False):
         """
         初始化UART连接器
 
         :param port: 串口号，例如 'COM3' 或 '/dev/ttyUSB0'
         :param baudrate: 波特率，默认为 115200
         :param timeout: 读取超时时间，默认为 1 秒
+        :param verbose: 是否打印每一条收发的数据，默认关闭
         :param parity: 校验位，默认为无校验 (serial.PARITY_NONE)
         :param stopbits: 停止位，默认为 1 (serial.STOPBITS_ONE)
         :param bytesize: 数据位，默认为 8 (serial.EIGHTBITS)
@@ -17,30 +39,207 @@ class UARTConnector:
         self.port = port
         self.baudrate = baudrate
         self.timeout = timeout
+        self.verbose = verbose
         self.serial_connection = None
+        # 二进制帧协议状态
+        self.parser = FrameParser(keep_text=True)
+        self.seq = 0
+        self.retries = 3          # 超时或 NAK 后连续重发的最大次数
+        self.ack_timeout = 0.5    # 等待应答的时间，秒
+        self.window = PENDING_FRAMES  # 未应答帧数 + 控制器待执行帧数的上限
+        self.status = None        # 最近一次收到的控制器状态，STATUS_FORMAT 解包后的元组
+        self.status_count = 0     # 收到的状态帧计数
+        self.calibration = None   # 最近一次收到的控制器标定数据，calibration.Calibration
+        self.calibration_count = 0
+        # 发送窗口：已发送未应答的帧按序号排列，应答按序确认，超时或 NAK 时全部重发
+        self.cond = threading.Condition()
+        self.in_flight = collections.OrderedDict()  # 序号 -> [帧, 最近一次发送时间]
+        self.ack_status = [ACK_OK] * 256
+        self.pending_frames = 0   # 控制器最近报告的待执行帧数
+        self.resend = False
+        self.attempts = 0
+        # 接收分发：文本行进 lines，所有帧交给 callbacks
+        self.lines = queue.Queue(LINE_QUEUE_SIZE)
+        self.callbacks = []
+        self.lines_dropped = 0
+        self.bad_frames = 0       # 负载长度不符的状态帧和应答帧，通常是固件与上位机的协议版本不一致
+        self.callback_errors = 0  # 帧回调抛出的异常，读取线程记录后继续运行
+        self.reader_thread = None
+        self.reader_running = False
+        self.parse_lock = threading.Lock()
 
-    def connect(self):
+    def connect(self, reader=True):
         """
         打开串口连接
+
+        :param reader: 是否启动后台读取线程，默认启动
         """
         try:
             self.serial_connection = serial.Serial(
                 port=self.port,
                 baudrate=self.baudrate,
-                timeout=self.timeout,
+                timeout=READ_POLL,
             )
             print(f"成功连接到 {self.port}")
         except serial.SerialException as e:
             print(f"连接失败: {e}")
+            return
+        if reader:
+            self.start_reader()
+        try:
+            self.sync()
+        except TimeoutError:
+            print("控制器无应答")
 
     def disconnect(self):
         """
         关闭串口连接
         """
+        self.stop_reader()
         if self.serial_connection and self.serial_connection.is_open:
             self.serial_connection.close()
             print(f"已断开 {self.port} 连接")
 
+    def start_reader(self):
+        """
+        启动后台读取线程
+
+        线程按 in_waiting 一次读入全部已到达的字节，帧与文本行的切分都在 FrameParser 的
+        缓冲区中完成，文本行通过 lines 队列、帧通过 subscribe 注册的回调送出，应答在内部确认发送窗口。
+        """
+        if self.reader_running or not self.serial_connection:
+            return
+        self.reader_running = True
+        self.reader_thread = threading.Thread(target=self._reader_loop, name="uart-reader", daemon=True)
+        self.reader_thread.start()
+
+    def stop_reader(self):
+        """
+        停止后台读取线程
+        """
+        self.reader_running = False
+        if self.reader_thread is not None:
+            self.reader_thread.join()
+            self.reader_thread = None
+
+    def subscribe(self, callback):
+        """
+        注册帧回调，在读取线程中以 callback(序号, 类型, 负载) 调用，回调内不要阻塞
+
+        :param callback: 回调函数
+        """
+        self.callbacks.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self.callbacks:
+            self.callbacks.remove(callback)
+
+    def _reader_loop(self):
+        connection = self.serial_connection
+        while self.reader_running:
+            try:
+                data = self._read_available(connection)
+            except (serial.SerialException, OSError, TypeError):
+                # 串口被拔出或在别处关闭
+                self.reader_running = False
+                break
+            if data:
+                self._feed(data)
+
+    @staticmethod
+    def _read_available(connection):
+        # 先阻塞读 1 字节（最多 READ_POLL），再把缓冲区里剩下的一次读完
+        data = connection.read(1)
+        if data:
+            waiting = connection.in_waiting
+            if waiting:
+                data += connection.read(waiting)
+        return data
+
+    def _feed(self, data):
+        with self.parse_lock:
+            parser = self.parser
+            parser.feed(data)
+            frame = parser.next_frame()
+            while frame is not None:
+                self._dispatch(frame)
+                frame = parser.next_frame()
+            if parser.text:
+                self._split_lines(parser.text)
+
+    def _split_lines(self, text):
+        start = 0
+        while True:
+            end = text.find(b'\n', start)
+            if end < 0:
+                break
+            line = bytes(text[start:end + 1]).decode('utf-8', 'replace')
+            start = end + 1
+            if self.verbose:
+                print(f"接收数据: {line}")
+            try:
+                self.lines.put_nowait(line)
+            except queue.Full:
+                self.lines_dropped += 1
+        del text[:start]
+
+    def _dispatch(self, frame):
+        seq, frame_type, payload = frame
+        if (frame_type == FRAME_STATUS and len(payload) != STATUS_SIZE) or \
+                (frame_type == FRAME_ACK and len(payload) != ACK_SIZE):
+            # 不解包也不交给回调，否则 struct.error 会结束读取线程
+            self.bad_frames += 1
+            if self.verbose:
+                print(f"帧 {seq} 类型 {frame_type} 负载长度 {len(payload)} 不符")
+            return
+        with self.cond:
+            if frame_type == FRAME_STATUS:
+                self.status = struct.unpack(STATUS_FORMAT, payload)
+                self.pending_frames = self.status[2]
+                self.status_count += 1
+            elif frame_type == FRAME_CALIBRATION:
+                calibration = Calibration()
+                try:
+                    calibration.unpack(payload)
+                except ValueError:
+                    # 固件版本不一致时不更新，request_calibration 会超时
+                    pass
+                else:
+                    self.calibration = calibration
+                    self.calibration_count += 1
+            elif frame_type == FRAME_ACK:
+                status, pending = struct.unpack(ACK_FORMAT, payload)
+                if seq in self.in_flight:
+                    # 控制器按顺序接收，某帧的应答同时确认了它之前的帧
+                    while self.in_flight:
+                        first = next(iter(self.in_flight))
+                        del self.in_flight[first]
+                        if first == seq:
+                            break
+                    self.ack_status[seq] = status
+                    self.pending_frames = pending
+                    self.attempts = 0
+            elif frame_type == FRAME_NAK:
+                self.resend = True
+            self.cond.notify_all()
+        for callback in tuple(self.callbacks):
+            try:
+                callback(seq, frame_type, payload)
+            except Exception as e:
+                # 回调的错误不能结束读取线程，否则之后的应答都收不到
+                self.callback_errors += 1
+                print(f"帧回调出错: {e!r}")
+
+    def _pump(self, deadline):
+        """没有后台线程时由调用方自己读串口，直到有数据或超时"""
+        if self.reader_running:
+            return
+        while time.monotonic() < deadline:
+            data = self._read_available(self.serial_connection)
+            if data:
+                self._feed(data)
+                return
+
     def send_data(self, data):
         """
         发送数据到串口
@@ -51,11 +250,12 @@ class UARTConnector:
             data = data.encode('utf-8')
         if self.serial_connection and self.serial_connection.is_open:
             self.serial_connection.write(data)
-            print(f"发送数据: {data}")
+            if self.verbose:
+                print(f"发送数据: {data}")
 
     def read_data(self, size=1):
         """
-        从串口读取数据
+        从串口读取原始数据，后台读取线程运行时不要使用
 
         :param size: 要读取的字节数，默认为 1
         :return: 读取到的数据（字符串）
@@ -63,33 +263,36 @@ class UARTConnector:
         if self.serial_connection and self.serial_connection.is_open:
             data = self.serial_connection.read(size)
             decoded_data = data.decode('utf-8')
-            print(f"接收数据: {decoded_data}")
+            if self.verbose:
+                print(f"接收数据: {decoded_data}")
             return decoded_data
         return None
 
-    def read_until(self, terminator=b'\n'):
+    def read_until(self, terminator=b'\n', timeout=None):
         """
-        从串口读取数据直到遇到指定的终止符
+        读取一行控制器输出的文本，帧数据不会混入其中
 
-        :param terminator: 终止符，默认为换行符 b'\n'
-        :return: 读取到的数据（字符串）
+        后台线程已经按行切分好，这里只是从队列中取出；没有后台线程时自行批量读取串口。
+        :param terminator: 行终止符，只支持换行符 b'\n'
+        :param timeout: 最长等待时间（秒），默认为 self.timeout，0 表示不等待
+        :return: 读取到的一行（字符串，包含终止符），超时返回 None
         """
+        if terminator != b'\n':
+            raise ValueError("只支持按换行符切分")
         if not self.serial_connection or not self.serial_connection.is_open:
             return None
-
-        data = bytearray()
+        if timeout is None:
+            timeout = self.timeout
+        deadline = time.monotonic() + timeout
         while True:
-            byte = self.serial_connection.read(1)
-            if byte:
-                data += byte
-                if data.endswith(terminator):
-                    break
-            else:
-                break
-
-        decoded_data = bytes(data).decode('utf-8')
-        print(f"接收数据: {decoded_data}")
-        return decoded_data
+            try:
+                if self.reader_running:
+                    return self.lines.get(timeout=max(0.0, deadline - time.monotonic()))
+                return self.lines.get_nowait()
+            except queue.Empty:
+                if time.monotonic() >= deadline:
+                    return None
+            self._pump(deadline)
 
     def flush_buffers(self):
         """
@@ -98,8 +301,166 @@ class UARTConnector:
         if self.serial_connection and self.serial_connection.is_open:
             self.serial_connection.reset_input_buffer()
             self.serial_connection.reset_output_buffer()
+            with self.parse_lock:
+                self.parser = FrameParser(keep_text=True)
+            while not self.lines.empty():
+                self.lines.get_nowait()
             print("已清空缓冲区")
 
+    def _retransmit(self):
+        """回退 N 帧：从最早未应答的帧起全部重发"""
+        self.resend = False
+        self.attempts += 1
+        if self.attempts > self.retries:
+            # 放弃整个窗口，之后的发送需要先 sync()
+            first = next(iter(self.in_flight))
+            self.in_flight.clear()
+            self.attempts = 0
+            raise TimeoutError(f"帧 {first} 未收到应答")
+        now = time.monotonic()
+        for entry in self.in_flight.values():
+            self.serial_connection.write(entry[0])
+            entry[1] = now
+
+    def _wait(self, predicate, timeout=None):
+        """
+        等待 predicate 成立，期间处理 NAK 与超时重发，调用时必须持有 self.cond
+
+        :return: 是否在 timeout 内成立，timeout 为 None 时一直等待
+        """
+        deadline = float('inf') if timeout is None else time.monotonic() + timeout
+        while not predicate():
+            now = time.monotonic()
+            wake = deadline
+            if self.in_flight:
+                expire = next(iter(self.in_flight.values()))[1] + self.ack_timeout
+                if self.resend or now >= expire:
+                    self._retransmit()
+                    expire = now + self.ack_timeout
+                wake = min(wake, expire)
+            else:
+                self.resend = False
+            if now >= deadline:
+                return False
+            if self.reader_running:
+                self.cond.wait(min(wake - now, self.ack_timeout))
+            else:
+                self._pump(min(wake, now + self.ack_timeout))
+        return True
+
+    def post_frame(self, frame_type, payload=b''):
+        """
+        发送一帧但不等待应答，用于连续下发
+
+        未应答帧数加上控制器待执行帧数达到 window 时先等待，保证控制器的待执行队列不会溢出。
+        :param frame_type: 帧类型，例如 FRAME_BATCH、FRAME_TEXT
+        :param payload: 帧负载
+        :return: 帧序号，配合 wait_acked 使用
+        """
+        if not self.serial_connection or not self.serial_connection.is_open:
+            raise ConnectionError(f"{self.port} 未连接")
+        with self.cond:
+            self._wait(lambda: len(self.in_flight) + self.pending_frames < self.window)
+            seq = self.seq
+            self.seq = (self.seq + 1) & 0xFF
+            frame = encode_frame(seq, frame_type, payload)
+            self.ack_status[seq] = ACK_OK
+            self.in_flight[seq] = [frame, time.monotonic()]
+            self.serial_connection.write(frame)
+            if self.verbose:
+                print(f"发送帧 {seq}: {len(payload)} 字节")
+            return seq
+
+    def wait_acked(self, seq=None, timeout=None):
+        """
+        等待指定帧被应答
+
+        :param seq: 帧序号，默认为全部已发送的帧
+        :param timeout: 最长等待时间（秒），默认一直等待；重发次数用尽时抛出 TimeoutError
+        :return: 应答状态，超时返回 None
+        """
+        with self.cond:
+            if seq is None:
+                done = self._wait(lambda: not self.in_flight, timeout)
+                return ACK_OK if done else None
+            if not self._wait(lambda: seq not in self.in_flight, timeout):
+                return None
+            return self.ack_status[seq]
+
+    def send_frame(self, frame_type, payload=b''):
+        """
+        发送一帧并等待应答，超时或收到 NAK 时重发
+
+        :param frame_type: 帧类型，例如 FRAME_BATCH、FRAME_TEXT
+        :param payload: 帧负载
+        :return: 应答状态，ACK_OK 表示控制器已接受；重发次数用尽时抛出 TimeoutError
+        """
+        return self.wait_acked(self.post_frame(frame_type, payload))
+
+    def sync(self):
+        """
+        让控制器从本连接的序号重新计数，连接后自动调用一次
+
+        :return: 应答状态
+        """
+        with self.cond:
+            self.in_flight.clear()
+            self.pending_frames = 0
+            self.attempts = 0
+        return self.send_frame(FRAME_SYNC)
+
+    def send_batch(self, batch):
+        """
+        把一批操作打包成一帧发送，一次往返完成多条移动与 IO 操作
+
+        :param batch: protocol.Batch
+        :return: 应答状态
+        """
+        return self.send_frame(FRAME_BATCH, batch.payload)
+
+    def request_status(self, timeout=None):
+        """
+        请求控制器状态，状态请求不占用帧序号
+
+        :param timeout: 最长等待时间（秒），默认为 ack_timeout
+        :return: (状态位, 前瞻队列段数, 待执行帧数, 错误计数, A, B, Z, R 位置)，超时抛出 TimeoutError
+        """
+        if not self.serial_connection or not self.serial_connection.is_open:
+            raise ConnectionError(f"{self.port} 未连接")
+        with self.cond:
+            count = self.status_count
+            self.serial_connection.write(encode_frame(0, FRAME_STATUS))
+            if not self._wait(lambda: self.status_count != count,
+                              self.ack_timeout if timeout is None else timeout):
+                raise TimeoutError("状态请求未收到应答")
+            return self.status
+
+    def request_calibration(self, timeout=None):
+        """
+        读取控制器的标定数据（步数、相机偏移等），请求不占用帧序号
+
+        :param timeout: 最长等待时间（秒），默认为 ack_timeout
+        :return: calibration.Calibration，超时抛出 TimeoutError
+        """
+        if not self.serial_connection or not self.serial_connection.is_open:
+            raise ConnectionError(f"{self.port} 未连接")
+        with self.cond:
+            count = self.calibration_count
+            self.serial_connection.write(encode_frame(0, FRAME_CALIBRATION))
+            if not self._wait(lambda: self.calibration_count != count,
+                              self.ack_timeout if timeout is None else timeout):
+                raise TimeoutError("标定数据请求未收到应答")
+            return self.calibration
+
+    def send_command(self, command):
+        """
+        用帧发送一行文本命令，例如 'step_backend rmt'
+
+        :param command: 文本命令
+        :return: 应答状态
+        """
+        return self.send_frame(FRAME_TEXT, command.encode('utf-8'))
+
 # 示例用法
 if __name__ == "__main__":
     uart = UARTConnector(
@@ -108,8 +469,15 @@ if __name__ == "__main__":
         timeout=1,
     )
     uart.connect()
+    uart.subscribe(lambda seq, frame_type, payload: frame_type == FRAME_STATUS and print(f"状态: {uart.status}"))
 
-    while True:
-        received_data = uart.read_until()
-        time.sleep(1)
-    uart.disconnect()
\ No newline at end of file
+    batch = Batch()
+    batch.add(OP_UP_LIGHT, 1)
+    for _ in range(4):
+        batch.add(OP_MOVE_XY, 10.0, 0.0, 0.0)
+        batch.add(OP_MOVE_XY, -10.0, 0.0, 0.0)
+    status = uart.send_batch(batch)
+    print(f"应答: {'成功' if status == ACK_OK else '失败'}, 待执行 {uart.pending_frames} 帧")
+    while (line := uart.read_until(timeout=2)) is not None:
+        print(line, end='')
+    uart.disconnect()
@@ -0,0 +1,397 @@
+#file:c:\Codes\OSCproj\SMT\vision.py
+import argparse
+import math
+import os
+import time
+
+import cv2
+import numpy as np
+
+from layout import UP_CAMERA_SCALE, DOWN_CAMERA_SCALE, FIDUCIAL_DIAMETER
+
+# 视觉
+# 仰视相机：吸嘴吸着元件经过相机上方时拍照，求元件相对吸嘴中心的偏移和角度误差，贴装前补偿；
+# 俯视相机：对准板上的 Mark 点，求电路板在工作台上的平移和旋转。
+# 处理都在灰度图上做：Otsu 二值化 → 外轮廓（比连通域标记快一个数量级）→ 用 NumPy 向量化
+# 按面积、长宽比、填充率筛选候选，单帧耗时在毫秒级，可以在贴片头飞往贴装点的途中完成。
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff')
+CLOSE_KERNEL = cv2.getStructuringElement(cv2.MORPH_RECT, (7, 7))
+
+
+def to_gray(frame, out=None):
+    """转为灰度图，out 为可复用的输出缓冲区"""
+    if frame.ndim == 2:
+        if out is None:
+            return frame
+        np.copyto(out, frame)
+        return out
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=out)
+
+
+class CameraSource:
+    """
+    OpenCV 摄像头
+
+    :param index: 摄像头编号
+    :param width: 期望的分辨率，None 表示使用默认值
+    """
+
+    def __init__(self, index=0, width=None, height=None):
+        self.capture = cv2.VideoCapture(index)
+        if not self.capture.isOpened():
+            raise OSError(f"无法打开摄像头 {index}")
+        if width:
+            self.capture.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        if height:
+            self.capture.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        self.frame = None
+
+    def read(self, out=None):
+        """读取一帧灰度图，out 为可复用的输出缓冲区"""
+        ok, frame = self.capture.read(self.frame)
+        if not ok:
+            raise OSError("读取摄像头失败")
+        self.frame = frame
+        return to_gray(frame, out)
+
+    def close(self):
+        self.capture.release()
+
+
+class ReplaySource:
+    """
+    回放图片或视频，离线测试用
+
+    :param path: 单张图片、图片目录（按文件名排序）或视频文件
+    :param loop: 播放完后从头开始
+    """
+
+    def __init__(self, path, loop=True):
+        self.loop = loop
+        self.images = None
+        self.capture = None
+        self.index = 0
+        self.frame = None
+        if os.path.isdir(path):
+            names = sorted(name for name in os.listdir(path) if name.lower().endswith(IMAGE_EXTENSIONS))
+            self.images = [os.path.join(path, name) for name in names]
+        elif path.lower().endswith(IMAGE_EXTENSIONS):
+            self.images = [path]
+        else:
+            self.capture = cv2.VideoCapture(path)
+            if not self.capture.isOpened():
+                raise OSError(f"无法打开视频 {path}")
+        if self.images is not None:
+            # 图片全部预先读入，回放时不受磁盘速度影响
+            self.images = [cv2.imread(name, cv2.IMREAD_GRAYSCALE) for name in self.images]
+            if not self.images:
+                raise OSError(f"{path} 中没有图片")
+
+    def read(self, out=None):
+        if self.images is not None:
+            if self.index >= len(self.images):
+                if not self.loop:
+                    raise EOFError
+                self.index = 0
+            frame = self.images[self.index]
+            self.index += 1
+            if out is None:
+                return frame.copy()
+            np.copyto(out, frame)
+            return out
+        ok, frame = self.capture.read(self.frame)
+        if not ok and self.loop:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self.capture.read(self.frame)
+        if not ok:
+            raise EOFError
+        self.frame = frame
+        return to_gray(frame, out)
+
+    def close(self):
+        if self.capture is not None:
+            self.capture.release()
+
+
+def open_source(spec):
+    """'0'、'1' 等数字打开摄像头，其余按文件路径回放"""
+    if spec is None:
+        return None
+    if str(spec).isdigit():
+        return CameraSource(int(spec))
+    return ReplaySource(spec)
+
+
+def _contours(gray, close=False):
+    """Otsu 二值化后取外轮廓，返回 (轮廓列表, 面积数组, 外框数组 (N, 4))"""
+    _, mask = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    if close:
+        cv2.morphologyEx(mask, cv2.MORPH_CLOSE, CLOSE_KERNEL, dst=mask)
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    areas = np.array([cv2.contourArea(contour) for contour in contours]).reshape(-1)
+    boxes = np.array([cv2.boundingRect(contour) for contour in contours], dtype=float).reshape(-1, 4)
+    return contours, areas, boxes
+
+
+def find_fiducials(gray, diameter_px, tolerance=0.4):
+    """
+    寻找圆形 Mark 点
+
+    :param gray: 灰度图，Mark 点比周围亮
+    :param diameter_px: Mark 点直径，像素
+    :param tolerance: 面积、长宽比的允许偏差
+    :return: (N, 2) 数组，各 Mark 点的亚像素中心
+    """
+    contours, area, boxes = _contours(gray)
+    width = boxes[:, 2]
+    height = boxes[:, 3]
+    expected = math.pi / 4 * diameter_px * diameter_px
+    fill = area / np.maximum(width * height, 1.0)
+    keep = ((np.abs(area - expected) <= tolerance * expected)
+            & (np.abs(width - height) <= tolerance * np.maximum(width, height))
+            & (np.abs(fill - math.pi / 4) <= 0.15))
+    centers = np.empty((int(keep.sum()), 2))
+    for row, index in enumerate(np.flatnonzero(keep)):
+        m = cv2.moments(contours[index])
+        centers[row] = (m['m10'] / m['m00'], m['m01'] / m['m00'])
+    return centers
+
+
+def nearest_to_center(points, shape):
+    """取离图像中心最近的点，没有时返回 None"""
+    if len(points) == 0:
+        return None
+    center = np.array((shape[1] / 2, shape[0] / 2))
+    return points[np.argmin(((points - center) ** 2).sum(axis=1))]
+
+
+def find_part(gray, min_area=100):
+    """
+    求仰视相机中元件的中心和角度
+
+    元件本体和焊端在环形光下比背景亮；闭运算把焊端和本体连成一块后取面积最大的轮廓，
+    用最小外接矩形求中心和角度，对正方形封装也有确定的角度。
+
+    :return: (中心 x, 中心 y, 角度)，像素坐标，角度为图像坐标系中的度数，折算到 (-45, 45]；
+             找不到元件时返回 None
+    """
+    contours, areas, _ = _contours(gray, close=True)
+    if len(areas) == 0:
+        return None
+    best = int(np.argmax(areas))
+    if areas[best] < min_area:
+        return None
+    rect = cv2.minAreaRect(contours[best])
+    box = cv2.boxPoints(rect)
+    # 不依赖 OpenCV 各版本 minAreaRect 的角度约定，直接由矩形的一条边求角度
+    edge = box[1] - box[0]
+    angle = (math.degrees(math.atan2(edge[1], edge[0])) + 45.0) % 90.0 - 45.0
+    return rect[0][0], rect[0][1], angle
+
+
+def part_offset(gray, scale=UP_CAMERA_SCALE):
+    """
+    元件相对吸嘴中心（图像中心）的偏移，机器坐标
+
+    :return: (dx mm, dy mm, dr 度)，找不到元件时返回 None
+    """
+    found = find_part(gray)
+    if found is None:
+        return None
+    cx, cy, angle = found
+    height, width = gray.shape
+    # 图像 y 向下、机器 Y 向上，角度方向同样相反
+    return (cx - width / 2) * scale, (height / 2 - cy) * scale, -angle
+
+
+def fiducial_offset(gray, scale=DOWN_CAMERA_SCALE, diameter=FIDUCIAL_DIAMETER):
+    """
+    离俯视相机中心最近的 Mark 点相对中心的偏移，机器坐标
+
+    :return: (dx mm, dy mm)，找不到时返回 None
+    """
+    point = nearest_to_center(find_fiducials(gray, diameter / scale), gray.shape)
+    if point is None:
+        return None
+    height, width = gray.shape
+    return (point[0] - width / 2) * scale, (height / 2 - point[1]) * scale
+
+
+def placement_correction(offset):
+    """
+    由仰视相机测得的偏差求贴装补偿
+
+    吸嘴先转 -dr 抵消角度误差，元件相对吸嘴的偏移随之转动，再平移抵消该偏移。
+
+    :param offset: part_offset 的结果
+    :return: (dx mm, dy mm, dr 度)，加到贴装移动上
+    """
+    dx, dy, dr = offset
+    theta = math.radians(-dr)
+    c = math.cos(theta)
+    s = math.sin(theta)
+    return -(c * dx - s * dy), -(s * dx + c * dy), -dr
+
+
+def fit_transform(nominal, measured):
+    """
+    由 Mark 点的理论位置和实测位置求电路板的刚体变换（旋转 + 平移），最小二乘
+
+    :param nominal: (N, 2) 理论坐标
+    :param measured: (N, 2) 实测坐标；只有一个点时只求平移
+    :return: 2x3 变换矩阵
+    """
+    nominal = np.asarray(nominal, dtype=float).reshape(-1, 2)
+    measured = np.asarray(measured, dtype=float).reshape(-1, 2)
+    a_mean = nominal.mean(axis=0)
+    b_mean = measured.mean(axis=0)
+    a = nominal - a_mean
+    b = measured - b_mean
+    h = a.T @ b
+    theta = math.atan2(h[0, 1] - h[1, 0], h[0, 0] + h[1, 1]) if len(nominal) > 1 else 0.0
+    rotation = np.array(((math.cos(theta), -math.sin(theta)), (math.sin(theta), math.cos(theta))))
+    return np.hstack((rotation, (b_mean - rotation @ a_mean)[:, None]))
+
+
+def apply_transform(matrix, points):
+    """对 (N, 2) 坐标做 2x3 变换"""
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    return points @ matrix[:, :2].T + matrix[:, 2]
+
+
+class Vision:
+    """
+    两台相机的拍照与测量，帧缓冲区在第一次拍照时分配，之后重复使用
+
+    :param up_source: 仰视相机帧源（CameraSource / ReplaySource），可为 None
+    :param down_source: 俯视相机帧源
+    """
+
+    def __init__(self, up_source=None, down_source=None, up_scale=UP_CAMERA_SCALE, down_scale=DOWN_CAMERA_SCALE):
+        self.up_source = up_source
+        self.down_source = down_source
+        self.up_scale = up_scale
+        self.down_scale = down_scale
+        self.up_frame = None
+        self.down_frame = None
+        self.misses = 0
+
+    def capture_up(self):
+        self.up_frame = self.up_source.read(self.up_frame)
+        return self.up_frame
+
+    def capture_down(self):
+        self.down_frame = self.down_source.read(self.down_frame)
+        return self.down_frame
+
+    def part_correction(self, frame):
+        """由仰视相机的一帧求贴装补偿，找不到元件时不补偿并计数"""
+        offset = part_offset(frame, self.up_scale)
+        if offset is None:
+            self.misses += 1
+            return 0.0, 0.0, 0.0
+        return placement_correction(offset)
+
+    def fiducial(self):
+        """拍一帧俯视图，返回最近 Mark 点的偏移，找不到时返回 None"""
+        return fiducial_offset(self.capture_down(), self.down_scale)
+
+    def close(self):
+        for source in (self.up_source, self.down_source):
+            if source is not None:
+                source.close()
+
+
+def _fixed(points):
+    """浮点坐标转为 4 位小数的定点数，配合绘图函数的 shift=4 画出亚像素精度的图形"""
+    return np.round(points * 16).astype(np.int32)
+
+
+def render_part(shape, center, angle, size, rng, noise=8.0):
+    """合成一张仰视相机图像：暗背景上一个带两端焊盘的矩形元件，angle 为图像坐标系中的度数"""
+    image = np.full(shape, 30, dtype=np.uint8)
+    cv2.fillConvexPoly(image, _fixed(cv2.boxPoints((center, size, angle))), 150, lineType=cv2.LINE_AA, shift=4)
+    for end in (-1, 1):
+        # 焊端：矩形长边两端各占 1/5
+        rad = math.radians(angle)
+        offset = end * size[0] * 0.4
+        pad = ((center[0] + offset * math.cos(rad), center[1] + offset * math.sin(rad)), (size[0] * 0.2, size[1]), angle)
+        cv2.fillConvexPoly(image, _fixed(cv2.boxPoints(pad)), 230, lineType=cv2.LINE_AA, shift=4)
+    image = image + rng.normal(0, noise, shape)
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+
+def render_fiducials(shape, points, diameter, rng, noise=8.0):
+    """合成一张俯视相机图像：阻焊背景上若干 Mark 点，另加一些干扰焊盘"""
+    image = np.full(shape, 60, dtype=np.uint8)
+    for _ in range(6):
+        x, y = rng.integers(0, shape[1]), rng.integers(0, shape[0])
+        cv2.rectangle(image, (int(x), int(y)), (int(x + diameter * 1.5), int(y + diameter * 0.6)), 200, -1)
+    for x, y in points:
+        cv2.circle(image, tuple(int(v) for v in _fixed(np.array((x, y)))), int(round(diameter * 8)), 210, -1,
+                   lineType=cv2.LINE_AA, shift=4)
+    image = image + rng.normal(0, noise, shape)
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+
+def bench(frames, function, *args):
+    """对每帧调用 function，返回 (ms/帧, 结果列表)"""
+    results = []
+    start = time.perf_counter()
+    for frame in frames:
+        results.append(function(frame, *args))
+    return (time.perf_counter() - start) * 1000 / len(frames), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="视觉处理基准测试")
+    parser.add_argument('--frames', type=int, default=200, help="合成帧数")
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--replay', help="改为处理图片/视频文件")
+    parser.add_argument('--mode', choices=('part', 'fiducial'), default='part', help="回放文件时的处理方式")
+    args = parser.parse_args()
+
+    if args.replay:
+        source = ReplaySource(args.replay, loop=False)
+        frames = []
+        try:
+            while True:
+                frames.append(source.read())
+        except EOFError:
+            pass
+        if args.mode == 'part':
+            ms, results = bench(frames, part_offset)
+        else:
+            ms, results = bench(frames, fiducial_offset)
+        found = [result for result in results if result is not None]
+        print(f"{len(frames)} 帧, {ms:.2f} ms/帧, 找到 {len(found)} 帧")
+        for result in found[:10]:
+            print("  " + ", ".join(f"{value:.3f}" for value in result))
+        return
+
+    rng = np.random.default_rng(0)
+    shape = (args.height, args.width)
+    size = (1.6 / UP_CAMERA_SCALE, 0.8 / UP_CAMERA_SCALE)   # 0603 元件
+    truth = [(args.width / 2 + rng.uniform(-40, 40), args.height / 2 + rng.uniform(-40, 40), rng.uniform(-20, 20))
+             for _ in range(args.frames)]
+    frames = [render_part(shape, (x, y), angle, size, rng) for x, y, angle in truth]
+    ms, results = bench(frames, find_part)
+    errors = np.array([(r[0] - x, r[1] - y, r[2] - angle) for r, (x, y, angle) in zip(results, truth) if r])
+    print(f"元件 {args.width}x{args.height}: {ms:.2f} ms/帧, 找到 {len(errors)}/{len(frames)}, "
+          f"位置误差 {np.hypot(errors[:, 0], errors[:, 1]).max():.2f} px, 角度误差 {np.abs(errors[:, 2]).max():.2f}°")
+
+    diameter = FIDUCIAL_DIAMETER / DOWN_CAMERA_SCALE
+    truth = [(args.width / 2 + rng.uniform(-60, 60), args.height / 2 + rng.uniform(-60, 60))
+             for _ in range(args.frames)]
+    frames = [render_fiducials(shape, [point], diameter, rng) for point in truth]
+    ms, results = bench(frames, find_fiducials, diameter)
+    errors = np.array([np.hypot(*(nearest_to_center(r, shape) - point)) for r, point in zip(results, truth)
+                       if len(r)])
+    print(f"Mark 点 {args.width}x{args.height}: {ms:.2f} ms/帧, 找到 {len(errors)}/{len(frames)}, "
+          f"位置误差 {errors.max():.2f} px")
+
+
+if __name__ == "__main__":
+    main()
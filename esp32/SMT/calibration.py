@@ -0,0 +1,100 @@
+import os
+import struct
+
+from protocol import crc16
+
+# 机器标定数据
+# 保存在控制器 Flash 的一个小二进制文件里，上电读取，控制器复位后不需要重新标定。
+# 文件格式：魔数 + 版本 + 定长字段（CALIBRATION_FORMAT）+ CRC16，字段顺序固定，增加字段时升版本号；
+# 读取失败（文件不存在、长度或 CRC 不对、版本不符）时使用默认值。
+# 写入先写临时文件再改名，掉电时最多丢失本次修改，不会留下半个文件。
+# 本文件同时可以在 CPython 上运行，上位机可以用它生成或检查标定文件。
+
+CALIBRATION_FILE = '/calibration.bin'
+MAGIC = b'SMTC'
+VERSION = 1
+
+# 字段名与格式，按文件中的顺序排列；默认值与 smtcontroller.py 的常量一致
+FIELDS = (
+    ('steps_per_mm', 'f', 80.0),              # XY 步/mm
+    ('z_steps_per_mm', 'f', 400.0),           # Z 步/mm
+    ('r_steps_per_degree', 'f', 200 * 16 / 360),
+    ('home_x', 'f', 0.0),                     # 各轴限位开关触发点的机器坐标，mm
+    ('home_y', 'f', 0.0),
+    ('home_z', 'f', 0.0),
+    ('x_min', 'f', 0.0),                      # 软限位，机器坐标 mm，回零之后才检查
+    ('x_max', 'f', 300.0),
+    ('y_min', 'f', 0.0),
+    ('y_max', 'f', 300.0),
+    ('z_min', 'f', -20.0),
+    ('z_max', 'f', 0.0),
+    ('camera_dx', 'f', -30.0),                # 俯视相机中心相对吸嘴的偏移，mm
+    ('camera_dy', 'f', 0.0),
+    ('home_on_boot', 'B', 0),                 # 1 表示上电后自动回零
+)
+
+CALIBRATION_FORMAT = '<4sH' + ''.join(fmt for _, fmt, _ in FIELDS)
+CALIBRATION_SIZE = struct.calcsize(CALIBRATION_FORMAT)
+
+
+class Calibration:
+    """标定数据，字段见 FIELDS，均为普通属性"""
+
+    def __init__(self):
+        for name, _, default in FIELDS:
+            setattr(self, name, default)
+
+    def set(self, name, value):
+        """按字段名修改一项，供文本命令使用；未知字段抛出 ValueError"""
+        for field, fmt, _ in FIELDS:
+            if field == name:
+                setattr(self, name, int(value) if fmt == 'B' else float(value))
+                return
+        raise ValueError("unknown calibration field " + name)
+
+    def pack(self):
+        data = bytearray(CALIBRATION_SIZE + 2)
+        struct.pack_into(CALIBRATION_FORMAT, data, 0, MAGIC, VERSION, *[getattr(self, name) for name, _, _ in FIELDS])
+        struct.pack_into('<H', data, CALIBRATION_SIZE, crc16(data, 0, CALIBRATION_SIZE))
+        return data
+
+    def unpack(self, data):
+        """从字节串恢复，格式不对时抛出 ValueError，原有的值不变"""
+        if len(data) != CALIBRATION_SIZE + 2:
+            raise ValueError("bad calibration size")
+        if struct.unpack_from('<H', data, CALIBRATION_SIZE)[0] != crc16(data, 0, CALIBRATION_SIZE):
+            raise ValueError("bad calibration crc")
+        values = struct.unpack_from(CALIBRATION_FORMAT, data, 0)
+        if values[0] != MAGIC or values[1] != VERSION:
+            raise ValueError("bad calibration version")
+        for (name, _, _), value in zip(FIELDS, values[2:]):
+            setattr(self, name, value)
+
+    def load(self, path=CALIBRATION_FILE):
+        """
+        读取标定文件
+
+        :return: 是否读取成功，失败时保持默认值
+        """
+        # save 在删除旧文件与改名之间掉电时只剩临时文件
+        for name in (path, path + '.tmp'):
+            try:
+                with open(name, 'rb') as f:
+                    self.unpack(f.read())
+                return True
+            except (OSError, ValueError):
+                pass
+        return False
+
+    def save(self, path=CALIBRATION_FILE):
+        temp = path + '.tmp'
+        with open(temp, 'wb') as f:
+            f.write(self.pack())
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        os.rename(temp, path)
+
+    def items(self):
+        return [(name, getattr(self, name)) for name, _, _ in FIELDS]
@@ -1,13 +1,10 @@
+import asyncio
 from smtcontroller import *
 def main():
     controller = SmtController()
-    
-    while True:
-
-        time.sleep(1)
-        controller.process_command()
-
+    # 命令接收、执行、运动、状态上报都在 SmtController.run 的任务中完成
+    asyncio.run(controller.run())
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
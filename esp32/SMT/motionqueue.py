@@ -0,0 +1,169 @@
+import math
+
+# 前瞻运动队列
+# 缓存若干段 XY 移动一起规划：相邻两段之间按拐角偏差（junction deviation）算出允许的
+# 过渡速度，再做一次反向、一次正向扫描，保证每一段都能在自身长度内加速/减速到位。
+# 只有路径反向、或者该段之后吸嘴要动作（stop）时才会减速到 0。
+# 本模块不依赖 machine，PC 端仿真直接导入。
+
+JUNCTION_DEVIATION = 0.05  # 拐角允许偏离理想路径的距离，mm
+
+
+class Segment:
+    """一段直线移动，速度单位 mm/s，加速度 mm/s²"""
+
+    def __init__(self):
+        self.dx = 0.0
+        self.dy = 0.0
+        self.length = 0.0
+        self.ux = 0.0
+        self.uy = 0.0
+        self.feed = 0.0
+        self.acceleration = 0.0
+        self.max_entry = 0.0   # 拐角限制的最大入口速度
+        self.entry = 0.0       # 规划后的入口速度
+        self.exit = 0.0        # 规划后的出口速度
+        self.stop = False      # 该段结束后必须停稳（吸嘴动作）
+        self.riders = ()       # 跟随本段一起移动的其他轴，内容由调用方决定，队列不解读
+
+    def set(self, dx, dy, feed, acceleration, stop, riders=()):
+        self.dx = dx
+        self.dy = dy
+        self.length = math.sqrt(dx * dx + dy * dy)
+        self.ux = dx / self.length
+        self.uy = dy / self.length
+        self.feed = feed
+        self.acceleration = acceleration
+        self.stop = stop
+        self.riders = riders
+        self.max_entry = 0.0
+        self.entry = 0.0
+        self.exit = 0.0
+
+
+def junction_speed(prev, seg, deviation=JUNCTION_DEVIATION):
+    """
+    按拐角偏差计算两段之间允许的最大过渡速度。
+
+    把拐角看成与两段都相切、偏离拐点 deviation 的圆弧，
+    以向心加速度不超过 acceleration 求速度。直线延续时只受两段进给速度限制，
+    完全反向时为 0。
+    """
+    limit = min(prev.feed, seg.feed)
+    cos_theta = -(prev.ux * seg.ux + prev.uy * seg.uy)
+    if cos_theta > 0.999999:
+        return 0.0
+    if cos_theta < -0.999999:
+        return limit
+    sin_half = math.sqrt(0.5 * (1.0 - cos_theta))
+    v2 = seg.acceleration * deviation * sin_half / (1.0 - sin_half)
+    return min(limit, math.sqrt(v2))
+
+
+class MotionQueue:
+    """
+    固定容量的环形段队列。
+
+    Segment 对象在构造时一次性分配并循环复用。
+    队首的段一旦被取出执行，它的出口速度就确定下来，作为后续段的入口速度锁定；
+    因为规划总是假设队尾要停下，新加入的段只会放宽约束，锁定值始终可达。
+    """
+
+    def __init__(self, size=16, deviation=JUNCTION_DEVIATION):
+        self.size = size
+        self.deviation = deviation
+        self.buffer = [Segment() for _ in range(size)]
+        self.head = 0
+        self.count = 0
+        self.last = None           # 最近加入的段，用于计算拐角
+        self.locked_speed = 0.0    # 正在执行的段的出口速度
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def full(self):
+        return self.count >= self.size
+
+    def push(self, dx, dy, feed, acceleration, stop=False, riders=()):
+        """
+        加入一段移动并重新规划整个队列。
+
+        :param stop: 该段结束后必须停稳，例如要开关气泵或移动 Z 轴
+        :param riders: 与本段同时开始的其他轴移动，原样保存在 Segment.riders 中
+        :return: 是否加入成功，队列满时返回 False
+        """
+        if self.full:
+            return False
+        if dx == 0 and dy == 0:
+            # 零长度段没有方向，只需要把停止标记传给上一段
+            if stop and self.last is not None:
+                self.mark_stop()
+            return True
+        seg = self.buffer[(self.head + self.count) % self.size]
+        seg.set(dx, dy, feed, acceleration, stop, riders)
+        prev = self.last
+        if prev is not None and not prev.stop:
+            seg.max_entry = junction_speed(prev, seg, self.deviation)
+        self.count += 1
+        self.last = seg
+        self.recalculate()
+        return True
+
+    def mark_stop(self):
+        """让最近加入的段结束后停稳，下一段从 0 开始加速"""
+        if self.last is not None:
+            self.last.stop = True
+            self.recalculate()
+
+    def pop(self):
+        """
+        取出队首段交给执行器，同时锁定它的出口速度。
+
+        :return: Segment，队列为空时返回 None。返回的对象在再次 push 覆盖前保持有效
+        """
+        if self.count == 0:
+            return None
+        seg = self.buffer[self.head]
+        self.head = (self.head + 1) % self.size
+        self.count -= 1
+        self.locked_speed = seg.exit
+        if self.count == 0:
+            # 队列排空后最后一段按出口速度 0 规划，下一段必须从静止开始
+            self.last = None
+            self.locked_speed = 0.0
+        return seg
+
+    def recalculate(self):
+        """反向扫描限制减速距离，正向扫描限制加速距离"""
+        size = self.size
+        buffer = self.buffer
+        n = self.count
+        if n == 0:
+            return
+        # 反向：假设队尾停下，每段入口速度不能超过在本段长度内减速到下一段入口的速度
+        next_entry = 0.0
+        for k in range(n - 1, -1, -1):
+            seg = buffer[(self.head + k) % size]
+            exit_speed = 0.0 if seg.stop else next_entry
+            seg.exit = exit_speed
+            reachable = math.sqrt(exit_speed * exit_speed + 2 * seg.acceleration * seg.length)
+            entry = seg.max_entry if seg.max_entry < reachable else reachable
+            seg.entry = entry
+            next_entry = entry
+        # 正向：队首入口锁定为正在执行段的出口速度，再限制每段能加速到的出口速度
+        first = buffer[self.head]
+        entry = self.locked_speed
+        for k in range(n):
+            seg = buffer[(self.head + k) % size]
+            if k == 0:
+                seg.entry = entry if entry < first.feed else first.feed
+            reachable = math.sqrt(seg.entry * seg.entry + 2 * seg.acceleration * seg.length)
+            if seg.exit > reachable:
+                seg.exit = reachable
+            if k + 1 < n:
+                nxt = buffer[(self.head + k + 1) % size]
+                if nxt.entry > seg.exit:
+                    nxt.entry = seg.exit
+                else:
+                    seg.exit = nxt.entry
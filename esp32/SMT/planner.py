@@ -0,0 +1,329 @@
+from array import array
+import math
+
+# 运动规划器
+# 每次移动在开始前算好 加速/匀速/减速 曲线的参数（Profile），执行时由 StepStream 按步依次
+# 给出整数微秒的步进间隔，后端边执行边取，不再为整个移动展开一张每步 4 字节的间隔表。
+# 逐步计算只有几次乘加和一次除法，没有开方。
+# 本模块不依赖 machine，可以直接在 PC 上导入做仿真。
+
+TRAPEZOID = 0  # 梯形速度曲线（恒加速度）
+SCURVE = 1     # S 曲线（smoothstep 速度过渡，加速度连续）
+
+# S 曲线在峰值加速度相同的情况下，加速段距离是梯形的 1.5 倍
+_RAMP_FACTOR = {TRAPEZOID: 0.5, SCURVE: 0.75}
+
+MIN_INTERVAL_US = 4  # 步进间隔下限，保证驱动器能识别脉冲
+EXACT_SPEED_FACTOR = 100  # 速度的平方低于 加速度 × 该值 时按解析式开方，否则递推（见 StepStream）
+NEWTON_ITERATIONS = 8  # S 曲线求逆的最大迭代次数
+
+
+def zeros(n, typecode='I'):
+    """
+    分配长度为 n 的零数组。
+
+    MicroPython 的 array 不支持乘法，而 bytes 初始化在 MicroPython 上是按原始内存拷贝、
+    在 CPython 上是逐元素转换，两边行为不同，这里用 range 构造以保证两边都是 n 个元素。
+    """
+    buf = array(typecode, range(n))
+    for i in range(n):
+        buf[i] = 0
+    return buf
+
+
+class Profile:
+    """一次移动的速度曲线参数，单位均为 步 与 步/秒"""
+
+    def __init__(self, total_steps, peak_speed, start_speed, end_speed,
+                 accel_steps, decel_steps, acceleration, kind):
+        self.total_steps = total_steps
+        self.peak_speed = peak_speed
+        self.start_speed = start_speed
+        self.end_speed = end_speed
+        self.accel_steps = accel_steps
+        self.decel_steps = decel_steps
+        self.acceleration = acceleration
+        self.kind = kind
+        # 各阶段耗时只算一次，逐步计算间隔时直接使用
+        self.accel_time = _ramp_time(accel_steps, start_speed, peak_speed, acceleration, kind)
+        self.decel_time = _ramp_time(decel_steps, end_speed, peak_speed, acceleration, kind)
+        self.cruise_time = self.cruise_steps / peak_speed if peak_speed > 0 else 0.0
+
+    @property
+    def duration(self):
+        """整个移动的理论耗时，秒"""
+        return self.accel_time + self.cruise_time + self.decel_time
+
+    @property
+    def cruise_steps(self):
+        return self.total_steps - self.accel_steps - self.decel_steps
+
+    def __repr__(self):
+        return "Profile(steps={}, peak={:.1f}, accel={:.1f}, cruise={:.1f}, decel={:.1f})".format(
+            self.total_steps, self.peak_speed, self.accel_steps, self.cruise_steps, self.decel_steps)
+
+
+def _ramp_time(distance, v_low, v_high, acceleration, kind, guess=None):
+    """
+    计算从 v_low 加速到 v_high 的过程中，走过 distance 步所需的时间（秒）。
+
+    梯形曲线有解析解；S 曲线的位移是时间的四次多项式，用牛顿迭代求逆。
+    guess 为时间的初值，逐步计算时传入相邻一步的时间，一般一两次迭代即收敛。
+    """
+    if distance <= 0:
+        return 0.0
+    if kind == TRAPEZOID:
+        return (math.sqrt(v_low * v_low + 2 * acceleration * distance) - v_low) / acceleration
+
+    dv = v_high - v_low
+    if dv <= 0:
+        return distance / v_high
+    ramp_t = 1.5 * dv / acceleration
+    if guess is not None and guess > 0:
+        t = guess
+    elif v_low > 0:
+        # 按匀速估计
+        t = distance / v_low
+        if t > ramp_t:
+            t = ramp_t
+    else:
+        # 从静止起步时位移近似为三次项
+        t = ramp_t * math.pow(distance / (dv * ramp_t), 1 / 3)
+    for _ in range(NEWTON_ITERATIONS):
+        u = t / ramp_t
+        s = v_low * t + dv * ramp_t * (u * u * u - 0.5 * u * u * u * u)
+        v = v_low + dv * (3 * u * u - 2 * u * u * u)
+        if v <= 0:
+            break
+        delta = (s - distance) / v
+        t -= delta
+        if -1e-9 < delta < 1e-9:
+            break
+    return t
+
+
+def plan_profile(total_steps, max_speed, acceleration, start_speed=0, end_speed=0, kind=TRAPEZOID):
+    """
+    根据步数、最大速度和加速度计算速度曲线。
+
+    :param total_steps: 总步数
+    :param max_speed: 最大速度，步/秒
+    :param acceleration: 加速度，步/秒²
+    :param start_speed: 起始速度，步/秒
+    :param end_speed: 结束速度，步/秒
+    :param kind: TRAPEZOID 或 SCURVE
+    :return: Profile 对象
+    """
+    if acceleration <= 0:
+        raise ValueError("acceleration must be > 0")
+    factor = _RAMP_FACTOR[kind]
+    start_speed = min(start_speed, max_speed)
+    end_speed = min(end_speed, max_speed)
+    peak = max_speed
+    accel_steps = factor * (peak * peak - start_speed * start_speed) / acceleration
+    decel_steps = factor * (peak * peak - end_speed * end_speed) / acceleration
+    if accel_steps + decel_steps > total_steps:
+        # 距离不够加速到最大速度，退化为三角形曲线
+        peak_sq = (acceleration * total_steps / factor + start_speed * start_speed + end_speed * end_speed) / 2
+        peak = math.sqrt(max(peak_sq, start_speed * start_speed, end_speed * end_speed))
+        accel_steps = max(0.0, factor * (peak * peak - start_speed * start_speed) / acceleration)
+        decel_steps = max(0.0, total_steps - accel_steps)
+    return Profile(total_steps, peak, start_speed, end_speed, accel_steps, decel_steps, acceleration, kind)
+
+
+def profile_time(profile, step):
+    """返回曲线上第 step 步（可以是小数）所处的时间，单位秒"""
+    a = profile.acceleration
+    kind = profile.kind
+    peak = profile.peak_speed
+    if step <= profile.accel_steps:
+        return _ramp_time(step, profile.start_speed, peak, a, kind)
+    cruise_end = profile.total_steps - profile.decel_steps
+    if step <= cruise_end:
+        return profile.accel_time + (step - profile.accel_steps) / peak
+    # 减速段与从 end_speed 加速到 peak 的过程时间对称
+    remaining = _ramp_time(profile.total_steps - step, profile.end_speed, peak, a, kind)
+    return profile.duration - remaining
+
+
+class StepStream:
+    """
+    按步依次产生一次移动的步进间隔（微秒）。
+
+    后端每走一步取一个（next），或者按块取（fill），一次移动只占用几个标量，与步数无关。
+    梯形曲线加减速段第 s 步的时刻为 (v(s) - v_low) / a，其中 v(s)² = v_low² + 2as 直接算出，
+    v(s) 由上一步的速度按 sqrt(1 + x) 的级数展开得到，每步一次除法、没有开方；
+    速度很低（v² < EXACT_SPEED_FACTOR·a，每段最多五十来步）时级数误差大，改用开方。
+    速度平方每步都重新计算，级数误差只影响当前一步，不会逐步累积。
+    S 曲线以上一步的时刻为初值做牛顿迭代求逆。
+    匀速段和每个阶段的起点都取 Profile 中的解析时刻，误差不会跨阶段累积。
+    与逐步解析计算相比误差在 1 微秒以内；同样按累计时间取整再求差，舍入误差不累积。
+    """
+
+    def __init__(self):
+        self.profile = None
+        self.count = 0       # 总步数
+        self.index = 0       # 已经产生的步数
+        self.prev_us = 0     # 已经产生的间隔之和
+        self.phase = -1      # 上一步所在的阶段：0 加速、1 匀速、2 减速
+        self.speed = 0.0     # 上一步在所在阶段的速度（梯形）或阶段内时间（S 曲线）
+        self.ramp_dt = 0.0   # S 曲线上一步的阶段内时间增量，作为下一步的初值
+
+    @property
+    def remaining(self):
+        return self.count - self.index
+
+    def start(self, profile):
+        """从头开始产生 profile 的步进间隔"""
+        self.profile = profile
+        self.count = profile.total_steps
+        self.index = 0
+        self.prev_us = 0
+        self.phase = -1
+        return self
+
+    def _ramp(self, phase, distance, v_low):
+        """阶段内走过 distance 步的时间，相邻两步在同一阶段时用上一步的结果递推"""
+        p = self.profile
+        a = p.acceleration
+        same = self.phase == phase
+        self.phase = phase
+        if p.kind != TRAPEZOID:
+            guess = None
+            if same:
+                guess = self.speed + self.ramp_dt if phase == 0 else self.speed - self.ramp_dt
+            t = _ramp_time(distance, v_low, p.peak_speed, a, p.kind, guess)
+            if same:
+                self.ramp_dt = t - self.speed if phase == 0 else self.speed - t
+            else:
+                self.ramp_dt = 0.0
+            self.speed = t
+            return t
+        v_sq = v_low * v_low + 2 * a * distance
+        v = self.speed
+        if same and v > 0 and v_sq >= EXACT_SPEED_FACTOR * a:
+            # v = v前·sqrt(1 + 2h)，展开到 h² 项，误差约为 v·h³/2
+            h = (v_sq - v * v) / (2 * v * v)
+            v = v * (1 + h - 0.5 * h * h)
+        else:
+            v = math.sqrt(v_sq)
+        self.speed = v
+        return (v - v_low) / a
+
+    def next(self):
+        """下一步的间隔，微秒；已经走完时返回 0"""
+        i = self.index + 1
+        p = self.profile
+        if i > self.count:
+            return 0
+        self.index = i
+        if i <= p.accel_steps:
+            t = self._ramp(0, i, p.start_speed)
+        elif i <= p.total_steps - p.decel_steps:
+            self.phase = 1
+            t = p.accel_time + (i - p.accel_steps) / p.peak_speed
+        else:
+            # 减速段与从 end_speed 加速到 peak 的过程时间对称
+            t = p.duration - self._ramp(2, p.total_steps - i, p.end_speed)
+        interval = int(t * 1000000 + 0.5) - self.prev_us
+        if interval < MIN_INTERVAL_US:
+            interval = MIN_INTERVAL_US
+        self.prev_us += interval
+        return interval
+
+    def fill(self, out, n=None):
+        """
+        把接下来的间隔依次写入 out
+
+        :param n: 最多写入的个数，默认为 len(out)
+        :return: 实际写入的个数，已经走完时为 0
+        """
+        if n is None or n > len(out):
+            n = len(out)
+        if n > self.count - self.index:
+            n = self.count - self.index
+        for k in range(n):
+            out[k] = self.next()
+        return n
+
+
+def step_intervals(profile, out=None):
+    """
+    把速度曲线展开为每一步的间隔表（微秒），供 PC 端仿真与检查使用，固件执行时用 StepStream 逐步取。
+
+    :param out: 可选的预分配 array('I')，长度不小于 total_steps 时直接复用
+    :return: array('I')，第 i 个元素是第 i 步相对上一步（或起点）的等待时间
+    """
+    n = profile.total_steps
+    if out is None or len(out) < n:
+        out = zeros(n)
+    StepStream().start(profile).fill(out, n)
+    return out
+
+
+def plan_steps(total_steps, max_speed, acceleration, start_speed=0, end_speed=0, kind=TRAPEZOID, out=None):
+    """plan_profile + step_intervals 的便捷组合，返回步进间隔表"""
+    profile = plan_profile(total_steps, max_speed, acceleration, start_speed, end_speed, kind)
+    return step_intervals(profile, out)
+
+
+def corexy_steps(x, y):
+    """
+    CoreXY 运动学：笛卡尔坐标（步）换算为 A/B 电机坐标（步）。
+
+    a = x + y, b = x - y
+    """
+    return x + y, x - y
+
+
+def corexy_position(a, b):
+    """corexy_steps 的逆变换，返回 (x, y)，单位与输入一致"""
+    return (a + b) / 2, (a - b) / 2
+
+
+def dda_times(table, count, minor):
+    """
+    Bresenham/DDA 插补的纯 Python 模型，供 PC 上验证步数与时序。
+
+    主轴按间隔表走 count 步，从轴在主轴的步进时刻上按误差累加器插入 minor 步，
+    两个电机在同一时刻结束。固件中的 run_dda 与这里的累加规则完全一致。
+
+    :return: (主轴每步时间列表, 从轴每步时间列表)，单位微秒
+    """
+    major_times = []
+    minor_times = []
+    err = count >> 1
+    t = 0
+    for i in range(count):
+        t += table[i]
+        major_times.append(t)
+        err += minor
+        if err >= count:
+            err -= count
+            minor_times.append(t)
+    return major_times, minor_times
+
+
+def dda_intervals(table, count, minor, out=None):
+    """
+    把 DDA 插补后从轴的步进时刻换算成从轴自己的间隔表（微秒）。
+
+    与 dda_times 的累加规则一致，供需要每个电机独立脉冲序列的后端（如 RMT）使用。
+    :param out: 可选的预分配 array('I')，长度不小于 minor 时直接复用
+    :return: array('I')，前 minor 个元素有效
+    """
+    if out is None or len(out) < minor:
+        out = zeros(minor)
+    err = count >> 1
+    t = 0
+    last = 0
+    j = 0
+    for i in range(count):
+        t += table[i]
+        err += minor
+        if err >= count:
+            err -= count
+            out[j] = t - last
+            last = t
+            j += 1
+    return out
@@ -0,0 +1,268 @@
+import struct
+from array import array
+
+# 上位机与控制器之间的二进制帧协议
+# 本文件同时运行在 MicroPython（控制器）和 CPython（上位机，SMT/uart_connector.py）上，
+# 只使用两边都有的 struct/array，两端共用同一份定义。
+#
+# 帧格式（多字节字段均为小端）：
+#   0xA5 0x5A | 长度 u16 | 序号 u8 | 类型 u8 | 负载 | CRC16 u16
+# 长度为负载字节数，CRC16-CCITT 覆盖 长度、序号、类型、负载。
+#
+# FRAME_BATCH 的负载是若干条操作依次排列，每条为 操作码 u8 + 固定长度参数，
+# 一帧可以携带一整批移动与 IO 操作。控制器收下一帧（放入待执行队列）后回复 FRAME_ACK。
+# 上位机可以连续发送多帧（回退 N 帧）：控制器只按序号顺序接收，CRC 错误或缺帧时回复
+# FRAME_NAK（序号为最后接收的帧），上位机从下一帧起全部重发；收到已接收过的序号只补发应答。
+# FRAME_SYNC 让控制器无条件以该帧序号重新开始计数，上位机连接后先发一次。
+# 待执行队列最多 PENDING_FRAMES 帧，应答和状态帧都带有当前的待执行帧数，
+# 上位机据此保证 未应答帧数 + 待执行帧数 不超过 PENDING_FRAMES。
+# FRAME_TELEMETRY 是控制器按固定周期主动推送的定长遥测记录，用 OP_TELEMETRY 开关，
+# 序号为记录计数（上位机据此统计丢失），串口发送忙时本周期的记录与下一条合并，不排队。
+# FRAME_CALIBRATION 与状态请求一样不占用序号，上位机用回复中的步数换算位置、用相机偏移定位。
+
+SYNC = b'\xa5\x5a'
+HEADER_SIZE = 6    # 同步字 + 长度 + 序号 + 类型
+CRC_SIZE = 2
+MAX_PAYLOAD = 1024
+
+FRAME_BATCH = 0x01   # 一批操作
+FRAME_ACK = 0x02     # 应答，负载 ACK_FORMAT
+FRAME_NAK = 0x03     # 校验失败，请求重发
+FRAME_TEXT = 0x04    # 一行文本命令，沿用原来的文本命令表
+FRAME_STATUS = 0x05  # 上位机发空负载请求状态；控制器回复或在状态变化时主动发送，负载 STATUS_FORMAT
+FRAME_SYNC = 0x06    # 重新同步序号
+FRAME_TELEMETRY = 0x07  # 控制器周期推送的遥测记录，负载 TELEMETRY_FORMAT
+FRAME_CALIBRATION = 0x08  # 上位机发空负载请求标定数据，控制器回复 calibration.Calibration.pack() 的内容
+
+PENDING_FRAMES = 4   # 控制器待执行帧队列的容量
+RESEND_WINDOW = 16   # 落后最后接收序号不超过该值的帧视为重发
+
+ACK_FORMAT = '<BB'   # 状态、待执行帧数
+ACK_OK = 0
+ACK_ERROR = 1
+
+# 状态位、前瞻队列段数、待执行帧数、错误计数、A/B/Z/R 电机位置（步）
+STATUS_FORMAT = '<BBBBiiii'
+STATUS_MOVING = 0x01
+STATUS_AIR_PUMP = 0x02
+STATUS_UP_LIGHT = 0x04
+STATUS_DOWN_LIGHT = 0x08
+STATUS_HOMED = 0x10      # 已回零，位置为机器坐标，软限位生效
+
+# 遥测记录：前 8 个字段与 STATUS_FORMAT 相同，其后为控制器时刻 ms（低 16 位）、
+# 本周期调度延迟的平均值与最大值 us、自上一条记录以来因串口忙而合并掉的记录数
+TELEMETRY_FORMAT = '<BBBBiiiiHHHH'
+TELEMETRY_SIZE = struct.calcsize(TELEMETRY_FORMAT)
+
+# 操作码 -> (命令名, 参数格式)，命令名与 SmtController.commands 一致
+OP_MOVE_XY = 0x10
+OP_MOVE_Z = 0x11
+OP_MOVE_R = 0x12
+OP_MOVE_XYZR = 0x13
+OP_FLUSH = 0x20
+OP_HOME = 0x21
+OP_AIR_PUMP = 0x30
+OP_UP_LIGHT = 0x31
+OP_DOWN_LIGHT = 0x32
+OP_TELEMETRY = 0x40
+
+OPS = {
+    OP_MOVE_XY: ('move_xy', '<fff'),        # dx mm, dy mm, 进给 mm/s（0 表示默认）
+    OP_MOVE_Z: ('move_z', '<f'),            # dz mm
+    OP_MOVE_R: ('move_r', '<f'),            # dr 度
+    OP_MOVE_XYZR: ('move_xyzr', '<ffff'),   # dx, dy, dz, dr
+    OP_FLUSH: ('flush', '<'),
+    OP_HOME: ('home', '<B'),                # 回零的轴，HOME_X/Y/Z/R 按位或，0 表示全部
+    OP_AIR_PUMP: ('air_pump', '<B'),        # 1 开 0 关
+    OP_UP_LIGHT: ('up_light', '<B'),
+    OP_DOWN_LIGHT: ('down_light', '<B'),
+    OP_TELEMETRY: ('telemetry', '<H'),      # 遥测周期 ms，0 关闭
+}
+
+HOME_X = 0x01
+HOME_Y = 0x02
+HOME_Z = 0x04
+HOME_R = 0x08
+HOME_ALL = HOME_X | HOME_Y | HOME_Z | HOME_R
+
+OP_SIZES = {op: struct.calcsize(fmt) for op, (_, fmt) in OPS.items()}
+
+
+def _make_crc_table():
+    table = array('H', range(256))
+    for i in range(256):
+        crc = i << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else (crc << 1)
+        table[i] = crc & 0xFFFF
+    return table
+
+
+_CRC_TABLE = _make_crc_table()
+
+
+def crc16(data, start=0, end=None, crc=0xFFFF):
+    """CRC16-CCITT（多项式 0x1021，初值 0xFFFF），查表计算"""
+    table = _CRC_TABLE
+    if end is None:
+        end = len(data)
+    for i in range(start, end):
+        crc = ((crc << 8) & 0xFFFF) ^ table[((crc >> 8) ^ data[i]) & 0xFF]
+    return crc
+
+
+def pack_frame(frame, seq, frame_type, length):
+    """
+    在预分配的缓冲区中原地补全帧头和 CRC，负载须已写在 frame[HEADER_SIZE:] 处
+
+    控制器周期发送的帧用它复用同一块缓冲区，不在每次发送时分配内存。
+    """
+    frame[0] = 0xA5
+    frame[1] = 0x5A
+    struct.pack_into('<HBB', frame, 2, length, seq & 0xFF, frame_type)
+    struct.pack_into('<H', frame, HEADER_SIZE + length, crc16(frame, 2, HEADER_SIZE + length))
+    return frame
+
+
+def encode_frame(seq, frame_type, payload=b''):
+    """把负载打包成一帧完整的字节串"""
+    length = len(payload)
+    if length > MAX_PAYLOAD:
+        raise ValueError("payload too large")
+    frame = bytearray(HEADER_SIZE + length + CRC_SIZE)
+    frame[HEADER_SIZE:HEADER_SIZE + length] = payload
+    return pack_frame(frame, seq, frame_type, length)
+
+
+class Batch:
+    """按操作码累加一批操作，生成 FRAME_BATCH 的负载"""
+
+    def __init__(self):
+        self.payload = bytearray()
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def add(self, op, *args):
+        """追加一条操作；负载超过 MAX_PAYLOAD 时抛出 ValueError，调用方应另起一批"""
+        fmt = OPS[op][1]
+        if len(self.payload) + 1 + OP_SIZES[op] > MAX_PAYLOAD:
+            raise ValueError("batch full")
+        self.payload.append(op)
+        self.payload.extend(struct.pack(fmt, *args))
+        self.count += 1
+        return self
+
+    def fits(self, op):
+        return len(self.payload) + 1 + OP_SIZES[op] <= MAX_PAYLOAD
+
+    def clear(self):
+        self.payload = bytearray()
+        self.count = 0
+
+
+def iter_ops(payload):
+    """逐条解出批量负载中的操作，产生 (操作码, 参数元组)；遇到未知操作码抛出 ValueError"""
+    i = 0
+    n = len(payload)
+    while i < n:
+        op = payload[i]
+        i += 1
+        if op not in OPS:
+            raise ValueError("unknown op 0x%02x" % op)
+        size = OP_SIZES[op]
+        args = struct.unpack_from(OPS[op][1], payload, i)
+        i += size
+        yield op, args
+
+
+class FrameParser:
+    """
+    从字节流中切分帧。
+
+    数据追加到内部缓冲区，feed() 之后反复调用 next_frame() 取出完整帧。
+    同步字之前的杂散字节（例如控制器的调试输出）默认直接丢弃，keep_text=True 时
+    追加到 self.text 中供上位机按行切分；CRC 错误时从下一个字节重新寻找同步字，
+    并记录 crc_errors，上位机和控制器据此决定是否 NAK。
+    """
+
+    def __init__(self, size=4 * (MAX_PAYLOAD + HEADER_SIZE + CRC_SIZE), keep_text=False):
+        self.buffer = bytearray(size)
+        self.length = 0
+        self.crc_errors = 0
+        self.dropped = 0
+        self.keep_text = keep_text
+        self.text = bytearray()
+
+    def feed(self, data, n=None):
+        """追加收到的数据，n 为有效长度（配合 readinto 使用）"""
+        if n is None:
+            n = len(data)
+        space = len(self.buffer) - self.length
+        if n > space:
+            # 缓冲区溢出说明对端发送过快，丢弃最旧的数据重新同步
+            self.dropped += self.length
+            self.length = 0
+            if n > len(self.buffer):
+                self.dropped += n - len(self.buffer)
+                data = memoryview(data)[n - len(self.buffer):n]
+                n = len(self.buffer)
+        self.buffer[self.length:self.length + n] = memoryview(data)[:n]
+        self.length += n
+
+    def _skip_text(self, count):
+        if self.keep_text:
+            self.text.extend(self.buffer[:count])
+        else:
+            self.dropped += count
+        self._discard(count)
+
+    def _discard(self, count):
+        buf = self.buffer
+        remaining = self.length - count
+        buf[0:remaining] = buf[count:self.length]
+        self.length = remaining
+
+    def next_frame(self):
+        """
+        取出一帧。
+
+        :return: (序号, 类型, 负载 bytes)；没有完整帧时返回 None，
+                 CRC 错误时返回 (None, FRAME_NAK, b'')
+        """
+        buf = self.buffer
+        while self.length:
+            # 寻找同步字
+            start = -1
+            for i in range(self.length - 1):
+                if buf[i] == 0xA5 and buf[i + 1] == 0x5A:
+                    start = i
+                    break
+            if start < 0:
+                # 最后一个字节可能是下一个同步字的前半
+                keep = 1 if buf[self.length - 1] == 0xA5 else 0
+                self._skip_text(self.length - keep)
+                return None
+            if start > 0:
+                self._skip_text(start)
+            if self.length < HEADER_SIZE:
+                return None
+            length, seq, frame_type = struct.unpack_from('<HBB', buf, 2)
+            if length > MAX_PAYLOAD:
+                # 长度字段本身已经损坏
+                self.crc_errors += 1
+                self._discard(1)
+                continue
+            total = HEADER_SIZE + length + CRC_SIZE
+            if self.length < total:
+                return None
+            expected = struct.unpack_from('<H', buf, HEADER_SIZE + length)[0]
+            if crc16(buf, 2, HEADER_SIZE + length) != expected:
+                self.crc_errors += 1
+                self._discard(1)
+                return (None, FRAME_NAK, b'')
+            payload = bytes(buf[HEADER_SIZE:HEADER_SIZE + length])
+            self._discard(total)
+            return (seq, frame_type, payload)
+        return None
@@ -1,6 +1,18 @@
 from machine import Pin, I2C, UART
+from array import array
 import time
 import math
+import asyncio
+from planner import TRAPEZOID, StepStream, plan_profile, corexy_steps, corexy_position
+from stepgen import BusyLoopBackend, TimerBackend, RMTBackend
+from motionqueue import MotionQueue
+from protocol import (FrameParser, encode_frame, pack_frame, iter_ops, OPS, FRAME_BATCH, FRAME_ACK, FRAME_NAK,
+                      FRAME_TEXT, FRAME_STATUS, FRAME_SYNC, FRAME_TELEMETRY, FRAME_CALIBRATION, PENDING_FRAMES,
+                      RESEND_WINDOW, HEADER_SIZE, CRC_SIZE, ACK_FORMAT, ACK_OK, ACK_ERROR, STATUS_FORMAT, STATUS_MOVING,
+                      STATUS_AIR_PUMP, STATUS_UP_LIGHT, STATUS_DOWN_LIGHT, STATUS_HOMED, TELEMETRY_FORMAT,
+                      TELEMETRY_SIZE, HOME_X, HOME_Y, HOME_Z, HOME_R, HOME_ALL)
+from calibration import Calibration
+import struct
 
 # 定义 UART 引脚
 
@@ -24,6 +36,57 @@ D_EN = 35
 D_STEP = 0
 D_DIR = 45
 
+# 限位开关：常开触点接 GND，内部上拉，触发时为低电平。
+# 原电路没有限位输入，这里占用空闲的 GPIO7/8/9；R 轴连续旋转，没有开关，回零时以当前角度为 0
+X_MIN = 7
+Y_MIN = 8
+Z_MAX = 9
+ENDSTOP_TRIGGERED = 0
+
+HOMING_FAST_MM_S = 20 # 快速寻找开关的速度
+HOMING_SLOW_MM_S = 2 # 退开后慢速再次靠近的速度，决定回零的重复精度
+HOMING_BACKOFF_MM = 2 # 两次靠近之间、以及回零结束后离开开关的距离
+HOMING_MAX_TRAVEL_MM = 350 # 超过这个行程仍未触发视为开关或接线故障
+HOMING_YIELD_MS = 2 # 回零步进期间让出 CPU 的间隔，命令接收和状态上报照常进行
+
+# 步进脉冲后端：'busy' 忙等、'timer' 定时器分片、'rmt' RMT 硬件输出
+STEP_BACKEND = 'rmt'
+
+MOTION_QUEUE_SIZE = 16 # 前瞻队列缓存的段数
+
+Z_STEPS_PER_MM = 400 # T8 丝杆导程 8mm，16 细分
+R_STEPS_PER_DEGREE = 200 * 16 / 360 # 1.8° 电机直驱吸嘴，16 细分
+
+UART_RXBUF = 2048 # 驱动层接收缓冲，至少容纳一帧满载的批量命令
+STATUS_INTERVAL_MS = 50 # 状态变化检查周期
+PLAN_MARGIN_MS = 5 # 提前取出下一段进行规划的最小余量
+COMMIT_MARGIN_MS = 3 # 提前进入 commit 阻塞等待的余量
+TELEMETRY_TICK_MS = 5 # 遥测任务的唤醒周期，同时用来测量调度延迟
+TELEMETRY_MIN_MS = 10 # 遥测周期下限
+
+# 不需要等运动停稳、按顺序立即执行的命令
+IMMEDIATE_COMMANDS = ('up_light', 'up_light_on', 'up_light_off', 'down_light', 'down_light_on', 'down_light_off',
+                      'telemetry')
+# 进入前瞻队列、不等运动停稳的命令
+QUEUED_COMMANDS = ('move_xy', 'move_xyzr')
+# 需要 await 的命令
+ASYNC_COMMANDS = ('home',)
+
+def live_position(position, delta, count, executed):
+    """
+    电机的实时位置（步）。
+
+    commit 时 position 已经加上了整段的 delta，减去这一段还没发出的步数即为实时位置；
+    从轴已走的步数按与 run_dda 相同的误差累加规则由主轴已发出的步数 executed 推算。
+    :param count: 这一段的主轴步数
+    """
+    if executed >= count:
+        return position
+    m = delta if delta > 0 else -delta
+    done = ((count >> 1) + executed * m) // count
+    return position - delta + (done if delta > 0 else -done)
+
+
 class Motar:
     def __init__(self, en, step, dir):
         self.en = Pin(en, Pin.OUT)
@@ -55,7 +118,29 @@ class CoreXY:
         self.motar_a = Motar(a_en, a_step, a_dir)
         self.motar_b = Motar(b_en, b_step, b_dir)
         self.steps_per_second = 1000  # max_speed 
-        self.acceleration = 1 # 设置加速度
+        self.acceleration = 4000 # 设置加速度，步/秒²
+        self.profile = TRAPEZOID # 速度曲线类型
+        self.steps_per_mm = 80 # GT2 同步带 20 齿轮，16 细分
+        self.feed_rate = 100 # 笛卡尔进给速度，mm/s
+        self.xy_acceleration = 2000 # 笛卡尔加速度，mm/s²
+        # 两个步进间隔发生器轮流使用：后端逐步读取一个的同时规划下一段，
+        # 前瞻队列中相邻两段之间不需要停下来等待规划
+        self.streams = [StepStream(), StepStream()]
+        self.stream_index = 0
+        # 从轴步数同样双缓冲，TimerBackend 在执行期间会持续读取它
+        self.minor_counts = [array('I', [0, 0, 0]), array('I', [0, 0, 0])]
+        self.backend = BusyLoopBackend()
+        # prepare_steps 规划好、尚未 commit 的一段
+        self.pending = False
+        self.pending_delta_a = 0
+        self.pending_delta_b = 0
+        self.pending_riders = ()
+        self.pending_ms = 0
+        self.end_ms = time.ticks_ms() # 当前段预计结束的时刻
+        # 正在执行（或最近执行完）的一段，与后端的 executed 一起推算实时位置
+        self.active_count = 0
+        self.active_delta_a = 0
+        self.active_delta_b = 0
 
     def set_steps_per_second(self, steps_per_second):
         self.steps_per_second = steps_per_second
@@ -63,122 +148,277 @@ class CoreXY:
     def set_acceleration(self, acceleration):
         self.acceleration = acceleration
 
-    def move_motors(self, delta_a, delta_b):
-        # 初始化方向
-        self.motar_a.set_direction(1 if delta_a > 0 else 0)
-        self.motar_b.set_direction(1 if delta_b > 0 else 0)
+    def set_profile(self, profile):
+        self.profile = profile
 
-        # 计算总步数
-        total_steps_a = abs(delta_a)
-        total_steps_b = abs(delta_b)
+    def set_backend(self, backend):
+        self.backend.deinit()
+        self.backend = backend
+        self.active_count = 0
+
+    @property
+    def busy(self):
+        return self.backend.busy
 
-        # 计算最大速度
-        max_speed_a = self.steps_per_second
-        max_speed_b = self.steps_per_second
+    def wait(self):
+        self.backend.wait()
 
-        # 计算加速度阶段的步数
-        accel_steps_a = int(0.5 * max_speed_a / self.acceleration)
-        accel_steps_b = int(0.5 * max_speed_b / self.acceleration)
+    def live_steps(self, motar):
+        """
+        motar_a 或 motar_b 的实时步数，position 为已 commit 各段的终点。
 
-        # 初始化时间戳
-        start_time = time.ticks_ms()
+        跟随 XY 的 Z/R 只在忙等后端下并入插补，commit 返回时已经走完，不需要推算。
+        """
+        delta = self.active_delta_a if motar is self.motar_a else self.active_delta_b
+        return live_position(motar.position, delta, self.active_count, self.backend.executed)
 
-        # 运动循环
-        for i in range(max(total_steps_a, total_steps_b)):
-            current_time = time.ticks_diff(time.ticks_ms(), start_time) / 1000  # 转换为秒
+    def remaining_ms(self):
+        """当前段预计还要执行多久，毫秒"""
+        remaining = time.ticks_diff(self.end_ms, time.ticks_ms())
+        return remaining if remaining > 0 else 0
 
-            # 计算当前速度
-            if i < accel_steps_a:
-                speed_a = self.acceleration * (3 * (i / accel_steps_a) ** 2 - 2 * (i / accel_steps_a) ** 3)
-            elif i > total_steps_a - accel_steps_a:
-                speed_a = max_speed_a - self.acceleration * (3 * ((total_steps_a - i) / accel_steps_a) ** 2 - 2 * ((total_steps_a - i) / accel_steps_a) ** 3)
-            else:
-                speed_a = max_speed_a
+    def set_steps_per_mm(self, steps_per_mm):
+        self.steps_per_mm = steps_per_mm
+
+    def set_feed_rate(self, feed_rate, acceleration=None):
+        self.feed_rate = feed_rate
+        if acceleration is not None:
+            self.xy_acceleration = acceleration
+
+    def target_xy(self):
+        """已接收的移动（包括前瞻队列中尚未执行的）全部完成后的位置，mm"""
+        x, y = corexy_position(self.motar_a.target_position, self.motar_b.target_position)
+        return x / self.steps_per_mm, y / self.steps_per_mm
+
+    def add_target(self, dx_mm, dy_mm):
+        """接收一段相对移动时更新目标位置，取整规则与 prepare_xy 相同，执行完后 position 与之相等"""
+        x, y = corexy_position(self.motar_a.target_position, self.motar_b.target_position)
+        a, b = corexy_steps(round(x + dx_mm * self.steps_per_mm), round(y + dy_mm * self.steps_per_mm))
+        self.motar_a.target_position = a
+        self.motar_b.target_position = b
+
+    def move_motors(self, delta_a, delta_b):
+        """按电机步数移动，主轴使用 steps_per_second 与 acceleration"""
+        self.move_steps(delta_a, delta_b, self.steps_per_second, self.acceleration)
+
+    def move_xy(self, dx_mm, dy_mm, feed_rate=None, start_speed=0, end_speed=0, riders=()):
+        """按笛卡尔坐标相对移动贴片头，参数与返回值同 prepare_xy"""
+        rest = self.prepare_xy(dx_mm, dy_mm, feed_rate, start_speed, end_speed, riders)
+        self.commit()
+        return rest
+
+    def prepare_xy(self, dx_mm, dy_mm, feed_rate=None, start_speed=0, end_speed=0, riders=()):
+        """
+        规划一次笛卡尔相对移动，commit() 后才真正开始。
+
+        目标先换算为绝对步数再与当前步数求差，多次小移动的舍入误差不会累积。
+        路径上的进给速度为 feed_rate，换算到步数最多的那个电机作为主轴速度。
+        start_speed/end_speed 为路径上的入口/出口速度（mm/s），由前瞻队列给出。
+
+        riders 为 [(OneAxis, 步数), ...]，这些轴作为从轴跟随本次移动一起插补，
+        与 XY 同时开始、同时结束。步数超过主轴或步速超过该轴上限的无法跟随，
+        原样返回给调用方另行移动。
+        :return: 未能跟随的 riders 列表
+        """
+        if feed_rate is None:
+            feed_rate = self.feed_rate
+        x, y = corexy_position(self.motar_a.position + self.pending_delta_a,
+                               self.motar_b.position + self.pending_delta_b)
+        target_x = round(x + dx_mm * self.steps_per_mm)
+        target_y = round(y + dy_mm * self.steps_per_mm)
+        target_a, target_b = corexy_steps(target_x, target_y)
+        # 位置在 commit 时才更新，上一段尚未 commit 时以它的终点为起点
+        delta_a = target_a - self.motar_a.position - self.pending_delta_a
+        delta_b = target_b - self.motar_b.position - self.pending_delta_b
 
-            if i < accel_steps_b:
-                speed_b = self.acceleration * (3 * (i / accel_steps_b) ** 2 - 2 * (i / accel_steps_b) ** 3)
-            elif i > total_steps_b - accel_steps_b:
-                speed_b = max_speed_b - self.acceleration * (3 * ((total_steps_b - i) / accel_steps_b) ** 2 - 2 * ((total_steps_b - i) / accel_steps_b) ** 3)
+        length_mm = math.sqrt(dx_mm * dx_mm + dy_mm * dy_mm)
+        count = max(abs(delta_a), abs(delta_b))
+        if length_mm == 0 or count == 0:
+            return list(riders)
+        # 主轴每走 1 mm 路径需要的步数
+        ratio = count / length_mm
+        major_speed = feed_rate * ratio
+        fits = []
+        rest = []
+        for axis, delta in riders:
+            if abs(delta) <= count and major_speed * abs(delta) / count <= axis.steps_per_second:
+                fits.append((axis.motar, delta))
             else:
-                speed_b = max_speed_b
+                rest.append((axis, delta))
+        self.prepare_steps(delta_a, delta_b, major_speed, self.xy_acceleration * ratio,
+                           start_speed * ratio, end_speed * ratio, fits)
+        return rest
 
-            # 计算步进间隔
-            step_interval_a = 1 / speed_a if speed_a > 0 else 0
-            step_interval_b = 1 / speed_b if speed_b > 0 else 0
+    def move_steps(self, delta_a, delta_b, major_speed, major_acceleration, start_speed=0, end_speed=0, riders=()):
+        self.prepare_steps(delta_a, delta_b, major_speed, major_acceleration, start_speed, end_speed, riders)
+        self.commit()
 
-            # 计算下一个步进的时间戳
-            next_step_time_a = start_time + i * step_interval_a * 1000
-            next_step_time_b = start_time + i * step_interval_b * 1000
+    def prepare_steps(self, delta_a, delta_b, major_speed, major_acceleration, start_speed=0, end_speed=0, riders=()):
+        """按电机步数规划一段并交给后端准备，上一段可能仍在执行"""
+        if self.pending:
+            self.commit()
+        # 计算总步数，步数多的电机作为主轴
+        total_steps_a = abs(delta_a)
+        total_steps_b = abs(delta_b)
+        if total_steps_a >= total_steps_b:
+            major, minor = self.motar_a, self.motar_b
+            count, minor_count = total_steps_a, total_steps_b
+        else:
+            major, minor = self.motar_b, self.motar_a
+            count, minor_count = total_steps_b, total_steps_a
+
+        # 用空闲的那个发生器规划主轴的步进间隔，此时后端可能还在读取上一段的
+        index = self.stream_index ^ 1
+        profile = plan_profile(count, major_speed, major_acceleration, start_speed, end_speed, self.profile)
+        stream = self.streams[index].start(profile)
+        self.stream_index = index
 
-            # 步进电机A
-            if i < total_steps_a and current_time >= next_step_time_a:
-                self.motar_a.step.on()
-                time.sleep_us(1)
-                self.motar_a.step.off()
+        # Z/R 等跟随轴与另一个 XY 电机一样作为从轴，共用同一个插补内核
+        minor_counts = self.minor_counts[index]
+        minor_counts[0] = minor_count
+        minors = (minor.step,)
+        k = 1
+        for motar, delta in riders:
+            minor_counts[k] = abs(delta)
+            minors += (motar.step,)
+            k += 1
+        self.backend.prepare(major.step, minors, stream, count, minor_counts)
 
-            # 步进电机B
-            if i < total_steps_b and current_time >= next_step_time_b:
-                self.motar_b.step.on()
-                time.sleep_us(1)
-                self.motar_b.step.off()
+        self.pending = True
+        self.pending_delta_a = delta_a
+        self.pending_delta_b = delta_b
+        self.pending_riders = riders
+        self.pending_ms = int(profile.duration * 1000)
 
-        self.motar_b.step.off()
-        self.motar_a.step.off()
+    def commit(self):
+        """等上一段结束后启动 prepare_steps 规划好的一段"""
+        if not self.pending:
+            return
+        delta_a = self.pending_delta_a
+        delta_b = self.pending_delta_b
+        riders = self.pending_riders
+        # 方向不变时不必等上一段结束，后端会在真正启动前自行等待；
+        # 方向改变（拐角速度必然为 0）时先停稳再切换 DIR
+        dir_a = 1 if delta_a > 0 else 0
+        dir_b = 1 if delta_b > 0 else 0
+        if (delta_a and dir_a != self.motar_a.direction) or (delta_b and dir_b != self.motar_b.direction) or riders:
+            self.backend.wait()
+        if delta_a:
+            self.motar_a.set_direction(dir_a)
+        if delta_b:
+            self.motar_b.set_direction(dir_b)
+        for motar, delta in riders:
+            motar.set_direction(1 if delta > 0 else 0)
+        # 后端先等上一段结束再启动，结束时刻从 commit 返回时算起
+        self.backend.commit()
+        self.end_ms = time.ticks_add(time.ticks_ms(), self.pending_ms if self.backend.concurrent else 0)
+
+        self.motar_a.set_position(self.motar_a.position + delta_a)
+        self.motar_b.set_position(self.motar_b.position + delta_b)
+        self.active_count = max(abs(delta_a), abs(delta_b))
+        self.active_delta_a = delta_a
+        self.active_delta_b = delta_b
+        for motar, delta in riders:
+            motar.set_position(motar.position + delta)
+        self.pending = False
+        self.pending_delta_a = 0
+        self.pending_delta_b = 0
+        self.pending_riders = ()
 
 class OneAxis:
-    def __init__(self, z_en, z_step, z_dir):
+    """
+    Z（吸嘴高度）与 R（吸嘴旋转）这类单电机轴。
+
+    与 CoreXY 共用 planner 的 StepStream 和 stepgen 的插补内核，单独移动时没有从轴。
+    """
+
+    NO_MINORS = ()
+
+    def __init__(self, z_en, z_step, z_dir, steps_per_unit=400):
         self.motar = Motar(z_en, z_step, z_dir)
         self.steps_per_second = 1000  # max_speed 
-        self.acceleration = 1 # 设置加速度    
+        self.acceleration = 4000 # 设置加速度，步/秒²
+        self.profile = TRAPEZOID # 速度曲线类型
+        self.steps_per_unit = steps_per_unit # Z 轴为 步/mm，R 轴为 步/度
+        self.stream = StepStream()
+        self.minor_counts = array('I')
+        self.backend = BusyLoopBackend()
+        self.active_delta = 0 # 正在执行（或最近执行完）的一段
     
     def set_steps_per_second(self, steps_per_second):
         self.steps_per_second = steps_per_second
     def set_acceleration(self, acceleration):
         self.acceleration = acceleration
 
-    def move_motors(self, delta):
-        # 初始化方向
-        self.motar.set_direction(1 if delta > 0 else 0)
+    def set_backend(self, backend):
+        self.backend.deinit()
+        self.backend = backend
+        self.active_delta = 0
 
-        # 计算总步数
-        total_steps = abs(delta)
+    @property
+    def busy(self):
+        return self.backend.busy
 
-        # 计算最大速度
-        max_speed = self.steps_per_second
+    def wait(self):
+        self.backend.wait()
 
-        # 计算加速度阶段的步数
-        accel_steps = int(0.5 * max_speed / self.acceleration)
+    def live_steps(self):
+        """实时步数，按后端已经发出的步数推算"""
+        delta = self.active_delta
+        return live_position(self.motar.position, delta, delta if delta > 0 else -delta, self.backend.executed)
 
-        # 初始化时间戳
-        start_time = time.ticks_ms()
+    def steps_for(self, delta_units):
+        """
+        把以 mm 或度为单位的相对移动换算成步数并更新目标位置。
 
-        # 运动循环
-        for i in range(total_steps):
-            current_time = time.ticks_diff(time.ticks_ms(), start_time) / 1000  # 转换为秒
+        以已接收移动（包括前瞻队列中跟随 XY 的）全部完成后的位置为起点，按绝对位置取整，舍入误差不累积。
+        """
+        position = self.motar.target_position
+        delta = round(position + delta_units * self.steps_per_unit) - position
+        self.motar.target_position = position + delta
+        return delta
 
-            # 计算当前速度
-            if i < accel_steps:
-                speed = self.acceleration * (3 * (i / accel_steps) ** 2 - 2 * (i / accel_steps) ** 3)
-            elif i > total_steps - accel_steps:
-                speed = max_speed - self.acceleration * (3 * ((total_steps - i) / accel_steps) ** 2 - 2 * ((total_steps - i) / accel_steps) ** 3)
-            else:
-                speed = max_speed
+    def move(self, delta_units):
+        self.move_motors(self.steps_for(delta_units))
 
-            # 计算步进间隔
-            step_interval = 1 / speed if speed > 0 else 0
+    def move_motors(self, delta):
+        self.backend.wait()
+        # 初始化方向
+        self.motar.set_direction(1 if delta > 0 else 0)
 
-            # 计算下一个步进的时间戳
-            next_step_time = start_time + i * step_interval * 1000
+        # 计算总步数
+        total_steps = abs(delta)
 
-            # 步进电机Z
-            if current_time >= next_step_time:
-                self.motar.step = -self.motar.step
-        self.motar.step.off()
+        # 单轴移动即没有从轴的 DDA；上一段已经结束，发生器可以直接复用
+        self.stream.start(plan_profile(total_steps, self.steps_per_second, self.acceleration, kind=self.profile))
+        self.backend.start(self.motar.step, self.NO_MINORS, self.stream, total_steps, self.minor_counts)
+        self.motar.set_position(self.motar.position + delta)
+        self.active_delta = delta
 
 class SmtController:
     def __init__(self):
         self.busy = False
-        self.uart = UART(1, baudrate=115200, tx=Pin(15), rx=Pin(16))
+        self.uart = UART(1, baudrate=115200, tx=Pin(15), rx=Pin(16), rxbuf=UART_RXBUF)
+        # 二进制帧协议，见 protocol.py
+        self.rx_buffer = bytearray(256)
+        self.parser = FrameParser()
+        self.last_seq = None      # 最近一次接收的帧序号，用于识别重发和缺帧
+        self.pending_frames = []  # 已应答、等待执行的帧 (类型, 负载)
+        self.errors = 0
+        self.homed = 0            # 已回零的轴，HOME_X/Y/Z/R 按位或
+        self.calibration = Calibration()
+        self.calibration.load()
+        self.action_event = asyncio.Event()
+        self.motion_event = asyncio.Event()
+        # 遥测，默认关闭；记录写在预分配的整帧缓冲区里原地打包
+        self.telemetry_interval = 0
+        self.telemetry_event = asyncio.Event()
+        self.telemetry_frame = bytearray(HEADER_SIZE + TELEMETRY_SIZE + CRC_SIZE)
+        self.telemetry_seq = 0
+        self.telemetry_coalesced = 0  # 自上一条记录以来因串口忙而合并掉的记录数
+        self.loop_total = 0           # 本周期调度延迟之和、次数、最大值，us
+        self.loop_count = 0
+        self.loop_max = 0
         self.send_data("init smt controller\n")
         
         self.init_rigids()
@@ -189,30 +429,90 @@ class SmtController:
         self.up_light = Pin(UP_LIGHT, Pin.OUT)
         self.down_light = Pin(DOWN_LIGHT, Pin.OUT)
         self.corexy = CoreXY(A_EN, A_STEP, A_DIR, B_EN, B_STEP, B_DIR)
-        self.zaxis = OneAxis(C_EN, C_STEP, C_DIR)
-        self.raxis = OneAxis(D_EN, D_STEP, D_DIR)
+        self.zaxis = OneAxis(C_EN, C_STEP, C_DIR, Z_STEPS_PER_MM)
+        self.raxis = OneAxis(D_EN, D_STEP, D_DIR, R_STEPS_PER_DEGREE)
+        self.step_backend = None
+        self.set_step_backend(STEP_BACKEND)
+        self.motion_queue = MotionQueue(MOTION_QUEUE_SIZE)
+        self.settle = False # 单独移动了 Z/R，下一段 XY 要等它们停稳
+        self.x_min = Pin(X_MIN, Pin.IN, Pin.PULL_UP)
+        self.y_min = Pin(Y_MIN, Pin.IN, Pin.PULL_UP)
+        self.z_max = Pin(Z_MAX, Pin.IN, Pin.PULL_UP)
+        self.apply_calibration()
+        if self.calibration.home_on_boot:
+            # 回零排在待执行队列的最前面，上位机之后发来的帧在它完成后才执行
+            self.pending_frames.append((FRAME_TEXT, b'home'))
         self.uart.write("init rigids done\n")
 
+    def apply_calibration(self):
+        cal = self.calibration
+        self.corexy.set_steps_per_mm(cal.steps_per_mm)
+        self.zaxis.steps_per_unit = cal.z_steps_per_mm
+        self.raxis.steps_per_unit = cal.r_steps_per_degree
+
+    def set_calibration(self, name, value):
+        """修改一项标定数据并立即生效，save_calibration 之后才写入 Flash"""
+        self.calibration.set(name, value)
+        self.apply_calibration()
+
+    def save_calibration(self):
+        self.calibration.save()
+        self.send_data("calibration saved\n")
+
+    def print_calibration(self):
+        for name, value in self.calibration.items():
+            self.send_data(f"{name} {value}\n")
+
+    def set_step_backend(self, name):
+        """
+        切换所有轴的步进脉冲后端。
+
+        使用 'timer' 或 'rmt' 时移动在后台执行，asyncio 任务可以继续处理命令；
+        RMT 通道 0/1 给 CoreXY，2 给 Z 轴，3 给 R 轴；RMT 与 Timer 后端都按 CoreXY、Z、R 使用定时器 0/1/2。
+        """
+        if name == self.step_backend:
+            return
+        if name == 'rmt':
+            self.corexy.set_backend(RMTBackend((0, 1), 0))
+            self.zaxis.set_backend(RMTBackend((2,), 1))
+            self.raxis.set_backend(RMTBackend((3,), 2))
+        elif name == 'timer':
+            self.corexy.set_backend(TimerBackend(0))
+            self.zaxis.set_backend(TimerBackend(1))
+            self.raxis.set_backend(TimerBackend(2))
+        elif name == 'busy':
+            self.corexy.set_backend(BusyLoopBackend())
+            self.zaxis.set_backend(BusyLoopBackend())
+            self.raxis.set_backend(BusyLoopBackend())
+        else:
+            self.send_data(f"Unknown step backend: {name}\n")
+            return
+        self.step_backend = name
+
     def send_data(self,data):
         """ 发送数据到UART """
         self.uart.write(data.encode())
-        print(f"Sent: {data}\n")
-
-    def receive_data(self):
-        """ 从UART接收数据 """
-        if self.uart.any():
-            data = self.uart.read()
-            print(f"Received: {data.decode()}\n")
-            return data.decode()
-        
-        return None
-    
+
     def air_pump_on(self):
+        self.flush_motion()
         self.air_pump.value(1)
     
     def air_pump_off(self):
+        self.flush_motion()
         self.air_pump.value(0)
         
+    def set_air_pump(self, on):
+        if int(on):
+            self.air_pump_on()
+        else:
+            self.air_pump_off()
+
+    def set_up_light(self, on):
+        self.up_light.value(1 if int(on) else 0)
+
+    def set_down_light(self, on):
+        self.down_light.value(1 if int(on) else 0)
+
     def up_light_on(self):
         self.up_light.value(1)
         
@@ -225,28 +525,497 @@ class SmtController:
     def down_light_off(self):
         self.down_light.value(0)
 
-    def read_command(self):
-        data = self.uart.read()
-        self.process_command(data)
+    def check_limits(self, x=None, y=None, z=None):
+        """
+        检查目标位置（机器坐标 mm）是否在软限位之内，只检查已回零的轴。
 
-    def more_corexy(self, *args):
-        self.corexy.move_motors(*args)
+        超出时抛出 ValueError，不执行这条移动，action_task 计一次错误并放弃本帧剩余的操作。
+        """
+        cal = self.calibration
+        homed = self.homed
+        if x is not None and homed & HOME_X and not cal.x_min <= x <= cal.x_max:
+            raise ValueError("X soft limit")
+        if y is not None and homed & HOME_Y and not cal.y_min <= y <= cal.y_max:
+            raise ValueError("Y soft limit")
+        if z is not None and homed & HOME_Z and not cal.z_min <= z <= cal.z_max:
+            raise ValueError("Z soft limit")
 
-    def process_command(self):
-        data = self.receive_data()
-        if data:
-            command = data.strip()
-            parts = command.split()
-            cmd = parts[0]
-            args = parts[1:] if len(parts) > 1 else []
-            
-            if cmd in self.commands:
-                print(f"Command {cmd} processed with args: {args}")
-                self.commands[cmd](*args) 
+    def check_xy(self, dx_mm, dy_mm):
+        x, y = self.corexy.target_xy()
+        self.check_limits(x + dx_mm, y + dy_mm)
+
+    def check_z(self, dz_mm):
+        self.check_limits(z=self.zaxis.motar.target_position / self.zaxis.steps_per_unit + dz_mm)
+
+    def move_xy(self, dx_mm, dy_mm, feed_rate=None):
+        """把一段 XY 移动加入前瞻队列，队列满时先执行队首段腾出空间；feed_rate 为空或 0 时用默认进给"""
+        dx_mm = float(dx_mm)
+        dy_mm = float(dy_mm)
+        feed_rate = 0 if feed_rate is None else float(feed_rate)
+        if feed_rate <= 0:
+            feed_rate = self.corexy.feed_rate
+        self.check_xy(dx_mm, dy_mm)
+        self.corexy.add_target(dx_mm, dy_mm)
+        queue = self.motion_queue
+        if queue.full:
+            self.execute_segment()
+        queue.push(dx_mm, dy_mm, feed_rate, self.corexy.xy_acceleration)
+
+    def move_z(self, dz_mm):
+        self.check_z(float(dz_mm))
+        self.flush_motion()
+        self.zaxis.move(float(dz_mm))
+        self.settle = True
+
+    def move_r(self, dr_degree):
+        self.flush_motion()
+        self.raxis.move(float(dr_degree))
+        self.settle = True
+
+    def move_xyzr(self, dx_mm, dy_mm, dz_mm=0, dr_degree=0):
+        """
+        XY 移动的同时完成 Z/R 移动，R 轴旋转与行程重叠，不再额外占用贴片节拍。
+
+        Z/R 的步数作为这一段的 riders 与 XY 一起进入前瞻队列，和 move_xy 一样按拐角速度与前后段衔接，
+        执行到这一段时才移动，见 prepare_segment。没有 XY 移动时等队列停稳后直接移动 Z/R。
+        """
+        dx_mm = float(dx_mm)
+        dy_mm = float(dy_mm)
+        self.check_xy(dx_mm, dy_mm)
+        self.check_z(float(dz_mm))
+        if dx_mm == 0 and dy_mm == 0:
+            self.flush_motion()
+            self.zaxis.move(float(dz_mm))
+            self.raxis.move(float(dr_degree))
+            self.settle = True
+            return
+        self.corexy.add_target(dx_mm, dy_mm)
+        riders = ((self.zaxis, self.zaxis.steps_for(float(dz_mm))), (self.raxis, self.raxis.steps_for(float(dr_degree))))
+        queue = self.motion_queue
+        if queue.full:
+            self.execute_segment()
+        queue.push(dx_mm, dy_mm, self.corexy.feed_rate, self.corexy.xy_acceleration, riders=riders)
+
+    def prepare_segment(self, seg):
+        """
+        规划队列中的一段，上一段可能仍在执行。
+
+        后台后端（timer/rmt）下 Z/R 各有自己的后端，在 commit_segment 中与 XY 同时启动；
+        忙等后端下 Z/R 作为从轴并入 XY 的插补内核，放不进去的在 XY 结束后补走。
+        :return: 要在 commit_segment 中单独移动的 [(OneAxis, 步数), ...]
+        """
+        riders = [(axis, delta) for axis, delta in seg.riders if delta]
+        if riders and self.corexy.backend.concurrent:
+            self.corexy.prepare_xy(seg.dx, seg.dy, seg.feed, seg.entry, seg.exit)
+            return riders
+        return self.corexy.prepare_xy(seg.dx, seg.dy, seg.feed, seg.entry, seg.exit, riders)
+
+    def commit_segment(self, rest):
+        """启动 prepare_segment 规划好的一段，再移动没有并入的 Z/R"""
+        if self.settle:
+            # 单独移动的 Z/R（吸料后抬起吸嘴等）走完之后 XY 才能出发
+            self.zaxis.wait()
+            self.raxis.wait()
+            self.settle = False
+        self.corexy.commit()
+        for axis, delta in rest:
+            axis.move_motors(delta)
+
+    def execute_segment(self):
+        """取出队首段并按规划好的入口/出口速度执行"""
+        seg = self.motion_queue.pop()
+        if seg is None:
+            return False
+        self.commit_segment(self.prepare_segment(seg))
+        return True
+
+    def flush_motion(self):
+        """
+        让队列中最后一段停稳并全部执行完毕。
+
+        吸嘴动作（气泵、Z/R 轴）之前调用，其余时候段之间按拐角速度连续运动。
+        """
+        self.motion_queue.mark_stop()
+        while self.execute_segment():
+            pass
+        self.corexy.wait()
+        self.zaxis.wait()
+        self.raxis.wait()
+
+    async def seek(self, motars, speed, max_steps, endstop=None, level=ENDSTOP_TRIGGERED):
+        """
+        以恒定步速同时步进 motars（[(Motar, +1/-1), ...]），直到 endstop 读数等于 level。
+
+        回零速度低，不需要加减速。每一步都更新 Motar.position，回零过程中位置始终准确；
+        每隔 HOMING_YIELD_MS 让出一次，让出期间耽误的步不补。
+        endstop 为 None 时走满 max_steps 步。
+        :return: 走过的步数；max_steps 步内没有触发时抛出 RuntimeError
+        """
+        ticks_us = time.ticks_us
+        ticks_add = time.ticks_add
+        ticks_diff = time.ticks_diff
+        for motar, sign in motars:
+            motar.set_direction(1 if sign > 0 else 0)
+        period = int(1000000 / speed)
+        deadline = ticks_add(ticks_us(), period)
+        resume = ticks_add(ticks_us(), HOMING_YIELD_MS * 1000)
+        for i in range(max_steps):
+            if endstop is not None and endstop.value() == level:
+                return i
+            while ticks_diff(deadline, ticks_us()) > 0:
+                pass
+            for motar, sign in motars:
+                motar.step.on()
+                motar.step.off()
+                motar.position += sign
+            deadline = ticks_add(deadline, period)
+            if ticks_diff(ticks_us(), resume) >= 0:
+                await asyncio.sleep_ms(0)
+                now = ticks_us()
+                resume = ticks_add(now, HOMING_YIELD_MS * 1000)
+                if ticks_diff(now, deadline) > 0:
+                    deadline = now
+        if endstop is None:
+            return max_steps
+        raise RuntimeError("endstop not reached")
+
+    async def home_axis(self, motars, endstop, steps_per_mm):
+        """
+        单轴回零：快速靠近开关 → 退到开关释放再多退 HOMING_BACKOFF_MM → 慢速再次靠近。
+
+        motars 的方向为朝向开关。返回时开关刚好触发，调用方据此设置机器坐标。
+        """
+        back = [(motar, -sign) for motar, sign in motars]
+        fast = HOMING_FAST_MM_S * steps_per_mm
+        slow = HOMING_SLOW_MM_S * steps_per_mm
+        backoff = int(HOMING_BACKOFF_MM * steps_per_mm)
+        released = 1 - ENDSTOP_TRIGGERED
+        if endstop.value() == ENDSTOP_TRIGGERED:
+            # 开机时已经压着开关
+            await self.seek(back, slow, 4 * backoff, endstop, released)
+        await self.seek(motars, fast, int(HOMING_MAX_TRAVEL_MM * steps_per_mm), endstop)
+        await self.seek(back, slow, 4 * backoff, endstop, released)
+        await self.seek(back, fast, backoff)
+        await self.seek(motars, slow, 4 * backoff, endstop)
+
+    async def home(self, axes=0):
+        """
+        回零，axes 为 HOME_X/Y/Z/R 按位或，0 表示全部。
+
+        先抬起 Z 再回 X、Y，开关触发点的机器坐标取自标定数据，最后离开开关 HOMING_BACKOFF_MM。
+        手动步进期间切换到忙等后端，RMT 绑定的 STEP 引脚交还给 GPIO，结束后恢复原来的后端。
+        """
+        axes = int(axes) or HOME_ALL
+        cal = self.calibration
+        a = self.corexy.motar_a
+        b = self.corexy.motar_b
+        z = self.zaxis.motar
+        spm = cal.steps_per_mm
+        self.homed &= ~axes
+        backend = self.step_backend
+        self.set_step_backend('busy')
+        try:
+            if axes & HOME_Z:
+                await self.home_axis(((z, 1),), self.z_max, cal.z_steps_per_mm)
+                z.position = round(cal.home_z * cal.z_steps_per_mm)
+                await self.seek(((z, -1),), HOMING_FAST_MM_S * cal.z_steps_per_mm,
+                                int(HOMING_BACKOFF_MM * cal.z_steps_per_mm))
+                self.homed |= HOME_Z
+            if axes & HOME_X:
+                # X 方向移动时 A、B 同向转动，只平移 X 坐标，Y 坐标保持不变
+                await self.home_axis(((a, -1), (b, -1)), self.x_min, spm)
+                x, _ = corexy_position(a.position, b.position)
+                shift = round(cal.home_x * spm - x)
+                a.position += shift
+                b.position += shift
+                await self.seek(((a, 1), (b, 1)), HOMING_FAST_MM_S * spm, int(HOMING_BACKOFF_MM * spm))
+                self.homed |= HOME_X
+            if axes & HOME_Y:
+                await self.home_axis(((a, -1), (b, 1)), self.y_min, spm)
+                _, y = corexy_position(a.position, b.position)
+                shift = round(cal.home_y * spm - y)
+                a.position += shift
+                b.position -= shift
+                await self.seek(((a, 1), (b, -1)), HOMING_FAST_MM_S * spm, int(HOMING_BACKOFF_MM * spm))
+                self.homed |= HOME_Y
+            if axes & HOME_R:
+                self.raxis.motar.position = 0
+                self.homed |= HOME_R
+        finally:
+            for motar in (a, b, z, self.raxis.motar):
+                motar.target_position = motar.position
+            self.set_step_backend(backend)
+
+    def send_frame(self, seq, frame_type, payload=b''):
+        self.uart.write(encode_frame(seq, frame_type, payload))
+
+    def send_ack(self, seq, status):
+        self.send_frame(seq, FRAME_ACK, struct.pack(ACK_FORMAT, status, len(self.pending_frames)))
+
+    @property
+    def motion_active(self):
+        """前瞻队列非空，或者任意一个轴还在运动"""
+        return (len(self.motion_queue) > 0 or self.corexy.pending or self.corexy.busy
+                or self.zaxis.busy or self.raxis.busy)
+
+    def status_flags(self):
+        flags = 0
+        if self.motion_active:
+            flags |= STATUS_MOVING
+        if self.air_pump.value():
+            flags |= STATUS_AIR_PUMP
+        if self.up_light.value():
+            flags |= STATUS_UP_LIGHT
+        if self.down_light.value():
+            flags |= STATUS_DOWN_LIGHT
+        if self.homed & (HOME_X | HOME_Y | HOME_Z) == HOME_X | HOME_Y | HOME_Z:
+            flags |= STATUS_HOMED
+        return flags
+
+    def status_payload(self):
+        corexy = self.corexy
+        return struct.pack(STATUS_FORMAT, self.status_flags(), len(self.motion_queue), len(self.pending_frames),
+                           self.errors & 0xFF, corexy.live_steps(corexy.motar_a), corexy.live_steps(corexy.motar_b),
+                           self.zaxis.live_steps(), self.raxis.live_steps())
+
+    def set_telemetry(self, interval_ms):
+        """设置遥测周期（毫秒），0 关闭；低于 TELEMETRY_MIN_MS 的按下限处理"""
+        interval_ms = int(interval_ms)
+        if interval_ms > 0 and interval_ms < TELEMETRY_MIN_MS:
+            interval_ms = TELEMETRY_MIN_MS
+        self.telemetry_interval = interval_ms
+        self.telemetry_event.set()
+
+    def pack_telemetry(self, now):
+        """把当前状态和本周期的调度统计打包进 telemetry_frame，不分配内存"""
+        frame = self.telemetry_frame
+        count = self.loop_count
+        average = self.loop_total // count if count else 0
+        corexy = self.corexy
+        struct.pack_into(TELEMETRY_FORMAT, frame, HEADER_SIZE, self.status_flags(), len(self.motion_queue),
+                         len(self.pending_frames), self.errors & 0xFF, corexy.live_steps(corexy.motar_a),
+                         corexy.live_steps(corexy.motar_b), self.zaxis.live_steps(), self.raxis.live_steps(),
+                         now & 0xFFFF, min(average, 0xFFFF), min(self.loop_max, 0xFFFF),
+                         min(self.telemetry_coalesced, 0xFFFF))
+        pack_frame(frame, self.telemetry_seq, FRAME_TELEMETRY, TELEMETRY_SIZE)
+        self.telemetry_seq = (self.telemetry_seq + 1) & 0xFF
+        self.telemetry_coalesced = 0
+        self.loop_total = 0
+        self.loop_count = 0
+        self.loop_max = 0
+        return frame
+
+    def accept_frame(self, frame_type, payload):
+        """检查一帧并放入待执行队列，真正的执行由 action_task 按接收顺序完成"""
+        if frame_type == FRAME_BATCH:
+            # 未知操作码在这里就报错，不会执行到一半才失败
+            for _ in iter_ops(payload):
+                pass
+        elif frame_type != FRAME_TEXT:
+            return ACK_ERROR
+        self.pending_frames.append((frame_type, payload))
+        self.action_event.set()
+        return ACK_OK
+
+    def handle_frame(self, seq, frame_type, payload):
+        """
+        处理一帧并回复应答。
+
+        帧只按序号顺序接收。CRC 错误的帧序号不可信、或者中间缺了帧时，回复以最后接收序号
+        为序号的 NAK，上位机从下一帧起全部重发；已经接收过的帧说明应答丢了，只补发应答，
+        不重复执行。状态请求、标定数据请求直接回复，不占用序号。
+        """
+        if seq is None:
+            self.send_frame(self.last_seq or 0, FRAME_NAK)
+            return
+        if frame_type == FRAME_STATUS:
+            self.send_frame(seq, FRAME_STATUS, self.status_payload())
+            return
+        if frame_type == FRAME_CALIBRATION:
+            self.send_frame(seq, FRAME_CALIBRATION, self.calibration.pack())
+            return
+        if frame_type == FRAME_SYNC:
+            self.last_seq = seq
+            self.send_ack(seq, ACK_OK)
+            return
+        if self.last_seq is not None and seq != (self.last_seq + 1) & 0xFF:
+            if (self.last_seq - seq) & 0xFF < RESEND_WINDOW:
+                self.send_ack(seq, ACK_OK)
             else:
-                self.send_data(f"Unknown command: {cmd}\n")
-        else:
-            self.send_data("wait_for_command\n")
+                self.send_frame(self.last_seq, FRAME_NAK)
+            return
+        try:
+            status = self.accept_frame(frame_type, payload)
+        except Exception as e:
+            print(f"Frame {seq} rejected: {e}")
+            status = ACK_ERROR
+        self.last_seq = seq
+        self.send_ack(seq, status)
+
+    async def command_task(self):
+        """
+        从 UART 流中读取并切分帧，每帧收到后立即应答。
+
+        StreamReader 在 UART 有数据时才唤醒本任务，readinto 写入预分配的缓冲区。
+        上位机按应答和状态帧中的待执行帧数控制发送，正常情况下队列不会满；
+        万一满了就暂缓接收，应答随之推迟。
+        """
+        reader = asyncio.StreamReader(self.uart)
+        buf = self.rx_buffer
+        parser = self.parser
+        while True:
+            n = await reader.readinto(buf)
+            if not n:
+                continue
+            parser.feed(buf, n)
+            frame = parser.next_frame()
+            while frame is not None:
+                if frame[1] != FRAME_STATUS:
+                    while len(self.pending_frames) >= PENDING_FRAMES:
+                        await asyncio.sleep_ms(1)
+                self.handle_frame(*frame)
+                frame = parser.next_frame()
+
+    async def action_task(self):
+        """按接收顺序执行待执行队列中的帧，帧执行完才出队"""
+        while True:
+            if not self.pending_frames:
+                self.action_event.clear()
+                await self.action_event.wait()
+                continue
+            frame_type, payload = self.pending_frames[0]
+            try:
+                if frame_type == FRAME_BATCH:
+                    for op, args in iter_ops(payload):
+                        await self.run_action(OPS[op][0], args)
+                else:
+                    parts = payload.decode().split()
+                    if parts:
+                        await self.run_action(parts[0], parts[1:])
+            except Exception as e:
+                print(f"Action failed: {e}")
+                self.errors += 1
+            self.pending_frames.pop(0)
+
+    async def run_action(self, name, args):
+        """
+        执行一条命令。
+
+        XY 移动（包括跟随 Z/R 的 move_xyzr）只进入前瞻队列，队列满时等运动任务腾出空间；
+        灯光不影响运动，立即切换；气泵、Z/R 轴等吸嘴动作先等所有轴停稳再执行。
+        """
+        commands = self.commands
+        if name not in commands:
+            self.send_data(f"Unknown command: {name}\n")
+            self.errors += 1
+            return
+        if name in QUEUED_COMMANDS:
+            while self.motion_queue.full:
+                await asyncio.sleep_ms(1)
+            commands[name](*args)
+            self.motion_event.set()
+            return
+        if name not in IMMEDIATE_COMMANDS:
+            await self.drain_motion()
+        if name in ASYNC_COMMANDS:
+            await commands[name](*args)
+            return
+        commands[name](*args)
+
+    async def drain_motion(self):
+        """flush_motion 的异步版本，等待期间其他任务照常运行"""
+        self.motion_queue.mark_stop()
+        self.motion_event.set()
+        while self.motion_active:
+            await asyncio.sleep_ms(1)
+
+    async def motion_task(self):
+        """
+        逐段执行前瞻队列。
+
+        下一段尽量晚取出：当前段剩余时间只够规划下一段时才取出，期间到达的新段仍能参与前瞻；
+        规划完再睡到当前段即将结束时 commit，commit 内部的阻塞等待只有几毫秒。
+        规划余量取最近一次规划耗时的两倍。忙等后端下 commit 会阻塞整段移动。
+        """
+        corexy = self.corexy
+        queue = self.motion_queue
+        plan_ms = PLAN_MARGIN_MS
+        while True:
+            if not len(queue):
+                self.motion_event.clear()
+                await self.motion_event.wait()
+                continue
+            wait = corexy.remaining_ms() - plan_ms
+            if wait > 0:
+                await asyncio.sleep_ms(wait)
+                continue
+            seg = queue.pop()
+            t0 = time.ticks_ms()
+            rest = self.prepare_segment(seg)
+            plan_ms = 2 * time.ticks_diff(time.ticks_ms(), t0) + PLAN_MARGIN_MS
+            wait = corexy.remaining_ms() - COMMIT_MARGIN_MS
+            if wait > 0:
+                await asyncio.sleep_ms(wait)
+            while self.settle and (self.zaxis.busy or self.raxis.busy):
+                await asyncio.sleep_ms(1)
+            self.commit_segment(rest)
+
+    async def status_task(self):
+        """状态变化时主动上报（序号 0），运动过程中最多每 STATUS_INTERVAL_MS 一次"""
+        last = None
+        while True:
+            await asyncio.sleep_ms(STATUS_INTERVAL_MS)
+            payload = self.status_payload()
+            if payload != last:
+                self.send_frame(0, FRAME_STATUS, payload)
+                last = payload
+
+    async def telemetry_task(self):
+        """
+        按 telemetry_interval 周期推送遥测记录（FRAME_TELEMETRY）。
+
+        每 TELEMETRY_TICK_MS 醒来一次，实际醒来比预定晚的部分就是其他任务占住调度器的时间，
+        记录中带有本周期内它的平均值和最大值。到发送时刻串口还在发送别的数据时不写入，
+        本条并入下一条，遥测不会挤占应答帧的带宽，也不会在发送缓冲区里堆积过时的位置。
+        """
+        due = time.ticks_ms()
+        while True:
+            interval = self.telemetry_interval
+            if not interval:
+                self.telemetry_event.clear()
+                await self.telemetry_event.wait()
+                self.loop_total = self.loop_count = self.loop_max = 0
+                self.telemetry_coalesced = 0
+                due = time.ticks_ms()
+                continue
+            t0 = time.ticks_us()
+            await asyncio.sleep_ms(TELEMETRY_TICK_MS)
+            lag = time.ticks_diff(time.ticks_us(), t0) - TELEMETRY_TICK_MS * 1000
+            if lag > 0:
+                self.loop_total += lag
+                if lag > self.loop_max:
+                    self.loop_max = lag
+            self.loop_count += 1
+            now = time.ticks_ms()
+            if time.ticks_diff(now, due) < 0:
+                continue
+            due = time.ticks_add(due, interval)
+            if time.ticks_diff(now, due) >= 0:
+                # 落后一整个周期以上时不补发，从现在重新计时
+                due = time.ticks_add(now, interval)
+            if not self.uart.txdone():
+                self.telemetry_coalesced += 1
+                continue
+            self.uart.write(self.pack_telemetry(now))
+
+    async def run(self):
+        """控制器主循环：命令接收、命令执行、运动执行、状态上报、遥测五个任务并发运行"""
+        asyncio.create_task(self.motion_task())
+        asyncio.create_task(self.action_task())
+        asyncio.create_task(self.status_task())
+        asyncio.create_task(self.telemetry_task())
+        await self.command_task()
+
     def handle_cmd1(self, *args):
         print(f"Handling CMD1 with args: {args}")
         # 处理 CMD1 的逻辑，使用 args
@@ -264,6 +1033,20 @@ class SmtController:
             'down_light_off': self.down_light_off,
             'air_pump_on': self.air_pump_on,
             'air_pump_off': self.air_pump_off,
+            'air_pump': self.set_air_pump,
+            'up_light': self.set_up_light,
+            'down_light': self.set_down_light,
+            'move_xy': self.move_xy,
+            'move_z': self.move_z,
+            'move_r': self.move_r,
+            'move_xyzr': self.move_xyzr,
+            'flush': self.flush_motion,
+            'step_backend': self.set_step_backend,
+            'telemetry': self.set_telemetry,
+            'home': self.home,
+            'calibrate': self.set_calibration,
+            'calibration': self.print_calibration,
+            'save_calibration': self.save_calibration,
             
             # 添加更多命令
         }
\ No newline at end of file
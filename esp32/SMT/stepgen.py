@@ -0,0 +1,448 @@
+from machine import Timer
+from array import array
+import esp32
+import time
+
+from planner import zeros
+
+# 步进脉冲发生后端
+# CoreXY/OneAxis 只负责规划速度曲线，由后端从 planner.StepStream 逐步取出间隔变成脉冲：
+#   BusyLoopBackend  在调用线程里忙等执行，移动期间阻塞（原有行为）
+#   TimerBackend     machine.Timer 分片执行，移动期间主循环仍可处理命令
+#   RMTBackend       ESP32 RMT 外设硬件输出脉冲，定时器回调逐块写入，每块 CHUNK_STEPS 步
+# 三个后端接口一致：start() 启动一次移动，busy 查询状态，wait() 等待结束，
+# executed 为当前段（已结束时为最近一段）已经发出的主轴步数，调用方据此推算各电机的实时位置。
+# start(step_major, minors, stream, count, minor_counts)：stream 为主轴的 StepStream，
+# minors 为从轴 STEP 引脚元组，minor_counts 为对应的步数，单轴移动时两者为空，从轴最多 3 个。
+# 后端执行期间持续读取 stream，调用方规划下一段时要换一个 StepStream。
+# start() 等于 prepare() + commit()：prepare 在上一段执行期间做好准备工作，
+# commit 等上一段结束后立即启动，asyncio 任务可以在两者之间让出 CPU。
+
+PULSE_US = 2  # RMT 输出的脉冲高电平宽度，微秒
+CHUNK_STEPS = 128  # RMT 每次写入的主轴步数，决定脉冲缓冲的大小
+PUMP_MARGIN_US = 1500  # 一块预计发完前提前这么久唤醒，准备写入下一块
+RMT_MAX_TICKS = 32767  # RMT 单个条目的最长时长
+
+
+def run_dda(step_major, minors, stream, count, minor_counts, errs):
+    """
+    Bresenham/DDA 插补内核，XY、Z、R 轴共用。
+
+    主轴按 stream 逐步给出的间隔走 count 步，每个从轴用各自的整数误差累加器在主轴步进时刻
+    插入 minor_counts[k] 步，所有电机步速成比例并同时结束。单轴移动时 minors 为空。
+    每步的截止时间在上一步的截止时间上累加，轮询延迟不会累积成位置误差；
+    下一步的间隔在发出这一步之后、等待截止时间的空档里计算。
+    插补部分只有整数运算，误差累加器 errs 由调用方预分配。
+    引脚调用本身就超过 1us，不再额外 sleep_us。与 planner.dda_times 的累加规则保持一致。
+    """
+    ticks_us = time.ticks_us
+    ticks_add = time.ticks_add
+    ticks_diff = time.ticks_diff
+    if count <= 0:
+        return
+    next_interval = stream.next
+    n = len(minors)
+    half = count >> 1
+    for k in range(n):
+        errs[k] = half
+    i = 0
+    deadline = ticks_add(ticks_us(), next_interval())
+    while i < count:
+        if ticks_diff(ticks_us(), deadline) >= 0:
+            step_major.on()
+            step_major.off()
+            for k in range(n):
+                err = errs[k] + minor_counts[k]
+                if err >= count:
+                    err -= count
+                    minors[k].on()
+                    minors[k].off()
+                errs[k] = err
+            i += 1
+            if i < count:
+                deadline = ticks_add(deadline, next_interval())
+
+
+class BusyLoopBackend:
+    """在调用线程中直接执行 run_dda，start() 返回时移动已经完成"""
+
+    concurrent = False  # 多个轴之间不能同时运动
+
+    def __init__(self):
+        self.errs = array('i', [0, 0, 0])
+        self.pending = None
+        self.count = 0
+
+    @property
+    def busy(self):
+        return False
+
+    @property
+    def executed(self):
+        return self.count
+
+    def prepare(self, step_major, minors, stream, count, minor_counts):
+        self.pending = (step_major, minors, stream, count, minor_counts)
+
+    def commit(self):
+        if self.pending is not None:
+            step_major, minors, stream, count, minor_counts = self.pending
+            self.pending = None
+            self.start(step_major, minors, stream, count, minor_counts)
+
+    def start(self, step_major, minors, stream, count, minor_counts):
+        run_dda(step_major, minors, stream, count, minor_counts, self.errs)
+        self.count = count
+
+    def wait(self):
+        pass
+
+    def deinit(self):
+        pass
+
+
+class TimerBackend:
+    """
+    用 machine.Timer 周期回调分片执行 DDA。
+
+    ESP32 的 Timer 回调是软中断，每次回调只执行截止时间落在 slice_us 之内的步，
+    执行完立即返回，剩余的 CPU 时间留给主循环处理 UART 命令。
+    回调被推迟时，错过的步会在下一次回调中补上，位置不会丢。
+    """
+
+    concurrent = True
+
+    def __init__(self, timer_id=0, period_ms=1, slice_us=500):
+        self.timer = Timer(timer_id)
+        self.period_ms = period_ms
+        self.slice_us = slice_us
+        self.running = False
+        self.step_major = None
+        self.minors = ()
+        self.stream = None
+        self.count = 0
+        self.minor_counts = None
+        self.errs = array('i', [0, 0, 0])
+        self.index = 0
+        self.deadline = 0
+        self.pending = None
+
+    @property
+    def busy(self):
+        return self.running
+
+    @property
+    def executed(self):
+        # index 在每次回调结束时更新，精度为一次回调
+        return self.index if self.running else self.count
+
+    def prepare(self, step_major, minors, stream, count, minor_counts):
+        # 回调执行期间会持续读取当前段的参数，下一段先单独保存
+        self.pending = (step_major, minors, stream, count, minor_counts)
+
+    def commit(self):
+        if self.pending is not None:
+            args = self.pending
+            self.pending = None
+            self.start(*args)
+
+    def start(self, step_major, minors, stream, count, minor_counts):
+        self.wait()
+        if count <= 0:
+            self.count = 0
+            return
+        self.step_major = step_major
+        self.minors = minors
+        self.stream = stream
+        self.count = count
+        self.minor_counts = minor_counts
+        for k in range(len(minors)):
+            self.errs[k] = count >> 1
+        self.index = 0
+        self.deadline = time.ticks_add(time.ticks_us(), stream.next())
+        self.running = True
+        self.timer.init(period=self.period_ms, mode=Timer.PERIODIC, callback=self._tick)
+
+    def _tick(self, timer):
+        ticks_us = time.ticks_us
+        ticks_add = time.ticks_add
+        ticks_diff = time.ticks_diff
+        next_interval = self.stream.next
+        count = self.count
+        minors = self.minors
+        minor_counts = self.minor_counts
+        errs = self.errs
+        n = len(minors)
+        i = self.index
+        deadline = self.deadline
+        horizon = ticks_add(ticks_us(), self.slice_us)
+        while i < count and ticks_diff(horizon, deadline) >= 0:
+            while ticks_diff(ticks_us(), deadline) < 0:
+                pass
+            self.step_major.on()
+            self.step_major.off()
+            for k in range(n):
+                err = errs[k] + minor_counts[k]
+                if err >= count:
+                    err -= count
+                    minors[k].on()
+                    minors[k].off()
+                errs[k] = err
+            i += 1
+            if i < count:
+                deadline = ticks_add(deadline, next_interval())
+        self.index = i
+        self.deadline = deadline
+        if i >= count:
+            timer.deinit()
+            self.running = False
+
+    def wait(self):
+        while self.running:
+            time.sleep_ms(1)
+
+    def deinit(self):
+        self.wait()
+        self.timer.deinit()
+
+
+class RMTBackend:
+    """
+    用 ESP32 RMT 外设输出脉冲序列。
+
+    每个 STEP 引脚独占一个 RMT 发送通道（S3 有 4 个，正好对应 A/B/Z/R 四个电机），
+    绑定后该引脚只能由 RMT 驱动。一段移动按主轴 CHUNK_STEPS 步切成若干块逐块写入：
+    主轴脉冲来自 StepStream，从轴脉冲按与 run_dda 相同的规则插在主轴的步进时刻上，
+    每一路都用低电平补齐到块的结束时刻，各路同时开始、同时结束。
+    两组缓冲轮流使用，一块发送期间展开下一块；单次 machine.Timer 在这一块预计结束前
+    PUMP_MARGIN_US 唤醒，等它发完立即写入下一块。缓冲大小只取决于 CHUNK_STEPS，与移动长度无关。
+
+    write_pulses 使用“时长列表 + 电平列表”的形式，超过 RMT_MAX_TICKS 的低电平拆成几个条目。
+    write_pulses 会先把列表转换成 RMT 条目再启动，后写入的通道比先写入的晚启动，
+    按上一次测得的每个条目的转换耗时在先写入的通道前补相应长度的低电平；
+    块与块之间从发完到下一块启动有一小段空档，按最近几次实测的空档缩短下一块开头的低电平。
+    """
+
+    concurrent = True
+
+    def __init__(self, channels=(0, 1, 2, 3), timer_id=0):
+        self.free_channels = list(channels)
+        self.rmts = {}
+        self.timer = Timer(timer_id)
+        self.pump = self._pump               # 绑定方法只取一次，装定时器时不再分配
+        self.chunk = zeros(CHUNK_STEPS)
+        # 两组缓冲，每组每一路一对 (时长列表, 电平列表)，主轴在前
+        self.buffers = ([([], []) for _ in range(4)], [([], []) for _ in range(4)])
+        self.chunk_us = [0, 0]               # 两组缓冲中那一块从启动到结束的时长
+        self.chunk_steps = [0, 0]            # 两组缓冲中那一块的主轴步数
+        self.channels = [None, None, None, None]
+        self.lanes = 0
+        self.counts = array('I', [0, 0, 0])
+        self.errs = array('i', [0, 0, 0])
+        self.cursors = array('i', [0, 0, 0, 0])
+        self.sizes = array('I', [0, 0, 0, 0])
+        self.stream = None
+        self.count = 0
+        self.index = 0                       # 当前段已经展开的主轴步数
+        self.done = 0                        # 当前段已经发完的块中的主轴步数
+        self.written = 1                     # 最后写入通道的那组缓冲
+        self.sending = False                 # 还有展开好、等定时器写入的块
+        self.end_us = 0                      # 最后写入的一块预计结束的时刻
+        self.ns_per_item = 0
+        self.gap_us = 0
+        self.pending = None
+
+    def _rmt(self, pin):
+        rmt = self.rmts.get(pin)
+        if rmt is None:
+            # 80 分频，1 个 tick 等于 1 微秒
+            rmt = esp32.RMT(self.free_channels.pop(0), pin=pin, clock_div=80)
+            self.rmts[pin] = rmt
+        return rmt
+
+    @staticmethod
+    def _put(pair, size, duration, level):
+        """在第 size 个位置写入一个条目，超过 RMT_MAX_TICKS 的拆成几个，返回新的长度"""
+        durations, levels = pair
+        while duration > 0:
+            d = duration if duration < RMT_MAX_TICKS else RMT_MAX_TICKS
+            if size < len(durations):
+                durations[size] = d
+                levels[size] = level
+            else:
+                durations.append(d)
+                levels.append(level)
+            size += 1
+            duration -= d
+        return size
+
+    def _build(self, b, join):
+        """
+        把当前段接下来的一块展开到第 b 组缓冲
+
+        :param join: 这一块紧接着上一块发出，开头的低电平减去实测的空档
+        """
+        chunk = self.chunk
+        t = 0 if self.index == 0 else -PULSE_US  # 以块的开始为零点，上一块在最后一个脉冲结束时结束
+        n = self.stream.fill(chunk, CHUNK_STEPS)
+        self.index += n
+        self.chunk_steps[b] = n
+        buf = self.buffers[b]
+        lanes = self.lanes
+        count = self.count
+        counts = self.counts
+        errs = self.errs
+        cursors = self.cursors
+        sizes = self.sizes
+        put = self._put
+        for lane in range(lanes):
+            cursors[lane] = 0
+            sizes[lane] = 0
+        major = buf[0]
+        for j in range(n):
+            t += chunk[j]
+            sizes[0] = put(major, put(major, sizes[0], t - cursors[0], 0), PULSE_US, 1)
+            cursors[0] = t + PULSE_US
+            for k in range(lanes - 1):
+                err = errs[k] + counts[k]
+                if err >= count:
+                    err -= count
+                    lane = k + 1
+                    sizes[lane] = put(buf[lane], put(buf[lane], sizes[lane], t - cursors[lane], 0), PULSE_US, 1)
+                    cursors[lane] = t + PULSE_US
+                errs[k] = err
+        end = t + PULSE_US
+        # 各路补齐到块的结束时刻，开头补上其后写入的各路的转换耗时
+        after = 0
+        for lane in range(lanes - 1, -1, -1):
+            pair = buf[lane]
+            size = put(pair, sizes[lane], end - cursors[lane], 0)
+            durations, levels = pair
+            del durations[size:]
+            del levels[size:]
+            lead = after * self.ns_per_item // 1000
+            if join:
+                lead -= self.gap_us
+            if lead:
+                durations[0] = min(max(durations[0] + lead, 1), RMT_MAX_TICKS)
+            if lane == 0:
+                self.chunk_us[b] = end + lead
+            after += size
+
+    def _write(self, b, join):
+        """把第 b 组缓冲写入各通道，主轴最先写入"""
+        buf = self.buffers[b]
+        channels = self.channels
+        durations, levels = buf[0]
+        channels[0].write_pulses(durations, levels)
+        t0 = time.ticks_us()
+        if join:
+            # 主轴比上一块的预计结束晚启动的时间，即块与块之间的空档
+            gap = time.ticks_diff(t0, self.end_us)
+            self.gap_us = (3 * self.gap_us + (gap if gap > 0 else 0)) >> 2
+        items = 0
+        for lane in range(1, self.lanes):
+            durations, levels = buf[lane]
+            channels[lane].write_pulses(durations, levels)
+            items += len(durations)
+        if items:
+            self.ns_per_item = time.ticks_diff(time.ticks_us(), t0) * 1000 // items
+        self.end_us = time.ticks_add(t0, self.chunk_us[b])
+        self.written = b
+
+    def _next(self):
+        """写入一块之后：还有步数时展开下一块并在这一块结束前唤醒，否则这一段已全部写入"""
+        if self.index < self.count:
+            self._build(self.written ^ 1, True)
+            self.sending = True
+            delay = time.ticks_diff(self.end_us, time.ticks_us()) - PUMP_MARGIN_US
+            self.timer.init(mode=Timer.ONE_SHOT, period=delay if delay > 100 else 100, tick_hz=1000000,
+                            callback=self.pump)
+        else:
+            self.sending = False
+
+    def _pump(self, timer):
+        """定时器回调：等正在发送的一块发完，写入已展开的下一块"""
+        channels = self.channels
+        for lane in range(self.lanes):
+            while not channels[lane].wait_done():
+                pass
+        self.done += self.chunk_steps[self.written]
+        self._write(self.written ^ 1, True)
+        self._next()
+
+    @property
+    def busy(self):
+        if self.sending:
+            return True
+        for rmt in self.rmts.values():
+            if not rmt.wait_done():
+                return True
+        return False
+
+    @property
+    def executed(self):
+        # 按块计，正在发送的一块发完之前不计入
+        return self.done if self.busy else self.count
+
+    def prepare(self, step_major, minors, stream, count, minor_counts):
+        """只记录参数，脉冲在 commit 和定时器回调中逐块展开"""
+        self.pending = (step_major, minors, stream, count, minor_counts)
+
+    def commit(self):
+        """等上一段的块全部写入后展开这一段的第一块，上一段发完立即写入"""
+        if self.pending is None:
+            return
+        step_major, minors, stream, count, minor_counts = self.pending
+        self.pending = None
+        if count <= 0:
+            self.wait()
+            self.count = 0
+            return
+        # 定时器写入上一段的最后一块之后，上一段的参数和另一组缓冲都不再使用
+        while self.sending:
+            pass
+        join = self.busy
+        channels = self.channels
+        channels[0] = self._rmt(step_major)
+        lanes = 1
+        for k in range(len(minors)):
+            m = minor_counts[k]
+            if m > 0:
+                channels[lanes] = self._rmt(minors[k])
+                self.counts[lanes - 1] = m
+                self.errs[lanes - 1] = count >> 1
+                lanes += 1
+        self.lanes = lanes
+        self.stream = stream
+        self.count = count
+        self.index = 0
+        self.done = 0
+        b = self.written ^ 1
+        self._build(b, join)
+        for rmt in self.rmts.values():
+            while not rmt.wait_done():
+                pass
+        self._write(b, join)
+        self._next()
+
+    def start(self, step_major, minors, stream, count, minor_counts):
+        self.prepare(step_major, minors, stream, count, minor_counts)
+        self.commit()
+
+    def wait(self):
+        while self.sending:
+            time.sleep_ms(1)
+        for rmt in self.rmts.values():
+            while not rmt.wait_done(timeout=10):
+                pass
+
+    def deinit(self):
+        """释放 RMT 通道和定时器，并把引脚交还给普通 GPIO"""
+        self.wait()
+        self.timer.deinit()
+        for pin, rmt in self.rmts.items():
+            rmt.deinit()
+            pin.init(pin.OUT)
+            pin.off()
+        self.rmts = {}
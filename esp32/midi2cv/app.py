@@ -0,0 +1,92 @@
+from machine import Pin, I2C, UART, Timer
+import time
+import asyncio
+import board
+from midiparser import MidiParser
+from midiinput import MidiInput, RXBUF
+from midi_handler import MidiToVoltageConverter
+from midiclock import ClockEngine
+
+# 主程序
+# 按板级配置（board.py）初始化 I2C、DAC、串口和 MIDI 输入，然后运行主循环。
+# 与其余模块一起冻结进固件（见 manifest.py），boot.py 只导入本模块并调用 run()。
+# 启动过程的时间点（上电后的 ms）保存在 boot_ms 中，启动完成时打印：boot.py 开始运行、
+# 模块导入完成、初始化完成；第一个音符的时间由 midi2cv.first_note_ms 记录并打印。
+# 模块以源码形式放在 Flash 上时，导入时间主要是编译时间，冻结后这部分基本消失。
+# 在 REPL 中可以通过 app.midi2cv、app.midi_in 访问运行中的对象。
+
+STATS_INTERVAL_MS = 0  # 大于 0 时按此周期打印 MIDI 输入统计
+
+profile = None
+i2c = None
+uart = None
+parser = None
+midi2cv = None
+midi_in = None
+clock = None
+boot_ms = {}
+
+
+def setup(name=None):
+    """
+    按板级配置创建全部对象
+
+    :param name: board.BOARDS 中的配置名，None 时自动识别
+    """
+    global profile, i2c, uart, parser, midi2cv, midi_in, clock
+    boot_ms['import'] = time.ticks_ms()
+    profile = board.load(name)
+
+    # 配置scl为推挽输出模式，sda为开漏输出模式
+    i2c_id, scl, sda, freq = profile.i2c
+    i2c = I2C(i2c_id, scl=Pin(scl, Pin.OUT, Pin.PULL_UP), sda=Pin(sda, Pin.OPEN_DRAIN), freq=freq)
+
+    midi2cv = MidiToVoltageConverter(i2c, profile)
+
+    # 初始化 UART
+    uart_id, tx, rx = profile.uart
+    uart = UART(uart_id, baudrate=31250, tx=tx, rx=rx, rxbuf=RXBUF)
+
+    # MIDI 解析器，读取缓冲区预分配，处理函数按演奏模式注册一次
+    parser = MidiParser()
+    midi2cv.attach(parser)
+    # MIDI 时钟：跟踪速度，在空闲引脚上输出分频时钟和复位脉冲
+    clock = ClockEngine([Pin(pin, Pin.OUT, value=0) for pin, _ in profile.clock_outputs],
+                        [division for _, division in profile.clock_outputs],
+                        None if profile.reset_output is None else Pin(profile.reset_output, Pin.OUT, value=0),
+                        Timer(profile.clock_timer))
+    clock.attach(parser)
+    midi_in = MidiInput(uart, parser)
+    boot_ms['ready'] = time.ticks_ms()
+    print("%s boot %d ms, imported %d ms, ready %d ms after reset" % (
+        profile.name, boot_ms.get('boot', 0), boot_ms['import'], boot_ms['ready']))
+
+
+async def stats_task():
+    while True:
+        await asyncio.sleep_ms(STATS_INTERVAL_MS)
+        print("MIDI dropped=%d overruns=%d max_backlog=%d max_latency=%dus errors=%d stray=%d" % midi_in.stats())
+        print("MOD rate=%.0fHz i2c=%.0f/s %.0fB/s busy=%.1f%% max_tick=%dus" % midi2cv.mod.stats())
+        midi2cv.mod.reset_stats()
+        print("CLOCK bpm=%.1f clocks=%d max_late=%dus resyncs=%d" % clock.stats())
+        clock.reset_stats()
+
+# 主循环
+
+
+async def main():
+    midi2cv.mod.start()
+    if STATS_INTERVAL_MS:
+        asyncio.create_task(stats_task())
+    if midi_in.start():
+        # 串口中断接收，分发由 micropython.schedule 安排
+        while True:
+            await asyncio.sleep_ms(1000)
+    else:
+        await midi_in.task()
+
+
+def run(name=None):
+    setup(name)
+    # 运行主循环
+    asyncio.run(main())
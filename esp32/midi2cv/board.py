@@ -0,0 +1,147 @@
+import os
+from voiceallocator import LOWEST_FREE
+
+# 板级配置
+# C3 与 S3 两种控制板的引脚、DAC 通道用途和演奏设置集中在 BOARDS 中，启动时按芯片型号选出一份，
+# 只读取一次，midi_handler.py 和 app.py 按它创建 DAC、门控等，不再各自保存一份引脚表。
+# DAC 通道用途按演奏模式给出：地址 -> (A, B, C, D 四个通道的用途)，None 为不使用，
+# 同一用途出现多次时按地址、通道顺序排列，例如 'pitch' 依次为第 0、1、2… 个声部的音高。
+# 用途：
+#   pitch      声部音高（1V/oct）
+#   velocity   力度；和弦模式只有一个，独奏模式每个声部一个
+#   pitchbend  弯音轮
+#   cc         控制器
+#   trigger    触发（预留）
+
+SOLO = 0
+CHORD = 1
+
+BOARD = None     # 为 None 时按 os.uname().machine 识别，也可以直接写 'ESP32C3' 或 'ESP32S3'
+
+BOARDS = {
+    'ESP32C3': {
+        'uart': (1, 21, 20),                # (编号, TX, RX)
+        'i2c': (0, 9, 8, 400000),           # (编号, SCL, SDA, 频率)
+        'dacs': {
+            CHORD: {
+                0x60: ('pitch', 'pitch', 'pitch', 'pitch'),
+                0x61: ('velocity', 'pitchbend', 'cc', 'trigger'),
+            },
+            SOLO: {
+                0x60: ('pitch', 'pitch', 'pitch', 'pitch'),
+                0x61: ('velocity', 'velocity', 'velocity', 'velocity'),
+            },
+        },
+        'ldac': {0x60: 5, 0x61: 6},         # DAC 地址 -> LDAC 引脚
+        'use_ldac': False,                  # True 时 LDAC 空闲保持高电平，批量写入后一起拉低；False 时须保持低电平
+        'gates': (3, 2, 1, 0),
+        'trigger': None,                    # 触发输出引脚
+        'voices': 4,
+        'playmode': SOLO,
+        'midi_channel': None,               # 和弦模式接收的 MIDI 通道（0-15），None 为全部
+        'solo_channels': (9, 10, 11, 12),   # 独奏模式各声部的 MIDI 通道
+        'voice_policy': LOWEST_FREE,        # 和弦模式的复音分配方式，见 voiceallocator.py
+        'mod_rate_hz': 500,                 # 调制引擎更新频率，0 表示不启动定时器
+        'bend_range': 2,                    # 弯音范围，半音
+        'glide_ms': 0,                      # 滑音时间
+        'clock_outputs': (),                # MIDI 时钟输出 ((引脚, 分频), ...)，分频以 MIDI 时钟计，24 为四分音符，
+                                            # 可以用声部之外空闲的门控，例如 voices 改为 3、((0, 6),) 为十六分音符
+        'reset_output': None,               # 收到 START 时输出复位脉冲的引脚
+        'clock_timer': 2,                   # 时钟输出使用的 machine.Timer，调制引擎使用 0
+    },
+    'ESP32S3': {
+        'uart': (2, 17, 18),
+        'i2c': (0, 2, 1, 400000),
+        'dacs': {
+            CHORD: {
+                0x60: ('velocity', 'pitch', 'pitch', None),
+                0x61: ('pitch', 'cc', 'pitch', 'pitchbend'),
+                0x62: ('pitch', None, 'pitch', None),
+            },
+        },
+        'ldac': {0x60: 42, 0x61: 40, 0x62: 38},
+        'use_ldac': False,
+        'gates': (48, 47, 21, 20, 19, 7),
+        'trigger': 8,
+        'voices': 6,
+        'playmode': CHORD,
+        'midi_channel': None,
+        'solo_channels': (),
+        'voice_policy': LOWEST_FREE,
+        'mod_rate_hz': 500,
+        'bend_range': 2,
+        'glide_ms': 0,
+        'clock_outputs': (),
+        'reset_output': None,
+        'clock_timer': 2,
+    },
+}
+
+
+class Board:
+    """
+    一份板级配置，键与 BOARDS 中相同，作为属性访问
+
+    :param name: BOARDS 中的键
+    :param profile: 配置字典
+    """
+
+    def __init__(self, name, profile):
+        self.name = name
+        for key, value in profile.items():
+            setattr(self, key, value)
+        if self.playmode not in self.dacs:
+            raise ValueError("%s does not support playmode %d" % (name, self.playmode))
+        if self.voices > len(self.gates) or self.voices > len(self.roles('pitch')):
+            raise ValueError("%s: %d voices need as many gates and pitch channels" % (name, self.voices))
+        if self.playmode == SOLO and (len(self.solo_channels) < self.voices or len(self.roles('velocity')) < self.voices):
+            raise ValueError("%s: solo mode needs a MIDI channel and a velocity output per voice" % name)
+        busy = self.gates[:self.voices] + ((self.trigger,) if self.trigger is not None else ())
+        for pin in [pin for pin, _ in self.clock_outputs] + [self.reset_output]:
+            if pin is not None and pin in busy:
+                raise ValueError("%s: clock pin %d is already used by a voice gate or the trigger" % (name, pin))
+
+    @property
+    def dac_addresses(self):
+        """当前演奏模式用到的 DAC 地址，按地址排序"""
+        return sorted(self.dacs[self.playmode])
+
+    def roles(self, role):
+        """
+        当前演奏模式下某个用途的全部 DAC 通道
+
+        :return: [(DAC 地址, 通道序号 0-3), ...]，按地址、通道顺序
+        """
+        channels = []
+        layout = self.dacs[self.playmode]
+        for address in sorted(layout):
+            for channel, name in enumerate(layout[address]):
+                if name == role:
+                    channels.append((address, channel))
+        return channels
+
+
+_board = None
+
+
+def detect():
+    """按 os.uname().machine 中的芯片型号选择 BOARDS 中的配置名"""
+    machine = os.uname().machine
+    for name in BOARDS:
+        if name in machine:
+            return name
+    raise ValueError("no board profile for " + machine)
+
+
+def load(name=None):
+    """
+    读取板级配置，只在第一次调用时创建
+
+    :param name: BOARDS 中的键，None 时使用 BOARD 或自动识别
+    :return: Board
+    """
+    global _board
+    if _board is None or (name is not None and name != _board.name):
+        name = name or BOARD or detect()
+        _board = Board(name, BOARDS[name])
+    return _board
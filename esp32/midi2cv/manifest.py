@@ -0,0 +1,27 @@
+# midi2cv 固件清单
+# 把 midi2cv 的模块编译成字节码冻结进固件，启动时直接从 Flash 执行，不再读取和编译 .py 源码，
+# 也不占用堆来存放字节码。C3 与 S3 使用同一份清单，板级差异由 board.py 在运行时识别。
+# 在 micropython-1.23.0/ports/esp32 下编译（ESP-IDF 环境已配置）：
+#   make BOARD=ESP32_GENERIC_C3 FROZEN_MANIFEST=$(pwd)/../../../midi2cv/manifest.py
+#   make BOARD=ESP32_GENERIC_S3 FROZEN_MANIFEST=$(pwd)/../../../midi2cv/manifest.py
+# 烧写后 Flash 上只需要 boot.py（以及标定文件 pitch.bin），同名的 .py 文件要删除，
+# 否则会优先导入 Flash 上的源码（sys.path 中 '' 在 '.frozen' 之前）。
+
+# 固件原有的冻结模块（asyncio、网络等）
+include("$(PORT_DIR)/boards/manifest.py")
+
+freeze(
+    ".",
+    (
+        "app.py",
+        "board.py",
+        "mcp4728.py",
+        "midi_handler.py",
+        "midiclock.py",
+        "midiinput.py",
+        "midiparser.py",
+        "modulation.py",
+        "pitchtable.py",
+        "voiceallocator.py",
+    ),
+)
@@ -36,6 +36,18 @@ Ported to microPython by Alexander Olikevich (openfablab) with some changes:
 * Fixed incorrect register values types on initialisation 
 * Gains values read and write as 1 or 2
 * Rewrited Vref control for simplicity
+* Batched updates: Channel.stage() + MCP4728.flush() write all staged channels of a chip in one
+  Fast Write transaction from preallocated buffers; MCP4728Group flushes several chips and can
+  use the LDAC pins so every output changes at the same time
+* Cached mode (default): after init the driver is the source of truth, channel properties
+  return the cached fields and refresh() re-reads the device explicitly
+
+缓存模式下的 I2C 传输次数（400kHz，读一次寄存器为 24 字节，约 0.6ms）：
+  * 读取 value/gain/vref/pdm、normalized_value：每次 1 次 24 字节读取 -> 0 次
+  * 读-改-写（如 ch.value += 1、按当前值做判断后再写）：1 读 1 写 -> 1 写
+  * midi2cv 每个音符（音高 + 力度两次写入）不再有任何读取，调试输出中打印通道也不访问总线
+器件被外部修改（另一个 I2C 主机、EEPROM 复位、GENERAL CALL RESET）后调用 refresh() 重新同步。
+cached=False 时保持原来每次读取都访问器件的行为。
 
 """
 
@@ -43,6 +55,7 @@ from struct import pack_into
 from time import sleep
 _MCP4728_DEFAULT_ADDRESS = 0x60 #0x60
 _MCP4728_CH_A_MULTI_EEPROM = 0x50
+_MCP4728_MULTI_WRITE = 0x40
 
 
 
@@ -52,16 +65,18 @@ class MCP4728:
         :param address: The I2C slave address of the sensor
     """
 
-    def __init__(self, i2c_bus, address=_MCP4728_DEFAULT_ADDRESS):
+    def __init__(self, i2c_bus, address=_MCP4728_DEFAULT_ADDRESS, cached=True):
         """
         初始化函数。
         
         :param i2c_bus: I2C总线对象，用于与MCP4728进行通信。
         :param address: MCP4728的I2C地址，默认为_MCP4728_DEFAULT_ADDRESS。
+        :param cached: 为 True 时通道属性返回缓存值，只在初始化和 refresh() 时读取器件。
         """
         # 将I2C总线对象和地址保存为实例变量
         self.i2c_device = i2c_bus
         self.address = address
+        self.cached = cached
         
         # 读取所有通道的寄存器原始值
         raw_registers = self._read_registers()
@@ -71,9 +86,28 @@ class MCP4728:
         self.b = Channel(self, self._cache_page(*raw_registers[1]), 1)
         self.c = Channel(self, self._cache_page(*raw_registers[2]), 2)
         self.d = Channel(self, self._cache_page(*raw_registers[3]), 3)
-        
-        
-        
+        self.channels = (self.a, self.b, self.c, self.d)
+
+        # 写入用的预分配缓冲区：Multi-Write 单通道 3 字节，Fast Write 四通道 8 字节
+        self._write_buf = bytearray(3)
+        self._fast_buf = bytearray(8)
+        fast = memoryview(self._fast_buf)
+        self._fast_views = (fast[:2], fast[:4], fast[:6], fast)
+        # 已暂存（stage）、尚未写入器件的通道位掩码，bit0 为通道 A
+        self.dirty = 0
+
+    def refresh(self):
+        """
+        从器件重新读取四个通道的输出寄存器，更新缓存。
+
+        缓存模式下驱动以缓存为准，只有器件可能被外部修改时才需要调用。
+        """
+        for channel, (value, vref, gain, pdm) in zip(self.channels, self._read_registers()):
+            channel._value = value
+            channel._vref = vref
+            channel._gain = gain
+            channel._pdm = pdm
+
     @staticmethod
     def _get_flags(high_byte):
         vref = (high_byte & 1 << 7) > 0
@@ -198,33 +232,61 @@ class MCP4728:
         # 向I2C设备发送数据，同步PDM状态
         self.i2c_device.writeto(self.address,output_buffer)
 
-    def _set_value(self, channel):
+    def _set_value(self, channel, udac=0):
         """
         设置DAC通道的输出值。
 
-        此方法首先生成包含通道值和标志的字节序列，然后根据这些字节和通道索引
-        构建一个写命令字节。最后，将写命令字节和通道值字节序列组合成输出缓冲区，
-        并通过I2C通信将该缓冲区发送到DAC设备。
+        用 Multi-Write 命令写入单个通道：命令字节 0 1 0 0 0 DAC1 DAC0 UDAC，
+        随后两字节为 VREF PD1 PD0 Gx D11-D8 和 D7-D0，写入预分配的缓冲区后一次发送。
 
         参数:
         - channel: DACChannel对象，包含要设置的DAC通道索引和值。
+        - udac: 为 0 时输出在传输完成时更新，为 1 时等待 LDAC 下降沿。
 
         返回值:
         无返回值。
         """
-        # 生成包含通道值和标志的字节序列
-        channel_bytes = self._generate_bytes_with_flags(channel)
-        # 构建写命令字节，设置DAC1、DAC0和UDAC位
-        # 0b01000000 表示 B7位为0，B6位为1，其余位在后续操作中设置
-        write_command_byte = 0b01000000  # 0 1 0 0 0 DAC1 DAC0 UDAC
-        # 根据通道索引设置DAC1和DAC0位
-        write_command_byte |= channel.channel_index << 1
-        # 初始化输出缓冲区，将写命令字节作为第一个元素
-        output_buffer = bytearray([write_command_byte])
-        # 将通道值字节序列添加到输出缓冲区
-        output_buffer.extend(channel_bytes)
+        buf = self._write_buf
+        value = channel._value
+        buf[0] = _MCP4728_MULTI_WRITE | channel.channel_index << 1 | udac
+        buf[1] = channel._vref << 7 | channel._pdm << 5 | (channel._gain - 1) << 4 | value >> 8
+        buf[2] = value & 0xFF
         # 通过I2C通信将输出缓冲区发送到DAC设备
-        self.i2c_device.writeto(self.address, output_buffer)
+        self.i2c_device.writeto(self.address, buf)
+        self.dirty &= ~(1 << channel.channel_index)
+
+    def flush(self, hold=False):
+        """
+        把暂存的通道值写入器件，一次 I2C 传输。
+
+        只有一个通道待写时用 Multi-Write 单通道命令（地址 + 3 字节）；多个通道时用 Fast Write
+        从通道 A 写到最后一个待写通道（地址 + 最多 8 字节），未改动的通道写入缓存中的原值。
+        Fast Write 不携带 vref/gain，沿用器件中的设置。
+
+        :param hold: 为 True 时输出等待 LDAC 下降沿再更新（由 MCP4728Group 控制 LDAC）；
+                     Fast Write 的输出更新只取决于 LDAC 电平，LDAC 为低时在传输过程中逐通道更新
+        :return: 写出的字节数（不含地址字节），没有待写通道时为 0
+        """
+        dirty = self.dirty
+        if not dirty:
+            return 0
+        channels = self.channels
+        if dirty & (dirty - 1) == 0:
+            for channel in channels:
+                if dirty == 1 << channel.channel_index:
+                    self._set_value(channel, 1 if hold else 0)
+                    return 3
+        last = 3 if dirty & 8 else 2 if dirty & 4 else 1
+        buf = self._fast_buf
+        for i in range(last + 1):
+            channel = channels[i]
+            value = channel._value
+            # Fast Write：0 0 PD1 PD0 D11-D8，D7-D0
+            buf[2 * i] = channel._pdm << 4 | value >> 8
+            buf[2 * i + 1] = value & 0xFF
+        self.i2c_device.writeto(self.address, self._fast_views[last])
+        self.dirty = 0
+        return 2 * last + 2
 
     @staticmethod
     def _generate_bytes_with_flags(channel):
@@ -253,6 +315,22 @@ class Channel:
         self._dac = dac_instance
         self.channel_index = index
 
+    def stage(self, value):
+        """
+        暂存新值，不访问总线，由 MCP4728.flush() 或 MCP4728Group.flush() 统一写入。
+
+        :param value: 0-4095
+        """
+        if value < 0 or value > 4095:
+            raise AttributeError("`value` must be a 12-bit integer between 0 and 4095")
+        self._value = value
+        self._dac.dirty |= 1 << self.channel_index
+
+    def __repr__(self):
+        # 只使用缓存值，调试打印不访问总线
+        return "Channel(%d, value=%d, vref=%d, gain=%d, pdm=%d)" % (
+            self.channel_index, self._value, self._vref, self._gain, self._pdm)
+
     @property
     def normalized_value(self):
         """The DAC value as a floating point number in the range 0.0 to 1.0."""
@@ -268,7 +346,8 @@ class Channel:
     @property
     def value(self):
       """The 12-bit current value for the channel."""
-      self._value=self._dac._read_registers()[self.channel_index][0] 
+      if not self._dac.cached:
+          self._value=self._dac._read_registers()[self.channel_index][0] 
       return self._value
 
     @value.setter
@@ -287,7 +366,8 @@ class Channel:
 
         With gain set to 1, the output voltage goes from 0v to 2.048V. If a channe's gain is set
         to 2, the voltage goes from 0v to 4.096V. `gain` Must be 1 or 2"""
-        self._gain=self._dac._read_registers()[self.channel_index][2] 
+        if not self._dac.cached:
+            self._gain=self._dac._read_registers()[self.channel_index][2] 
         return self._gain
 
     @gain.setter
@@ -300,7 +380,8 @@ class Channel:
     @property
     def vref(self):
         """Sets the DAC's voltage reference source. Must be 0 (VDD) or 1 (Internal 2.048V)"""
-        self._vref=self._dac._read_registers()[self.channel_index][1] 
+        if not self._dac.cached:
+            self._vref=self._dac._read_registers()[self.channel_index][1] 
         return self._vref
 
     @vref.setter
@@ -317,10 +398,11 @@ class Channel:
         - 0：正常操作模式，所有通道电路正常工作。
         - 非0：关闭大多数通道电路，并通过电阻将VOUT连接到GND，电阻值根据模式不同而不同（1：1 kΩ，2：100 kΩ，3：500 kΩ）。
         
-        该方法首先从DAC寄存器读取当前的PDM状态，然后将其存储在实例变量`_pdm`中，最后返回这个状态值。
+        非缓存模式下先从DAC寄存器读取当前的PDM状态，存储在实例变量`_pdm`中，然后返回这个状态值。
         """
         # 从DAC寄存器中读取当前PDM状态，并将其保存到实例变量`_pdm`中
-        self._pdm = self._dac._read_registers()[self.channel_index][3] 
+        if not self._dac.cached:
+            self._pdm = self._dac._read_registers()[self.channel_index][3] 
         # 返回PDM状态
         return self._pdm
 
@@ -338,3 +420,48 @@ class Channel:
         self.gain=gain
         self.value=value
         self.pdm=pdm
+
+
+class MCP4728Group:
+    """
+    多片 MCP4728 的批量更新：flush() 把每片暂存的通道各用一次传输写出。
+
+    给出 LDAC 引脚时，空闲时 LDAC 保持高电平，全部写完后依次拉低再拉高，
+    所有片子的输出在 LDAC 下降沿同时更新（各片之间只差翻转引脚的几微秒）；
+    直接给通道 value 赋值的单次写入不受影响，仍然立即更新。
+
+    :param dacs: MCP4728 列表
+    :param ldac: LDAC 引脚（machine.Pin，已设为输出）列表，None 表示不使用 LDAC，
+                 此时 LDAC 须为低电平，各片在各自的传输完成时更新
+    """
+
+    def __init__(self, dacs, ldac=None):
+        self.dacs = dacs
+        self.ldac = ldac
+        self.transactions = 0    # 累计的 I2C 写传输次数
+        self.bytes = 0           # 累计写出的字节数，含地址字节
+        if ldac:
+            for pin in ldac:
+                pin.value(1)
+
+    def flush(self):
+        """
+        写出所有暂存的通道值
+
+        :return: 本次的 I2C 传输次数
+        """
+        ldac = self.ldac
+        hold = bool(ldac)
+        n = 0
+        for dac in self.dacs:
+            size = dac.flush(hold)
+            if size:
+                n += 1
+                self.bytes += size + 1
+        if n and hold:
+            for pin in ldac:
+                pin.value(0)
+            for pin in ldac:
+                pin.value(1)
+        self.transactions += n
+        return n
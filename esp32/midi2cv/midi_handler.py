@@ -0,0 +1,270 @@
+# midi_handler.py
+# C3 与 S3 共用的 MIDI 到 CV 转换，DAC 通道用途、门控、触发和演奏设置都来自 board.py 中的板级配置
+import time
+import mcp4728
+from pitchtable import PitchTables
+from modulation import ModulationEngine
+from voiceallocator import VoiceAllocator, LAST_NOTE, NONE
+from machine import Pin
+from midiparser import NOTE_ON, NOTE_OFF, CONTROL_CHANGE, PITCH_BEND
+from board import SOLO, CHORD
+
+
+class MidiToVoltageConverter:
+    def __init__(self, i2c, board):
+        """
+        :param i2c: I2C 总线
+        :param board: board.Board，按其中的配置创建 DAC 通道、门控、触发和 LDAC 引脚
+        """
+        self.board = board
+        self.dacs = []
+        self.dac_by_address = {}
+        ldac = []
+        for address in board.dac_addresses:
+            try:
+                dac = mcp4728.MCP4728(i2c, address)
+                dac.a.vref = 1
+                dac.b.vref = 1
+                dac.c.vref = 1
+                dac.d.vref = 1
+                dac.a.gain = 2
+                dac.b.gain = 2
+                dac.c.gain = 2 
+                dac.d.gain = 2
+                self.dacs.append(dac)
+                self.dac_by_address[address] = dac
+                if board.use_ldac:
+                    # LDAC 空闲保持高电平，批量写入后一起拉低，音符的音高和力度同时更新
+                    ldac.append(Pin(board.ldac[address], Pin.OUT, value=1))
+                print(f"Initialized DAC at address 0x{address:X}")
+            except OSError as e:
+                print(f"Failed to initialize MCP4728 at address 0x{address:X}: {e}")
+        self.dac_group = mcp4728.MCP4728Group(self.dacs, ldac if board.use_ldac else None)
+        self.playmode = board.playmode
+        velocity = self.role_channels('velocity')
+        if self.playmode == CHORD:
+            self.midichannel = board.midi_channel
+            self.vel = velocity[0]
+        elif self.playmode == SOLO:
+            self.midichannel = board.solo_channels
+            # 每个声部一个力度输出
+            self.vel = velocity
+        # 没有对应用途的通道时为 None（如 C3 独奏模式第二片 DAC 全部用作力度输出）
+        self.pitchbend = self.role_channel('pitchbend')
+        self.cc = self.role_channel('cc')
+        self.trigger = self.role_channel('trigger')
+        self.trigger_pin = None if board.trigger is None else Pin(board.trigger, Pin.OUT, Pin.PULL_DOWN)
+        self.gates = [Pin(pin, Pin.OUT, Pin.PULL_DOWN) for pin in board.gates]
+        self.notes = self.role_channels('pitch')
+        # 声部数由板级配置给出，不超过实际初始化成功的音高通道数
+        self.voice_count = min(board.voices, len(self.notes), len(self.gates))
+        if self.playmode == CHORD:
+            self.voices = VoiceAllocator(self.voice_count, board.voice_policy)
+        elif self.playmode == SOLO:
+            # 每个声部一个 MIDI 通道，单音后按优先
+            self.voices = [VoiceAllocator(1, LAST_NOTE) for _ in range(self.voice_count)]
+        # 每个音高通道一张标定过的 1V/oct 音高表，note on 时直接查表
+        self.pitch_tables = PitchTables(len(self.notes))
+        self.pitch_tables.load()
+        self.pitch = self.pitch_tables.tables
+        # 滑音、弯音、颤音由定时器驱动的调制引擎按固定频率写出，start() 在 app.py 中调用
+        self.mod = ModulationEngine(self.notes, self.pitch, self.dac_group, board.mod_rate_hz,
+                                    board.bend_range, board.glide_ms)
+        # 上电到第一个音符输出的时间，ms，0 表示还没有音符
+        self.first_note_ms = 0
+
+    def role_channels(self, role):
+        """板级配置中某个用途的全部 DAC 通道，跳过初始化失败的 DAC"""
+        return [self.dac_by_address[address].channels[channel]
+                for address, channel in self.board.roles(role) if address in self.dac_by_address]
+
+    def role_channel(self, role):
+        channels = self.role_channels(role)
+        return channels[0] if channels else None
+
+    def note_started(self):
+        """记录并打印上电到第一个音符门控打开的时间"""
+        if not self.first_note_ms:
+            self.first_note_ms = time.ticks_ms()
+            print("first note %d ms after reset" % self.first_note_ms)
+
+    def midi_to_voltage(self, data):
+        """
+        将0-127之间的数值转换为适合12位DAC使用的值。
+        线性拉伸，用于力度和 CC；音高使用 self.pitch 中标定过的 1V/oct 表。
+
+        :param data: 一个0-127之间的数值
+        :return: 一个0-4095之间的12位数值，用于驱动DAC
+        """
+        dac_value = (data << 4) | (data >> 4)
+        
+        return dac_value
+
+    def voice_outputs(self, voice):
+        """和弦模式下声部对应的输出序号，齐奏时为全部输出"""
+        return range(self.voice_count) if self.voices.unison else (voice,)
+
+    def update_noteon(self, note, velocity):
+        """
+        处理MIDI音符触键事件，将MIDI信号转换为控制电压，并更新内部状态。
+
+        参数:
+        note -- 被触键的音符，表示为MIDI音符编号。
+        velocity -- 触键的力度，表示为MIDI力度值。
+
+        返回值:
+        无
+        """
+        # 分配声部，没有空闲声部时由分配器抢占最早的声部
+        voice = self.voices.note_on(note)
+        outputs = self.voice_outputs(voice)
+        # 触发信号，准备发送MIDI信息
+        if self.trigger_pin is not None:
+            self.trigger_pin.value(1)
+        # 暂存到写出期间调制引擎跳过定时器周期，见 modulation.py
+        self.mod.hold = True
+        try:
+            # 将MIDI音符转换为控制电压并暂存
+            for i in outputs:
+                self.mod.note_on(i, note)
+            # 将MIDI力度转换为控制电压并暂存
+            self.vel.stage(self.midi_to_voltage(velocity))
+            # 音高和力度一次写出（每片 DAC 一次传输），再打开门控
+            self.dac_group.flush()
+        finally:
+            self.mod.hold = False
+        for i in outputs:
+            self.gates[i].value(1)
+        # 结束触发信号
+        if self.trigger_pin is not None:
+            self.trigger_pin.value(0)
+        self.note_started()
+
+    def noteon_solo(self, channel:int, note:int, velocity:int):
+        """
+        处理MIDI音符触键事件，将MIDI信号转换为控制电压，并更新内部状态。
+
+        参数:
+        note -- 被触键的音符，表示为MIDI音符编号。
+        velocity -- 触键的力度，表示为MIDI力度值。
+
+        返回值:
+        无
+        """
+        for i in range(self.voice_count):
+            if self.midichannel[i] == channel:
+                self.voices[i].note_on(note)
+                self.mod.hold = True
+                try:
+                    # 将MIDI音符转换为控制电压并暂存
+                    self.mod.note_on(i, note)
+                    # 将MIDI力度转换为控制电压并暂存
+                    self.vel[i].stage(self.midi_to_voltage(velocity))
+                    # 音高和力度一次写出（每片 DAC 一次传输），再打开门控
+                    self.dac_group.flush()
+                finally:
+                    self.mod.hold = False
+                self.gates[i].value(1)
+                self.note_started()
+
+    def update_noteoff(self, note):
+        """
+        处理midi音符释放事件。
+
+        音符仍在发声时释放它的声部：有等待中的音符（被抢占过）时该声部改为演奏它，门控保持打开，
+        否则关闭门控并将力度清零。未在发声的音符（已被抢占或重复的 note off）忽略。
+
+        参数:
+        note -- 待处理的midi音符编号。
+        """
+        voice = self.voices.note_off(note)
+        if voice == NONE:
+            return
+        resumed = self.voices.note[voice]
+        outputs = self.voice_outputs(voice)
+        if resumed == NONE:
+            for i in outputs:
+                self.gates[i].value(0)
+            self.vel.value = 0
+        else:
+            self.mod.hold = True
+            try:
+                for i in outputs:
+                    self.mod.note_on(i, resumed)
+                self.dac_group.flush()
+            finally:
+                self.mod.hold = False
+
+    def noteoff_solo(self, channel:int, note:int):
+        for i in range(self.voice_count):
+            if self.midichannel[i] == channel:
+                voice = self.voices[i].note_off(note)
+                if voice == NONE:
+                    # 没有按下的音符，忽略
+                    continue
+                resumed = self.voices[i].note[voice]
+                if resumed == NONE:
+                    self.gates[i].value(0)
+                    self.vel[i].value = 0
+                else:
+                    # 回到仍按住的前一个音符
+                    self.mod.hold = True
+                    try:
+                        self.mod.note_on(i, resumed)
+                        self.dac_group.flush()
+                    finally:
+                        self.mod.hold = False
+
+    def update_cc(self,cc):
+        if self.cc is None:
+            return
+        self.cc.value = cc
+        
+    def update_pitchbend(self,pb):
+        # 弯音作用于各声部音高，弯音输出通道暂存后由调制引擎的下一个周期一起写出
+        self.mod.set_bend(pb)
+        if self.pitchbend is not None:
+            self.pitchbend.stage((pb >> 2) & 0xFFF)  # 14 位弯音值右移 2 位以匹配 12 位 DAC 的范围
+            if self.mod.timer is None:
+                self.dac_group.flush()
+
+    def attach(self, parser):
+        """
+        把处理函数按演奏模式注册到 midiparser.MidiParser，解析器直接以通道和数据字节调用，不构造消息对象
+
+        :param parser: midiparser.MidiParser
+        """
+        if self.playmode == CHORD:
+            parser.on(NOTE_ON, self.on_note_on_chord)
+            parser.on(NOTE_OFF, self.on_note_off_chord)
+        elif self.playmode == SOLO:
+            parser.on(NOTE_ON, self.on_note_on_solo)
+            parser.on(NOTE_OFF, self.on_note_off_solo)
+        parser.on(CONTROL_CHANGE, self.on_control_change)
+        parser.on(PITCH_BEND, self.on_pitch_bend)
+
+    def on_note_on_chord(self, channel, note, velocity):
+        if self.midichannel is None or channel == self.midichannel:
+            self.update_noteon(note, velocity)
+
+    def on_note_off_chord(self, channel, note, velocity):
+        if self.midichannel is None or channel == self.midichannel:
+            self.update_noteoff(note)
+
+    def on_note_on_solo(self, channel, note, velocity):
+        if channel in self.midichannel:
+            self.noteon_solo(channel, note, velocity)
+
+    def on_note_off_solo(self, channel, note, velocity):
+        if channel in self.midichannel:
+            self.noteoff_solo(channel, note)
+
+    def on_control_change(self, channel, controller, value):
+        if controller == 1:
+            # 调制轮控制颤音深度
+            self.mod.set_depth(value)
+        self.update_cc(self.midi_to_voltage(value))
+
+    def on_pitch_bend(self, channel, lsb, msb):
+        # 弯音值低 7 位在前
+        self.update_pitchbend(lsb | (msb << 7))
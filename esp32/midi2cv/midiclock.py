@@ -0,0 +1,238 @@
+import time
+from midiparser import CLOCK, START, CONTINUE, STOP
+
+# MIDI 时钟同步与分频时钟输出
+# 收到的 0xF8 时钟用 ticks_us 打时间戳，经锁相环（alpha-beta 滤波）得到平滑的时钟周期和相位：
+#   相位：实际到达时刻与预测时刻之差的 1/2^PHASE_SHIFT 修正到当前时钟的时刻
+#   周期：同一误差的 1/2^FREQ_SHIFT 累加到周期上，相当于对时钟间隔做滑动平均
+# 时间戳里有串口排队、音符处理等带来的抖动，锁相环把它们平均掉。
+# 输出不在收到时钟时直接翻转，而是由一个单次 machine.Timer 在预测的时刻产生，与音符处理无关：
+#   * 每个输出按分频（以 MIDI 时钟计，24 为四分音符）在第 1、1+分频、… 个时钟输出一个触发脉冲
+#   * START 时在复位输出上输出一个脉冲，计数从头开始；CONTINUE 接着计数；STOP 停止输出
+#   * 比预测早到的时钟推迟到平滑后的时刻输出，没有按时到达的时钟在预测时刻先输出，
+#     最多提前一个时钟，因此输出脉冲数与收到的时钟数一致
+#   * 同步（START、CONTINUE）后的第一拍按平均间隔测速，收到即输出，之后进入锁相
+#   * 误差超过半个周期（速度突变、丢了时钟）时重新同步
+# ESP32 上 Timer 回调经 micropython.schedule 在主线程中运行，输出的抖动上限约为主线程中最长的一段
+# 不可打断的 C 调用（一次 I2C 传输、一次调制引擎回调），stats() 中的 max_late 即实测值。
+# 本文件同时可以在 CPython 上运行，tools/clock_replay.py 用模拟的时间和定时器回放时钟并测量抖动。
+
+PPQN = 24                 # MIDI 时钟每四分音符的个数
+PULSE_US = 5000           # 触发脉冲宽度
+PHASE_SHIFT = 3           # 相位修正 1/8
+FREQ_SHIFT = 7            # 周期修正 1/128
+ACQUIRE_CLOCKS = PPQN    # 同步后先按平均间隔测一拍的速度，再进入锁相
+MIN_PERIOD_US = 2500      # 1000 BPM
+MAX_PERIOD_US = 250000    # 10 BPM
+EARLY_US = 100            # 定时器提前到达时仍视为到期的范围
+MIN_DELAY_US = 50         # 定时器最短间隔
+
+try:
+    ticks_us = time.ticks_us
+    ticks_add = time.ticks_add
+    ticks_diff = time.ticks_diff
+except AttributeError:
+    # CPython，回放时由 tools/clock_replay.py 替换为模拟时间
+    _TICKS_PERIOD = 1 << 30
+
+    def ticks_us():
+        return int(time.perf_counter() * 1000000) & (_TICKS_PERIOD - 1)
+
+    def ticks_add(ticks, delta):
+        return (ticks + delta) & (_TICKS_PERIOD - 1)
+
+    def ticks_diff(end, start):
+        diff = (end - start) & (_TICKS_PERIOD - 1)
+        return diff - _TICKS_PERIOD if diff >= _TICKS_PERIOD // 2 else diff
+
+
+class ClockEngine:
+    """
+    :param outputs: 时钟输出引脚列表（machine.Pin，已设为输出）
+    :param divisions: 与 outputs 对应的分频，以 MIDI 时钟计
+    :param reset: 复位输出引脚，None 为不输出
+    :param timer: 专用的 machine.Timer，以单次方式反复设置
+    :param pulse_us: 触发脉冲宽度
+    """
+
+    def __init__(self, outputs, divisions, reset, timer, pulse_us=PULSE_US):
+        if len(outputs) != len(divisions):
+            raise ValueError("one division per clock output")
+        self.outputs = outputs
+        self.divisions = divisions
+        self.reset = reset
+        self.timer = timer
+        self.pulse_us = pulse_us
+        self.timer_ref = self.on_timer      # 预先取出绑定方法，回调中不再分配
+        self.running = False
+        self.synced = False                 # 是否已经有了当前时钟的时刻
+        self.period = 0                     # 平滑后的时钟周期，1/16 us，0 表示还不知道
+        self.clock_time = 0                 # 平滑后的最近一个时钟的时刻，ticks_us
+        self.sync_time = 0                  # 同步后第一个时钟的到达时刻
+        self.count = 0                      # 同步以来的时钟间隔数，ACQUIRE_CLOCKS 后进入锁相
+        self.received = 0                   # 运行中收到的时钟数
+        self.emitted = 0                    # 运行中输出的时钟数，不超过 received + 1
+        self.high = False                   # 是否有输出处于高电平
+        self.pulse_off = 0
+        self.reset_stats()
+
+    def attach(self, parser):
+        """注册到 midiparser.MidiParser 的实时消息"""
+        parser.on_realtime(CLOCK, self.on_clock)
+        parser.on_realtime(START, self.on_start)
+        parser.on_realtime(CONTINUE, self.on_continue)
+        parser.on_realtime(STOP, self.on_stop)
+
+    def bpm(self):
+        """当前速度，不知道时为 0"""
+        return 60000000 * 16 / (self.period * PPQN) if self.period else 0
+
+    def on_start(self):
+        now = ticks_us()
+        self.running = True
+        self.synced = False
+        self.received = 0
+        self.emitted = 0
+        if self.reset is not None:
+            self.reset.value(1)
+            self.high = True
+            self.pulse_off = ticks_add(now, self.pulse_us)
+        self.arm(now)
+
+    def on_continue(self):
+        # 停止期间的相位已经不对，下一个时钟重新对齐
+        self.running = True
+        self.synced = False
+
+    def on_stop(self):
+        if self.emitted < self.received:
+            # 推迟输出的最后一个时钟不丢
+            self.emit(ticks_us())
+        self.running = False
+        self.arm(ticks_us())
+
+    def on_clock(self):
+        t = ticks_us()
+        self.clocks += 1
+        if not self.synced:
+            self.sync(t)
+        elif self.count < ACQUIRE_CLOCKS:
+            # 锁定前：周期取同步以来全部时钟间隔的平均值，时刻取实际到达时刻
+            self.count += 1
+            elapsed = ticks_diff(t, self.sync_time)
+            if MIN_PERIOD_US * self.count <= elapsed <= MAX_PERIOD_US * self.count:
+                self.period = (elapsed << 4) // self.count
+                self.clock_time = t
+            else:
+                self.sync(t)
+        else:
+            period_us = self.period >> 4
+            predicted = ticks_add(self.clock_time, period_us)
+            error = ticks_diff(t, predicted)
+            if error * 2 > period_us or error * 2 < -period_us:
+                # 偏离超过半个周期：速度突变或丢了时钟，从这个时钟重新同步
+                self.resyncs += 1
+                self.sync(t)
+            else:
+                self.clock_time = ticks_add(predicted, error >> PHASE_SHIFT)
+                period = self.period + ((error << 4) >> FREQ_SHIFT)
+                if period < MIN_PERIOD_US << 4:
+                    period = MIN_PERIOD_US << 4
+                elif period > MAX_PERIOD_US << 4:
+                    period = MAX_PERIOD_US << 4
+                self.period = period
+        if not self.running:
+            return
+        self.received += 1
+        if self.count < ACQUIRE_CLOCKS or self.emitted < self.received - 1 or ticks_diff(self.next_time(), t) <= 0:
+            # 锁定前、落后了一个以上，或者平滑后的时刻已过：收到即输出
+            self.emit(t)
+        self.arm(t)
+
+    def sync(self, t):
+        """从到达时刻为 t 的时钟开始重新锁定，周期保留到重新测出为止"""
+        self.synced = True
+        self.sync_time = t
+        self.clock_time = t
+        self.count = 0
+
+    def due(self):
+        """下一个要输出的时钟的时刻是否已经可以计算"""
+        return self.running and self.synced and self.count >= ACQUIRE_CLOCKS and self.emitted <= self.received
+
+    def next_time(self):
+        """
+        下一个要输出的时钟的时刻：已经收到的用平滑后的时刻（比预测早到的时钟推迟到这里），
+        还没有收到的用预测的时刻
+        """
+        if self.emitted < self.received:
+            return self.clock_time
+        return ticks_add(self.clock_time, self.period >> 4)
+
+    def emit(self, now):
+        """输出一个时钟：分频计数到的输出拉高"""
+        n = self.emitted
+        self.emitted = n + 1
+        outputs = self.outputs
+        divisions = self.divisions
+        high = False
+        for i in range(len(outputs)):
+            if n % divisions[i] == 0:
+                outputs[i].value(1)
+                high = True
+        if high:
+            # 脉冲不超过半个时钟周期，下一个时钟之前一定回到低电平
+            width = self.pulse_us
+            if self.period and width > self.period >> 5:
+                width = self.period >> 5
+            self.high = True
+            self.pulse_off = ticks_add(now, width)
+
+    def lower(self):
+        for pin in self.outputs:
+            pin.value(0)
+        if self.reset is not None:
+            self.reset.value(0)
+        self.high = False
+
+    def on_timer(self, _=None):
+        """定时器回调：结束脉冲，到了预测时刻时输出下一个时钟"""
+        now = ticks_us()
+        if self.high and ticks_diff(now, self.pulse_off) >= -EARLY_US:
+            self.lower()
+        if self.due():
+            late = ticks_diff(now, self.next_time())
+            if late >= -EARLY_US:
+                if late > self.max_late:
+                    self.max_late = late
+                self.emit(now)
+        self.arm(now)
+
+    def arm(self, now):
+        """按最近的事件（脉冲结束或下一个预测的时钟）设置单次定时器"""
+        delay = None
+        if self.high:
+            delay = ticks_diff(self.pulse_off, now)
+        if self.due():
+            tick = ticks_diff(self.next_time(), now)
+            if delay is None or tick < delay:
+                delay = tick
+        if delay is None:
+            return
+        if delay < MIN_DELAY_US:
+            delay = MIN_DELAY_US
+        self.timer.init(mode=self.timer.ONE_SHOT, period=delay, tick_hz=1000000, callback=self.timer_ref)
+
+    def stop(self):
+        self.running = False
+        self.timer.deinit()
+        self.lower()
+
+    def reset_stats(self):
+        self.clocks = 0
+        self.resyncs = 0
+        self.max_late = 0
+
+    def stats(self):
+        """(BPM, 收到的时钟数, 定时器输出最晚 us, 重新同步次数)"""
+        return (self.bpm(), self.clocks, self.max_late, self.resyncs)
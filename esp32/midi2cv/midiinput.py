@@ -0,0 +1,168 @@
+import asyncio
+import time
+
+try:
+    import micropython
+    from machine import UART
+    ticks_us = time.ticks_us
+    ticks_diff = time.ticks_diff
+except ImportError:
+    # CPython 上只用于测试环形缓冲区和分发（tests/test_midiinput.py），没有串口中断
+    micropython = None
+    UART = None
+    ticks_us = lambda: int(time.perf_counter() * 1000000)
+    ticks_diff = lambda a, b: a - b
+
+# MIDI 输入
+# 串口收到的字节先进入固定大小的环形缓冲区，再由分发函数交给 midiparser 解析：
+#   * 固件提供 UART.IRQ_RXIDLE 时，在串口中断回调里把字节搬进环形缓冲区，
+#     用 micropython.schedule 安排一次分发，主循环不再空转查询 uart.any()
+#   * 固件没有 UART.irq（ESP32 上的 MicroPython 1.23 即是如此）时，退化为一个 asyncio 任务，
+#     StreamReader 在串口有数据时才唤醒，读到的字节同样经过环形缓冲区分发
+# 串口驱动本身已经由中断把数据收进 rxbuf，两种方式下 rxbuf 都决定了分发被阻塞时能缓冲多久。
+# 统计量：
+#   dropped      环形缓冲区满时丢弃的字节数
+#   overruns     读取时发现串口驱动缓冲区已满的次数，此时驱动可能已经丢了数据
+#   max_backlog  环形缓冲区中待分发字节数的最大值
+#   max_latency  一批字节从读出串口到全部分发完成的最长时间，us，包含处理函数（I2C 写入）的耗时，
+#                即 note on 到门控输出的最坏延迟减去串口接收本身的时间
+
+RING_SIZE = 256       # 环形缓冲区大小，必须是 2 的幂，31250 波特下约 80ms 的数据
+RXBUF = 512           # 串口驱动接收缓冲区大小
+SCRATCH_SIZE = 32     # 单次从串口读取的字节数
+
+
+class MidiInput:
+    """
+    :param uart: 已初始化的 UART，建议 rxbuf=RXBUF
+    :param parser: midiparser.MidiParser，处理函数已注册
+    :param size: 环形缓冲区大小，2 的幂
+    :param rxbuf: 串口驱动接收缓冲区大小，用于判断驱动溢出
+    """
+
+    def __init__(self, uart, parser, size=RING_SIZE, rxbuf=RXBUF):
+        self.uart = uart
+        self.parser = parser
+        self.ring = bytearray(size)
+        self.mask = size - 1
+        self.head = 0            # 写入位置，只由读取方修改
+        self.tail = 0            # 读出位置，只由分发方修改
+        self.scratch = bytearray(SCRATCH_SIZE)
+        self.rxbuf = rxbuf
+        self.read_time = 0       # 最近一次读取串口的时刻，ticks_us
+        self.scheduled = False
+        self.dispatch_ref = self.dispatch   # 预先取出绑定方法，中断回调中不再分配
+        self.dropped = 0
+        self.overruns = 0
+        self.errors = 0
+        self.max_backlog = 0
+        self.max_latency = 0
+        self.irq = False
+
+    def start(self):
+        """
+        有 UART.IRQ_RXIDLE 时注册串口中断回调
+
+        :return: 是否使用了中断方式，False 时需要运行 task()
+        """
+        if hasattr(UART, 'IRQ_RXIDLE'):
+            self.uart.irq(self.on_rx, UART.IRQ_RXIDLE)
+            self.irq = True
+        return self.irq
+
+    def store(self, n):
+        """把 scratch 的前 n 个字节写入环形缓冲区，放不下的部分丢弃"""
+        ring = self.ring
+        scratch = self.scratch
+        mask = self.mask
+        head = self.head
+        free = mask - ((head - self.tail) & mask)
+        if n > free:
+            self.dropped += n - free
+            n = free
+        for i in range(n):
+            ring[head] = scratch[i]
+            head = (head + 1) & mask
+        self.head = head
+
+    def receive(self, n=0):
+        """
+        把串口中已到达的字节搬进环形缓冲区
+
+        :param n: scratch 中已经读出、尚未写入的字节数
+        :return: 本次从串口读出的字节数
+        """
+        uart = self.uart
+        scratch = self.scratch
+        total = n
+        if n:
+            self.store(n)
+        n = uart.any()
+        if total + n >= self.rxbuf:
+            self.overruns += 1
+        while n:
+            n = uart.readinto(scratch, n if n < SCRATCH_SIZE else SCRATCH_SIZE)
+            if not n:
+                break
+            self.store(n)
+            total += n
+            n = uart.any()
+        backlog = (self.head - self.tail) & self.mask
+        if backlog > self.max_backlog:
+            self.max_backlog = backlog
+        self.read_time = ticks_us()
+        return total
+
+    def on_rx(self, uart):
+        """串口中断回调：搬运字节并安排一次分发"""
+        if self.receive() and not self.scheduled:
+            try:
+                micropython.schedule(self.dispatch_ref, None)
+                self.scheduled = True
+            except RuntimeError:
+                # 调度队列满，下一次中断再安排
+                pass
+
+    def dispatch(self, _=None):
+        """把环形缓冲区中的字节全部交给解析器"""
+        self.scheduled = False
+        ring = self.ring
+        size = len(ring)
+        parser = self.parser
+        tail = self.tail
+        head = self.head
+        try:
+            while tail != head:
+                end = head if head > tail else size
+                parser.feed(ring, end - tail, tail)
+                tail = end & self.mask
+                self.tail = tail
+                head = self.head
+        except Exception as e:
+            # 处理函数出错时丢弃已到达的其余字节，解析器在下一个状态字节处重新同步
+            self.errors += 1
+            self.tail = self.head
+            parser.reset()
+            print(f"Error handling MIDI message: {e}")
+        latency = ticks_diff(ticks_us(), self.read_time)
+        if latency > self.max_latency:
+            self.max_latency = latency
+
+    async def task(self):
+        """没有串口中断时的接收任务：有数据才唤醒，读取后立即分发"""
+        reader = asyncio.StreamReader(self.uart)
+        while True:
+            n = await reader.readinto(self.scratch)
+            if n and self.receive(n):
+                self.dispatch()
+
+    def stats(self):
+        """(dropped, overruns, max_backlog, max_latency_us, errors, stray)"""
+        return (self.dropped, self.overruns, self.max_backlog, self.max_latency, self.errors, self.parser.stray)
+
+    def reset_stats(self):
+        self.dropped = 0
+        self.overruns = 0
+        self.max_backlog = 0
+        self.max_latency = 0
+        self.errors = 0
@@ -0,0 +1,167 @@
+# MIDI 字节流解析
+# 逐字节的状态机，直接在预分配的 bytearray 上工作（uart.readinto），解析过程中不分配内存：
+#   * 支持运行状态（running status）：省略状态字节的连续消息按上一个通道消息的状态解析
+#   * 1 字节（程序变换、通道压力）和 2 字节数据的通道消息长度按命令查表，不再假定每条 3 字节
+#   * 实时消息（0xF8-0xFF，时钟/开始/停止等）可以出现在任意两个字节之间，立即分发，不打断当前消息
+#   * SysEx（0xF0 ... 0xF7）整段跳过；系统公共消息清除运行状态
+#   * 没有状态的游离数据字节丢弃并计数，遇到下一个状态字节自动重新同步，不需要清空串口
+# 分发使用按命令预先建好的处理函数表，note on 力度为 0 按 note off 分发。
+# 本文件同时可以在 CPython 上运行，见 tools/midi_bench.py。
+
+NOTE_OFF = 0x80
+NOTE_ON = 0x90
+POLY_PRESSURE = 0xA0
+CONTROL_CHANGE = 0xB0
+PROGRAM_CHANGE = 0xC0
+CHANNEL_PRESSURE = 0xD0
+PITCH_BEND = 0xE0
+
+SYSEX = 0xF0
+SYSEX_END = 0xF7
+CLOCK = 0xF8
+START = 0xFA
+CONTINUE = 0xFB
+STOP = 0xFC
+ACTIVE_SENSING = 0xFE
+RESET = 0xFF
+
+# 通道消息的数据字节数，按 (状态 >> 4) & 7 索引：0x8-0xE 对应 0-6
+_DATA_LENGTH = b'\x02\x02\x02\x02\x01\x01\x02'
+# 系统公共消息 0xF0-0xF7 的数据字节数，0xF0（SysEx）单独处理
+_COMMON_LENGTH = b'\x00\x01\x02\x01\x00\x00\x00\x00'
+
+READ_SIZE = 64   # 单次从串口读取的最大字节数，31250 波特下约 20ms 的数据
+
+
+class MidiParser:
+    """
+    MIDI 字节流解析器
+
+    通道消息处理函数以 handler(channel, data1, data2) 调用，1 字节数据的消息 data2 为 0；
+    系统公共消息（0xF1-0xF6）以 handler(status, data1, data2) 调用；
+    实时消息处理函数以 handler() 调用，要求尽快返回。
+
+    :param size: 读取缓冲区大小
+    """
+
+    def __init__(self, size=READ_SIZE):
+        self.buf = bytearray(size)
+        self.handlers = [None] * 8     # 0-6 为通道消息，7 为系统公共消息
+        self.realtime = [None] * 8     # 0xF8-0xFF
+        self.status = 0                # 当前（运行）状态，0 表示尚未同步
+        self.need = 0                  # 当前状态的数据字节数
+        self.index = 0                 # 已收到的数据字节数
+        self.data1 = 0
+        self.messages = 0              # 已分发的消息数，不含实时消息
+        self.stray = 0                 # 丢弃的游离数据字节数
+
+    def on(self, command, handler):
+        """
+        注册通道消息处理函数
+
+        :param command: 命令，NOTE_ON、CONTROL_CHANGE 等（高 4 位），或 SYSEX 表示全部系统公共消息
+        :param handler: handler(channel, data1, data2)，None 表示忽略该命令
+        """
+        self.handlers[(command >> 4) & 7] = handler
+
+    def on_realtime(self, status, handler):
+        """
+        注册实时消息处理函数
+
+        :param status: CLOCK、START、STOP 等
+        :param handler: handler()，None 表示忽略
+        """
+        self.realtime[status - CLOCK] = handler
+
+    def reset(self):
+        """丢弃未完成的消息和运行状态"""
+        self.status = 0
+        self.index = 0
+
+    def poll(self, uart):
+        """
+        读取串口中已到达的字节并解析，没有数据时立即返回
+
+        :return: 读取的字节数
+        """
+        n = uart.any()
+        if not n:
+            return 0
+        buf = self.buf
+        n = uart.readinto(buf, n if n < len(buf) else len(buf))
+        if not n:
+            return 0
+        self.feed(buf, n)
+        return n
+
+    def feed(self, data, n=-1, start=0):
+        """
+        解析 data 从 start 开始的 n 个字节，n 为 -1 时解析到末尾；不完整的消息保留到下次调用
+
+        :param data: bytes、bytearray 或 memoryview
+        """
+        if n < 0:
+            n = len(data) - start
+        handlers = self.handlers
+        realtime = self.realtime
+        status = self.status
+        need = self.need
+        index = self.index
+        data1 = self.data1
+        for i in range(start, start + n):
+            byte = data[i]
+            if byte < 0x80:
+                # 数据字节
+                if status == 0:
+                    self.stray += 1
+                elif status == SYSEX:
+                    pass
+                elif index < need - 1:
+                    data1 = byte
+                    index += 1
+                else:
+                    if need == 1:
+                        data1 = byte
+                        byte = 0
+                    index = 0
+                    self.messages += 1
+                    if status < SYSEX:
+                        command = status & 0xF0
+                        if command == NOTE_ON and byte == 0:
+                            handler = handlers[0]
+                        else:
+                            handler = handlers[(status >> 4) & 7]
+                        if handler is not None:
+                            handler(status & 0x0F, data1, byte)
+                    else:
+                        # 系统公共消息没有运行状态
+                        handler = handlers[7]
+                        if handler is not None:
+                            handler(status, data1, byte)
+                        status = 0
+            elif byte >= CLOCK:
+                handler = realtime[byte - CLOCK]
+                if handler is not None:
+                    handler()
+            elif byte < SYSEX:
+                status = byte
+                need = _DATA_LENGTH[(byte >> 4) & 7]
+                index = 0
+            elif byte == SYSEX_END:
+                status = 0
+            else:
+                index = 0
+                need = _COMMON_LENGTH[byte & 7]
+                if byte == SYSEX or need:
+                    status = byte
+                else:
+                    # 没有数据字节的系统公共消息（调音请求）
+                    status = 0
+                    self.messages += 1
+                    handler = handlers[7]
+                    if handler is not None:
+                        handler(byte, 0, 0)
+        self.status = status
+        self.need = need
+        self.index = index
+        self.data1 = data1
@@ -0,0 +1,195 @@
+import time
+from array import array
+from machine import Timer
+
+# 音高调制引擎
+# 固定频率的 machine.Timer 回调里，对每个声部在整数定点下计算 滑音 + 弯音 + 颤音，
+# 查标定过的音高表并在相邻音符之间插值，只暂存有变化的通道，最后每片 DAC 一次传输写出。
+# 音高单位为 1/256 半音（Q8），全部运算为小整数，回调中不分配内存。
+#   * 滑音（portamento）：新音符在 glide_ms 内从该声部当前音高线性滑到目标音高，0 为不滑
+#   * 弯音：弯音轮 ±8192 映射到 ±bend_range 半音，作用于所有声部
+#   * 颤音：三角波 LFO，深度由调制轮（CC1）控制，最大 VIBRATO_MAX_DEPTH
+# note on 时 note_on() 立即暂存新音高，由调用方与力度一起写出后再开门控，不必等下一个周期。
+# 统计 stats()：实际更新频率、每秒传输次数与字节数、I2C 总线占用率（按 9 位/字节估算），
+# 以及单次回调的最长耗时。ESP32 上 Timer 回调经 micropython.schedule 在主线程中运行：
+# MIDI 分发同样经 schedule 运行（串口中断方式）时两者不会交错；退化为 asyncio 任务时
+# 回调可能插在处理函数的 stage() 与 flush() 之间，因此处理函数在暂存到写出期间置 hold，
+# 这时回调跳过本周期（下一个周期照常推进滑音与 LFO），不会提前写出一半暂存的值。
+
+MOD_RATE_HZ = 500              # 默认更新频率
+BEND_RANGE = 2                 # 默认弯音范围，半音
+VIBRATO_RATE_HZ = 5            # 默认颤音频率
+VIBRATO_MAX_DEPTH = 128        # 调制轮最大时的颤音深度，Q8 半音（半个半音）
+I2C_FREQ = 400000
+
+
+class ModulationEngine:
+    """
+    :param channels: 各声部的音高 DAC 通道（mcp4728.Channel）
+    :param tables: 各声部的音高表（pitchtable.PitchTables.tables）
+    :param group: mcp4728.MCP4728Group，用于写出
+    :param rate_hz: 更新频率
+    :param bend_range: 弯音范围，半音，0 表示弯音不作用于声部音高
+    :param glide_ms: 滑音时间，ms
+    :param i2c_freq: I2C 时钟频率，只用于估算总线占用率
+    """
+
+    def __init__(self, channels, tables, group, rate_hz=MOD_RATE_HZ, bend_range=BEND_RANGE,
+                 glide_ms=0, i2c_freq=I2C_FREQ):
+        n = len(channels)
+        self.channels = channels
+        self.tables = tables
+        self.group = group
+        self.voices = n
+        self.target = array('i', [0] * n)     # 目标音高，Q8 半音
+        self.current = array('i', [0] * n)    # 当前音高（滑音中），Q8 半音
+        self.step = array('i', [0] * n)       # 每个周期的滑音步长
+        self.codes = array('H', [0] * n)      # 最近一次暂存的 DAC 码
+        self.active = array('B', [0] * n)     # 声部是否已经有过音符
+        self.bend = 0                          # 弯音偏移，Q8 半音
+        self.bend_range = bend_range
+        self.depth = 0                         # 颤音深度，Q8 半音
+        self.phase = 0                         # 颤音 LFO 相位，16 位
+        self.phase_step = 0
+        self.glide_ms = glide_ms
+        self.glide_ticks = 0
+        self.rate_hz = 0
+        self.i2c_freq = i2c_freq
+        self.timer = None
+        self.timer_id = 0
+        self.hold = False                      # 为 True 时回调跳过本周期，见文件开头
+        self.tick_ref = self.tick              # 预先取出绑定方法，回调中不再分配
+        self.vibrato_hz = VIBRATO_RATE_HZ
+        self.set_rate(rate_hz)
+        self.reset_stats()
+
+    def set_rate(self, rate_hz):
+        """修改更新频率，定时器运行中时立即生效"""
+        self.rate_hz = rate_hz
+        self.glide_ticks = self.glide_ms * rate_hz // 1000
+        self.set_vibrato_rate(self.vibrato_hz)
+        if self.timer is not None:
+            self.start(self.timer_id)
+
+    def set_glide(self, glide_ms):
+        self.glide_ms = glide_ms
+        self.glide_ticks = glide_ms * self.rate_hz // 1000
+
+    def set_vibrato_rate(self, hz):
+        self.vibrato_hz = hz
+        self.phase_step = int(hz * 65536 / self.rate_hz) if self.rate_hz else 0
+
+    def set_depth(self, value):
+        """调制轮（0-127）设置颤音深度"""
+        self.depth = value * VIBRATO_MAX_DEPTH // 127
+
+    def set_bend(self, value):
+        """弯音轮 14 位值（0-16383，中点 8192）"""
+        self.bend = (value - 8192) * self.bend_range * 256 // 8192
+
+    def start(self, timer_id=0):
+        self.stop()
+        self.timer_id = timer_id
+        if self.rate_hz:
+            self.timer = Timer(timer_id)
+            self.timer.init(freq=self.rate_hz, mode=Timer.PERIODIC, callback=self.tick_ref)
+
+    def stop(self):
+        if self.timer is not None:
+            self.timer.deinit()
+            self.timer = None
+
+    def pitch_code(self, voice, pitch):
+        """Q8 半音音高在该声部音高表中的插值结果"""
+        if pitch <= 0:
+            return self.tables[voice][0]
+        note = pitch >> 8
+        if note >= 127:
+            return self.tables[voice][127]
+        table = self.tables[voice]
+        low = table[note]
+        return low + (((table[note + 1] - low) * (pitch & 0xFF)) >> 8)
+
+    def note_on(self, voice, note):
+        """
+        设置声部的新音符并立即暂存音高，由调用方 flush 后再开门控
+
+        :return: 暂存的 DAC 码
+        """
+        target = note << 8
+        self.target[voice] = target
+        ticks = self.glide_ticks
+        if ticks and self.active[voice]:
+            step = (target - self.current[voice]) // ticks
+            if step == 0:
+                step = 1 if target > self.current[voice] else -1
+            self.step[voice] = step
+        else:
+            self.current[voice] = target
+            self.step[voice] = 0
+        self.active[voice] = 1
+        return self.update(voice, self.bend + self.lfo())
+
+    def lfo(self):
+        """当前的颤音偏移，Q8 半音"""
+        if not self.depth:
+            return 0
+        phase = self.phase
+        tri = phase if phase < 32768 else 65535 - phase
+        return ((tri - 16384) * self.depth) >> 14
+
+    def update(self, voice, offset):
+        """按当前音高加偏移计算 DAC 码，有变化时暂存"""
+        code = self.pitch_code(voice, self.current[voice] + offset)
+        if code != self.codes[voice]:
+            self.codes[voice] = code
+            self.channels[voice].stage(code)
+        return code
+
+    def tick(self, _=None):
+        """定时器回调：推进滑音与 LFO，暂存有变化的声部，一次写出"""
+        if self.hold:
+            return
+        start = time.ticks_us()
+        self.phase = (self.phase + self.phase_step) & 0xFFFF
+        offset = self.bend + self.lfo()
+        current = self.current
+        target = self.target
+        step = self.step
+        active = self.active
+        for voice in range(self.voices):
+            if not active[voice]:
+                continue
+            s = step[voice]
+            if s:
+                pitch = current[voice] + s
+                if (s > 0 and pitch >= target[voice]) or (s < 0 and pitch <= target[voice]):
+                    pitch = target[voice]
+                    step[voice] = 0
+                current[voice] = pitch
+            self.update(voice, offset)
+        self.group.flush()
+        self.ticks += 1
+        elapsed = time.ticks_diff(time.ticks_us(), start)
+        if elapsed > self.max_tick_us:
+            self.max_tick_us = elapsed
+
+    def reset_stats(self):
+        self.ticks = 0
+        self.max_tick_us = 0
+        self.stats_time = time.ticks_ms()
+        self.stats_transactions = self.group.transactions
+        self.stats_bytes = self.group.bytes
+
+    def stats(self):
+        """
+        自上次 reset_stats() 以来的统计
+
+        :return: (实际更新频率 Hz, 每秒 I2C 传输次数, 每秒字节数, 总线占用率 %, 单次回调最长耗时 us)
+        """
+        seconds = time.ticks_diff(time.ticks_ms(), self.stats_time) / 1000 or 1e-3
+        transactions = (self.group.transactions - self.stats_transactions) / seconds
+        size = (self.group.bytes - self.stats_bytes) / seconds
+        # 每字节 8 位数据 + 1 位应答，每次传输另有起始和停止条件
+        busy = (size * 9 + transactions * 2) / self.i2c_freq * 100
+        return (self.ticks / seconds, transactions, size, busy, self.max_tick_us)
@@ -1,25 +0,0 @@
-NOTE_ON = 0x90
-NOTE_OFF = 0x80
-CONTROL_CHANGE = 0xB0
-PITCH_BEND = 0xE0
-
-SOLO = 0
-CHORD = 1 
-
-PLAYMODE = SOLO
-MIDI_CHANNEL = 1
-SOLO_MIDICHANNEL = [9,10,11,12]
-
-SCL = 9
-SDA = 8
-
-TX_PIN = 20  # TX (通常用于发送)
-RX_PIN = 21  # RX (通常用于接收)
-
-GATE1 = 3
-GATE2 = 2
-GATE3 = 1
-GATE4 = 0
-#GATE5 = 
-#GATE6 = 
-
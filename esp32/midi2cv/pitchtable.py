@@ -0,0 +1,153 @@
+import os
+import struct
+from array import array
+from binascii import crc32
+
+# 1V/oct 音高表
+# 每个音高 CV 通道一张 128 项的 array('H')，下标为 MIDI 音符号，值为 DAC 码，note on 时直接查表。
+# 表由每个通道的两点标定算出：输出两个 DAC 码，用电压表量出实际电压（mV），
+# 按直线 电压 = 偏移 + 斜率 × 码 反解出每个音符的目标电压对应的码，同时修正 DAC 通道的增益和偏移误差，
+# 也包括 DAC 之后放大电路的误差。目标电压为 (音符 - BASE_NOTE) × 1000 / 12 mV。
+# 标定点保存在 Flash 的 PITCH_FILE 中，文件格式：魔数 + 版本 + 通道数 + 基准音符 + 每通道两点 + CRC32，
+# 读取失败时使用理想值（vref 2.048V、增益 2，1 mV/码）。写入先写临时文件再改名。
+# 本文件同时可以在 CPython 上运行，tools/pitch_tables.py 用它生成和检查标定文件。
+
+PITCH_FILE = '/pitch.bin'
+MAGIC = b'M2CV'
+VERSION = 1
+
+BASE_NOTE = 36          # 输出 0V 的音符，C2
+DAC_MAX = 4095
+IDEAL_POINTS = (0, 0.0, DAC_MAX, 4095.0)   # (码 1, mV 1, 码 2, mV 2)，理想的 1 mV/码
+
+HEADER_FORMAT = '<4sHBB'
+POINT_FORMAT = '<HfHf'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+POINT_SIZE = struct.calcsize(POINT_FORMAT)
+
+
+def note_millivolts(note, base_note=BASE_NOTE):
+    """音符的目标电压，mV"""
+    return (note - base_note) * 1000 / 12
+
+
+def build_table(points, base_note=BASE_NOTE, table=None):
+    """
+    由两点标定算出 128 项音高表，超出 DAC 范围的音符取端点值
+
+    :param points: (码 1, mV 1, 码 2, mV 2)
+    :param table: 已有的 array('H')，给出时原地填写
+    :return: array('H')
+    """
+    code1, mv1, code2, mv2 = points
+    if mv2 == mv1 or code2 == code1:
+        raise ValueError("calibration points must differ")
+    codes_per_mv = (code2 - code1) / (mv2 - mv1)
+    if table is None:
+        table = array('H', range(128))
+    for note in range(128):
+        code = int((note_millivolts(note, base_note) - mv1) * codes_per_mv + code1 + 0.5)
+        table[note] = 0 if code < 0 else DAC_MAX if code > DAC_MAX else code
+    return table
+
+
+class PitchTables:
+    """
+    各音高通道的标定点和音高表
+
+    :param channels: 音高 CV 通道数（复音数）
+    :param base_note: 输出 0V 的音符
+    """
+
+    def __init__(self, channels, base_note=BASE_NOTE):
+        self.base_note = base_note
+        self.points = [IDEAL_POINTS] * channels
+        self.tables = [build_table(IDEAL_POINTS, base_note) for _ in range(channels)]
+
+    def set_points(self, channel, code1, mv1, code2, mv2):
+        """修改一个通道的标定点并重新计算它的音高表"""
+        points = (int(code1), float(mv1), int(code2), float(mv2))
+        build_table(points, self.base_note, self.tables[channel])
+        self.points[channel] = points
+
+    def rebuild(self):
+        for channel, points in enumerate(self.points):
+            build_table(points, self.base_note, self.tables[channel])
+
+    def pack(self):
+        channels = len(self.points)
+        size = HEADER_SIZE + POINT_SIZE * channels
+        data = bytearray(size + 4)
+        struct.pack_into(HEADER_FORMAT, data, 0, MAGIC, VERSION, channels, self.base_note)
+        for i, points in enumerate(self.points):
+            struct.pack_into(POINT_FORMAT, data, HEADER_SIZE + POINT_SIZE * i, *points)
+        struct.pack_into('<I', data, size, crc32(data[:size]) & 0xFFFFFFFF)
+        return data
+
+    def unpack(self, data):
+        """从字节串恢复，格式不对或通道数不符时抛出 ValueError，原有的值不变"""
+        if len(data) < HEADER_SIZE + 4:
+            raise ValueError("bad pitch table size")
+        magic, version, channels, base_note = struct.unpack_from(HEADER_FORMAT, data, 0)
+        size = HEADER_SIZE + POINT_SIZE * channels
+        if magic != MAGIC or version != VERSION or len(data) != size + 4:
+            raise ValueError("bad pitch table version")
+        if struct.unpack_from('<I', data, size)[0] != crc32(data[:size]) & 0xFFFFFFFF:
+            raise ValueError("bad pitch table crc")
+        if channels != len(self.points):
+            raise ValueError("pitch table has %d channels, expected %d" % (channels, len(self.points)))
+        points = [struct.unpack_from(POINT_FORMAT, data, HEADER_SIZE + POINT_SIZE * i) for i in range(channels)]
+        for code1, mv1, code2, mv2 in points:
+            if mv2 == mv1 or code2 == code1:
+                raise ValueError("bad pitch calibration points")
+        self.points = points
+        self.base_note = base_note
+        self.rebuild()
+
+    def load(self, path=PITCH_FILE):
+        """
+        读取标定文件
+
+        :return: 是否读取成功，失败时保持理想值
+        """
+        # save 在删除旧文件与改名之间掉电时只剩临时文件
+        for name in (path, path + '.tmp'):
+            try:
+                with open(name, 'rb') as f:
+                    self.unpack(f.read())
+                return True
+            except (OSError, ValueError):
+                pass
+        return False
+
+    def save(self, path=PITCH_FILE):
+        temp = path + '.tmp'
+        with open(temp, 'wb') as f:
+            f.write(self.pack())
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        os.rename(temp, path)
+
+
+def calibrate(tables, channel, dac_channel, code1=500, code2=3500, read_mv=None):
+    """
+    标定一个音高通道：依次输出 code1、code2，读入实测电压后更新该通道的音高表
+
+    在 REPL 中调用，例如 calibrate(app.midi2cv.pitch_tables, 0, app.midi2cv.notes[0])，
+    全部通道标定完后调用 tables.save() 写入 Flash。
+
+    :param tables: PitchTables
+    :param channel: 通道序号
+    :param dac_channel: mcp4728.Channel
+    :param read_mv: 读取实测电压（mV）的函数，参数为提示文字，默认从控制台输入
+    """
+    if read_mv is None:
+        read_mv = lambda prompt: float(input(prompt))
+    dac_channel.value = code1
+    mv1 = read_mv("channel %d, code %d, measured mV: " % (channel, code1))
+    dac_channel.value = code2
+    mv2 = read_mv("channel %d, code %d, measured mV: " % (channel, code2))
+    tables.set_points(channel, code1, mv1, code2, mv2)
+    return tables.points[channel]
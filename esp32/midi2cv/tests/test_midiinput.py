@@ -0,0 +1,107 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from midiinput import MidiInput, SCRATCH_SIZE
+from midiparser import MidiParser, NOTE_ON
+
+
+class FakeUart:
+    """只提供 MidiInput 用到的 any() 与 readinto()，数据由测试写入"""
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def write(self, data):
+        self.data.extend(data)
+
+    def any(self):
+        return len(self.data)
+
+    def readinto(self, buf, n):
+        n = min(n, len(self.data), len(buf))
+        buf[:n] = self.data[:n]
+        del self.data[:n]
+        return n
+
+
+def make_input(size=16, rxbuf=64, handler=None):
+    notes = []
+    parser = MidiParser()
+    parser.on(NOTE_ON, handler or (lambda channel, note, velocity: notes.append(note)))
+    uart = FakeUart()
+    return MidiInput(uart, parser, size, rxbuf), uart, notes
+
+
+def note_on(note):
+    return bytes([0x90, note, 100])
+
+
+def test_ring_wraps():
+    midi, uart, notes = make_input()
+    for note in range(40):
+        # 每次 4 字节（note on 加一个时钟），写入位置多次越过环形缓冲区末尾
+        uart.write(note_on(note) + b'\xf8')
+        assert midi.receive() == 4
+        midi.dispatch()
+    assert notes == list(range(40))
+    assert midi.head == midi.tail
+    assert midi.dropped == 0 and midi.overruns == 0 and midi.max_backlog == 4
+
+
+def test_ring_full_drops_newest():
+    midi, uart, notes = make_input(size=16)
+    for note in range(7):
+        uart.write(note_on(note))
+    # 容量为 size - 1，放不下的字节丢弃并计数
+    assert midi.receive() == 21
+    assert midi.dropped == 6
+    assert midi.max_backlog == 15
+    midi.dispatch()
+    assert notes == [0, 1, 2, 3, 4]
+
+
+def test_driver_overrun_counted():
+    midi, uart, notes = make_input(rxbuf=2 * SCRATCH_SIZE)
+    uart.write(note_on(1) * 30)
+    midi.receive()
+    # 串口驱动缓冲区已满，驱动可能已经丢了数据
+    assert midi.overruns == 1
+    uart.write(note_on(2))
+    midi.receive()
+    assert midi.overruns == 1
+
+
+def test_receive_scratch_bytes_first():
+    midi, uart, notes = make_input()
+    # asyncio 任务已经读进 scratch 的字节先于串口中剩余的字节写入
+    midi.scratch[:3] = note_on(60)
+    uart.write(note_on(61))
+    assert midi.receive(3) == 6
+    midi.dispatch()
+    assert notes == [60, 61]
+
+
+def test_handler_error_resyncs():
+    calls = []
+
+    def handler(channel, note, velocity):
+        calls.append(note)
+        if note == 13:
+            raise ValueError("bad note")
+
+    midi, uart, _ = make_input(handler=handler)
+    uart.write(note_on(13) + bytes([14, 100]))
+    midi.receive()
+    midi.dispatch()
+    # 出错后丢弃已到达的其余字节并复位解析器，运行状态不再延续
+    assert calls == [13] and midi.errors == 1
+    assert midi.head == midi.tail
+    uart.write(bytes([15, 100]) + note_on(16))
+    midi.receive()
+    midi.dispatch()
+    assert calls == [13, 16]
+    assert midi.stats()[5] == 2
+    midi.reset_stats()
+    assert midi.stats() == (0, 0, 0, 0, 0, 2)
@@ -0,0 +1,104 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from midiparser import (MidiParser, NOTE_ON, NOTE_OFF, CONTROL_CHANGE, PROGRAM_CHANGE, CHANNEL_PRESSURE, PITCH_BEND,
+                        SYSEX, CLOCK, START, STOP)
+
+
+class Recorder:
+    """把分发结果记成 (命令, 通道, data1, data2)，实时消息记成状态字节"""
+
+    def __init__(self, parser=None):
+        self.parser = parser or MidiParser()
+        self.out = []
+        for command in (NOTE_OFF, NOTE_ON, CONTROL_CHANGE, PROGRAM_CHANGE, CHANNEL_PRESSURE, PITCH_BEND, SYSEX):
+            self.parser.on(command, self.handler(command))
+        for status in (CLOCK, START, STOP):
+            self.parser.on_realtime(status, self.realtime(status))
+
+    def handler(self, command):
+        def handle(channel, data1, data2):
+            self.out.append((command, channel, data1, data2))
+        return handle
+
+    def realtime(self, status):
+        def handle():
+            self.out.append(status)
+        return handle
+
+    def feed(self, data):
+        self.parser.feed(data)
+        return self.out
+
+
+def test_running_status():
+    out = Recorder().feed(bytes([0x91, 60, 100, 64, 90, 67, 0, 0xB1, 1, 10, 7, 20]))
+    assert out == [(NOTE_ON, 1, 60, 100), (NOTE_ON, 1, 64, 90),
+                   # 力度为 0 的 note on 按 note off 分发
+                   (NOTE_OFF, 1, 67, 0),
+                   (CONTROL_CHANGE, 1, 1, 10), (CONTROL_CHANGE, 1, 7, 20)]
+
+
+def test_one_data_byte_messages():
+    out = Recorder().feed(bytes([0xC2, 5, 6, 0xD3, 80, 0xE0, 0, 64]))
+    assert out == [(PROGRAM_CHANGE, 2, 5, 0), (PROGRAM_CHANGE, 2, 6, 0), (CHANNEL_PRESSURE, 3, 80, 0),
+                   (PITCH_BEND, 0, 0, 64)]
+
+
+def test_sysex_skipped():
+    recorder = Recorder()
+    out = recorder.feed(bytes([0x90, 60, 100, 0xF0, 0x7E, 0x7F, 0x06, 0x01, 0xF7, 62, 100, 0x90, 64, 100]))
+    # SysEx 之后运行状态已清除，游离的数据字节丢弃，下一个状态字节重新同步
+    assert out == [(NOTE_ON, 0, 60, 100), (NOTE_ON, 0, 64, 100)]
+    assert recorder.parser.stray == 2
+    assert recorder.parser.messages == 2
+
+
+def test_realtime_inside_message():
+    out = Recorder().feed(bytes([0x90, CLOCK, 60, START, 100, 62, CLOCK, 101, STOP]))
+    # 实时消息立即分发，不打断当前消息和运行状态
+    assert out == [CLOCK, START, (NOTE_ON, 0, 60, 100), CLOCK, (NOTE_ON, 0, 62, 101), STOP]
+
+
+def test_realtime_inside_sysex():
+    out = Recorder().feed(bytes([0xF0, 0x01, CLOCK, 0x02, 0xF7, 0x90, 60, 100]))
+    assert out == [CLOCK, (NOTE_ON, 0, 60, 100)]
+
+
+def test_system_common_clears_running_status():
+    recorder = Recorder()
+    # 歌曲位置（0xF2，2 字节）与调音请求（0xF6，无数据）
+    out = recorder.feed(bytes([0x90, 60, 100, 0xF2, 0x10, 0x20, 62, 100, 0xF6]))
+    assert out == [(NOTE_ON, 0, 60, 100), (SYSEX, 0xF2, 0x10, 0x20), (SYSEX, 0xF6, 0, 0)]
+    assert recorder.parser.stray == 2
+
+
+def test_split_across_feeds():
+    stream = bytes([0x90, 60, 100, 62, 101, 0xE1, 0x11, 0x22, 0xF0, 1, 2, 0xF7, 0x80, 60, 0])
+    whole = Recorder().feed(stream)
+    recorder = Recorder()
+    for i in range(len(stream)):
+        recorder.feed(stream[i:i + 1])
+    assert recorder.out == whole
+    assert len(whole) == 4
+
+
+def test_feed_range_and_reset():
+    recorder = Recorder()
+    ring = bytearray([0, 0, 0x90, 60, 100, 0, 0])
+    recorder.parser.feed(ring, 3, 2)
+    assert recorder.out == [(NOTE_ON, 0, 60, 100)]
+    recorder.parser.feed(bytes([0x90, 61]))
+    recorder.parser.reset()
+    # 复位后丢弃未完成的消息和运行状态
+    recorder.feed(bytes([100, 62, 100]))
+    assert recorder.out == [(NOTE_ON, 0, 60, 100)]
+    assert recorder.parser.stray == 3
+
+
+def test_unregistered_handlers_ignored():
+    parser = MidiParser()
+    parser.feed(bytes([0x90, 60, 100, CLOCK, 0xB0, 1, 2]))
+    assert parser.messages == 2 and parser.stray == 0
@@ -0,0 +1,68 @@
+import os
+import sys
+
+import pytest
+
+_here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(_here, '..'))
+sys.path.insert(0, os.path.join(_here, '..', 'tools'))
+
+from pitchtable import PitchTables, build_table, note_millivolts, BASE_NOTE, DAC_MAX, IDEAL_POINTS
+from pitch_tables import table_error
+
+# 有增益和偏移误差的通道
+POINTS = (500, 512.0, 3500, 3470.0)
+
+
+def test_ideal_table():
+    # 理想 DAC：每个音符为 (n - 36) × 1000 / 12 四舍五入，范围外取端点
+    table = build_table(IDEAL_POINTS)
+    for note in range(128):
+        assert table[note] == min(max(int(note_millivolts(note) + 0.5), 0), DAC_MAX), note
+    assert table[BASE_NOTE] == 0
+    assert table[BASE_NOTE + 12] == 1000
+    assert table[BASE_NOTE + 48] == 4000
+
+
+@pytest.mark.parametrize('points', [IDEAL_POINTS, POINTS])
+def test_monotonic(points):
+    table = build_table(points)
+    assert len(table) == 128
+    assert all(table[i] <= table[i + 1] for i in range(127))
+
+
+def test_error_within_half_code():
+    table = build_table(POINTS)
+    worst, count = table_error(POINTS, table)
+    mv_per_code = (POINTS[3] - POINTS[1]) / (POINTS[2] - POINTS[0])
+    # 范围内误差不超过半个码（1 mV = 1.2 音分）
+    assert worst <= 0.5 * mv_per_code * 1.2 + 1e-9
+    assert count > 40
+
+
+def test_pack_roundtrip():
+    tables = PitchTables(4)
+    tables.set_points(2, *POINTS)
+    other = PitchTables(4)
+    other.unpack(bytes(tables.pack()))
+    assert other.points == tables.points
+    assert other.tables[2] == tables.tables[2]
+    assert other.tables[0] == tables.tables[0]
+
+
+def test_unpack_rejects_bad_crc():
+    tables = PitchTables(4)
+    tables.set_points(2, *POINTS)
+    data = tables.pack()
+    data[-1] ^= 1
+    other = PitchTables(4)
+    before = [list(table) for table in other.tables]
+    with pytest.raises(ValueError):
+        other.unpack(bytes(data))
+    # 损坏的文件不改变现有值
+    assert [list(table) for table in other.tables] == before
+
+
+def test_unpack_rejects_channel_mismatch():
+    with pytest.raises(ValueError):
+        PitchTables(6).unpack(bytes(PitchTables(4).pack()))
@@ -0,0 +1,129 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from voiceallocator import VoiceAllocator, ROUND_ROBIN, LOWEST_FREE, LAST_NOTE, UNISON, NONE, MAX_VOICES
+
+
+def playing(alloc):
+    """声部 -> 音符，空闲声部为 None"""
+    return [None if note == NONE else note for note in alloc.note]
+
+
+@pytest.mark.parametrize('voices, policy', [(0, LOWEST_FREE), (MAX_VOICES + 1, LOWEST_FREE), (4, UNISON + 1)])
+def test_invalid_arguments(voices, policy):
+    with pytest.raises(ValueError):
+        VoiceAllocator(voices, policy)
+
+
+def test_round_robin():
+    alloc = VoiceAllocator(4, ROUND_ROBIN)
+    assert [alloc.note_on(n) for n in (60, 61, 62)] == [0, 1, 2]
+    assert alloc.note_off(60) == 0
+    # 最早释放的声部最后再用，先用还没用过的声部 3
+    assert alloc.note_on(63) == 3
+    assert alloc.note_on(64) == 0
+    # 全部占满后抢占最早开始的音符，被抢占的音符不恢复
+    assert alloc.note_on(65) == 1
+    assert alloc.stolen == 1
+    assert alloc.note_off(61) == NONE
+    assert alloc.note_off(62) == 2
+    assert alloc.note[2] == NONE
+    assert playing(alloc) == [64, 65, None, 63]
+
+
+def test_lowest_free():
+    alloc = VoiceAllocator(3, LOWEST_FREE)
+    assert [alloc.note_on(n) for n in (60, 61, 62)] == [0, 1, 2]
+    assert alloc.note_off(61) == 1
+    assert alloc.note_off(60) == 0
+    # 编号最小的空闲声部先用
+    assert alloc.note_on(70) == 0
+    assert alloc.note_on(71) == 1
+    assert alloc.note_on(72) == 2
+    assert alloc.stolen == 1 and alloc.voice_of[62] == NONE
+    assert alloc.note_off(62) == NONE
+    assert playing(alloc) == [70, 71, 72]
+
+
+def test_retrigger_keeps_voice_and_becomes_newest():
+    alloc = VoiceAllocator(2, LOWEST_FREE)
+    alloc.note_on(60)
+    alloc.note_on(61)
+    # 同一音符再次按下沿用原声部，并成为最新的，下一次抢占的是 61
+    assert alloc.note_on(60) == 0
+    assert alloc.note_on(62) == 1
+    assert playing(alloc) == [60, 62]
+
+
+def test_last_note_resumes_stolen():
+    alloc = VoiceAllocator(2, LAST_NOTE)
+    alloc.note_on(60)
+    alloc.note_on(61)
+    assert alloc.note_on(62) == 0
+    assert alloc.note_on(63) == 1
+    assert alloc.waiting[60] and alloc.waiting[61]
+    # 释放时恢复等待栈顶（最近被抢占）的音符，门控保持打开
+    assert alloc.note_off(62) == 0
+    assert alloc.note[0] == 61
+    # 等待中的音符松开时只移出等待栈
+    assert alloc.note_off(60) == NONE
+    assert alloc.note_off(63) == 1
+    assert alloc.note[1] == NONE
+    assert alloc.note_off(61) == 0
+    assert playing(alloc) == [None, None]
+    assert alloc.playing == 0 and alloc.top == NONE
+
+
+def test_last_note_mono():
+    alloc = VoiceAllocator(1, LAST_NOTE)
+    for note in (60, 62, 64):
+        assert alloc.note_on(note) == 0
+    # 单音后按优先：松开最新的音符回到前一个仍按住的音符
+    alloc.note_off(64)
+    assert alloc.note[0] == 62
+    alloc.note_off(60)
+    alloc.note_off(62)
+    assert alloc.note[0] == NONE
+
+
+def test_waiting_note_pressed_again():
+    alloc = VoiceAllocator(1, LAST_NOTE)
+    alloc.note_on(60)
+    alloc.note_on(62)
+    # 等待中的音符再次按下时移出等待栈，重新抢占
+    assert alloc.note_on(60) == 0
+    assert not alloc.waiting[60] and alloc.waiting[62]
+    alloc.note_off(60)
+    assert alloc.note[0] == 62
+
+
+def test_unison():
+    alloc = VoiceAllocator(4, UNISON)
+    assert alloc.unison and alloc.count == 1
+    assert alloc.note_on(60) == 0
+    assert alloc.note_on(64) == 0
+    assert alloc.note_off(64) == 0
+    assert alloc.note[0] == 60
+    assert alloc.note_off(60) == 0
+    assert alloc.note[0] == NONE
+
+
+@pytest.mark.parametrize('policy', [ROUND_ROBIN, LOWEST_FREE, LAST_NOTE, UNISON])
+def test_release_all(policy):
+    alloc = VoiceAllocator(4, policy)
+    notes = list(range(60, 70))
+    for note in notes:
+        alloc.note_on(note)
+    for note in notes:
+        alloc.note_off(note)
+    assert playing(alloc) == [None] * alloc.count
+    assert alloc.playing == 0 and alloc.top == NONE
+    assert all(alloc.voice_of[note] == NONE and not alloc.waiting[note] for note in notes)
+    # 全部释放后每个声部都能再次分配
+    assert sorted(alloc.note_on(note) for note in range(alloc.count)) == list(range(alloc.count))
+    alloc.reset()
+    assert playing(alloc) == [None] * alloc.count
@@ -0,0 +1,197 @@
+import argparse
+import random
+import sys
+
+_path = __file__.replace('\\', '/')
+sys.path.insert(0, _path[:_path.rfind('/')] + '/..' if '/' in _path else '..')
+import midiclock
+from midiclock import ClockEngine, PPQN
+from midiparser import MidiParser, CLOCK, START, STOP
+
+# MIDI 时钟回放（上位机）
+# 用模拟的时间和定时器驱动 midiclock.ClockEngine：按给定的速度曲线生成理想的 MIDI 时钟，
+# 到达时刻加上串口排队（时钟前面夹着音符消息）和分发延迟的抖动，定时器回调也加上主线程的调度延迟，
+# 然后比较输出脉冲与理想时钟的偏差，和"收到时钟立即输出"的抖动对比。例如：
+#   python tools/clock_replay.py --bpm 120 --beats 64 --notes 0.3
+#   python tools/clock_replay.py --check
+# 模拟的时间从 ticks_us 回绕前开始，同时检查回绕处理。
+
+TICKS_MASK = (1 << 30) - 1
+NOTE_US = 960          # 31250 波特下一条 3 字节音符消息的传输时间
+
+
+class SimTimer:
+    """模拟的单次 machine.Timer，记录到期时刻"""
+    ONE_SHOT = 0
+    PERIODIC = 1
+
+    def __init__(self):
+        self.due = None
+        self.callback = None
+
+    def init(self, mode=ONE_SHOT, period=0, tick_hz=1000, callback=None):
+        self.due = sim.now + period * 1000000 // tick_hz
+        self.callback = callback
+
+    def deinit(self):
+        self.due = None
+
+
+class SimPin:
+    """记录上升沿时刻的输出引脚"""
+
+    def __init__(self):
+        self.level = 0
+        self.edges = []
+
+    def value(self, level):
+        if level and not self.level:
+            self.edges.append(sim.now)
+        self.level = level
+
+
+class Sim:
+    def __init__(self, start):
+        self.now = start
+
+    def ticks_us(self):
+        return self.now & TICKS_MASK
+
+
+sim = Sim(0)
+
+
+def ideal_clock(bpm, beats, ramp_to=None):
+    """理想的时钟时刻，ramp_to 给出时后半段线性变速"""
+    times = []
+    t = 0.0
+    count = beats * PPQN
+    for i in range(count):
+        times.append(t)
+        tempo = bpm
+        if ramp_to is not None and i >= count // 2:
+            tempo = bpm + (ramp_to - bpm) * (i - count // 2) / (count // 2)
+        t += 60000000.0 / (tempo * PPQN)
+    return times
+
+
+def replay(times, notes=0.3, dispatch_us=400, latency_us=300, divisions=(1, 6, 24), seed=1, start=TICKS_MASK - 2000000):
+    """
+    回放一段时钟
+
+    :param times: 理想时钟时刻，us
+    :param notes: 每个时钟前面夹着一条音符消息的概率（再以同样概率多一条）
+    :param dispatch_us: 分发延迟的最大值（均匀分布）
+    :param latency_us: 定时器回调调度延迟的最大值（均匀分布）
+    :return: (输出引脚列表, 复位引脚, 实际到达时刻列表, 时钟引擎, 理想时刻 0 对应的模拟时刻)
+    """
+    rng = random.Random(seed)
+    sim.now = start
+    midiclock.ticks_us = sim.ticks_us
+    outputs = [SimPin() for _ in divisions]
+    reset = SimPin()
+    timer = SimTimer()
+    engine = ClockEngine(outputs, list(divisions), reset, timer)
+    parser = MidiParser()
+    engine.attach(parser)
+    offset = start + 10000
+    arrivals = []
+    for t in times:
+        delay = 0
+        while delay < 2 * NOTE_US and rng.random() < notes:
+            delay += NOTE_US
+        arrivals.append(offset + int(t) + delay + rng.randrange(dispatch_us + 1))
+    # 时钟在音符后面排队，不会早于前一个时钟到达
+    for i in range(1, len(arrivals)):
+        if arrivals[i] <= arrivals[i - 1]:
+            arrivals[i] = arrivals[i - 1] + 1
+    # START，全部时钟，最后一个时钟后 1ms 的 STOP，再等所有脉冲结束
+    events = [(offset - 5000, START)] + [(t, CLOCK) for t in arrivals]
+    events += [(arrivals[-1] + 1000, STOP), (arrivals[-1] + 200000, None)]
+    for when, status in events:
+        # 先处理在这个消息到达之前到期的定时器回调
+        while timer.due is not None and timer.due + latency_us <= when:
+            due = timer.due
+            timer.due = None
+            sim.now = max(sim.now, due + rng.randrange(latency_us + 1))
+            timer.callback(timer)
+        if status is None:
+            break
+        sim.now = max(sim.now, when)
+        parser.feed(bytes((status,)))
+    return outputs, reset, arrivals, engine, offset
+
+
+def jitter(edges, times, offset, skip):
+    """
+    脉冲相对理想时钟的偏差
+
+    :return: (相位偏差的峰峰值 us, 间隔误差的最大值 us, 间隔误差的均方根 us, 平均延迟 us)
+    """
+    deviations = [edges[i] - offset - times[i] for i in range(skip, min(len(edges), len(times)))]
+    mean = sum(deviations) / len(deviations)
+    spread = max(deviations) - min(deviations)
+    intervals = [deviations[i] - deviations[i - 1] for i in range(1, len(deviations))]
+    worst = max(abs(e) for e in intervals)
+    rms = (sum(e * e for e in intervals) / len(intervals)) ** 0.5
+    return spread, worst, rms, mean
+
+
+def report(times, args, label):
+    outputs, reset, arrivals, engine, offset = replay(times, args.notes, args.dispatch_us, args.latency_us,
+                                                     seed=args.seed)
+    skip = args.skip
+    clock = outputs[0].edges
+    expected = len(times)
+    print("%s: %d clocks, %.2f BPM estimated, resyncs %d, max timer lateness %d us" % (
+        label, expected, engine.bpm(), engine.resyncs, engine.max_late))
+    print("  pulses: clock %d, /6 %d, /24 %d, reset %d" % (
+        len(clock), len(outputs[1].edges), len(outputs[2].edges), len(reset.edges)))
+    naive = jitter(arrivals, times, offset, skip)
+    output = jitter(clock, times, offset, skip)
+    print("  on arrival:  phase p-p %5d us, interval max %5d us, rms %6.1f us" % naive[:3])
+    print("  clock engine: phase p-p %5d us, interval max %5d us, rms %6.1f us, mean delay %.0f us" % output)
+    return outputs, reset, naive, output
+
+
+def check():
+    """时钟引擎的回放自检，失败时抛出 AssertionError"""
+    args = argparse.Namespace(notes=0.3, dispatch_us=400, latency_us=300, seed=1, skip=48)
+    for label, times in (("steady 120 BPM", ideal_clock(120, 64)),
+                         ("ramp 120 -> 140 BPM", ideal_clock(120, 64, 140))):
+        outputs, reset, naive, output = report(times, args, label)
+        count = len(times)
+        # 输出脉冲数与收到的时钟数一致，分频从第一个时钟开始
+        assert len(outputs[0].edges) == count, len(outputs[0].edges)
+        assert len(outputs[1].edges) == (count + 5) // 6
+        assert len(outputs[2].edges) == (count + 23) // 24
+        assert len(reset.edges) == 1
+        # 间隔抖动明显小于收到即输出
+        assert output[1] < naive[1] / 2 and output[2] < naive[2] / 3, (naive, output)
+    # 没有输入抖动和调度延迟时输出与时钟对齐（周期取整到 1/16 us，锁定后相位误差只有几 us）
+    args = argparse.Namespace(notes=0, dispatch_us=0, latency_us=0, seed=1, skip=48)
+    outputs, reset, naive, output = report(ideal_clock(120, 16), args, "no jitter")
+    assert output[1] <= 2 and abs(output[3]) <= 10, output
+    print("clock replay check passed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="midi2cv MIDI 时钟回放与抖动测量")
+    parser.add_argument('--bpm', type=float, default=120)
+    parser.add_argument('--ramp-to', type=float, help="后半段线性变速到此速度")
+    parser.add_argument('--beats', type=int, default=64)
+    parser.add_argument('--notes', type=float, default=0.3, help="时钟前面夹着音符消息的概率")
+    parser.add_argument('--dispatch-us', type=int, default=400, help="分发延迟最大值")
+    parser.add_argument('--latency-us', type=int, default=300, help="定时器回调调度延迟最大值")
+    parser.add_argument('--skip', type=int, default=48, help="锁定前不计入统计的时钟数")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--check', action='store_true', help="运行自检")
+    args = parser.parse_args()
+    if args.check:
+        check()
+        return
+    report(ideal_clock(args.bpm, args.beats, args.ramp_to), args, "%g BPM" % args.bpm)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import gc
+import time
+
+# 启动时编译源码的开销
+# 模块以 .py 源码放在 Flash 上时，每次上电导入都要读文件、编译，并在堆上保存字节码；
+# 冻结进固件（manifest.py）后这几项都不再发生。本脚本逐个编译 manifest.py 中冻结的模块，
+# 打印读文件与编译的耗时和字节码占用的堆，合计即冻结前启动时多花的时间。
+# 可以在控制器上运行（源码在 Flash 根目录，冻结之前）：
+#   mpremote run tools/compile_cost.py
+# 也可以在电脑上用 MicroPython unix 版运行：
+#   micropython tools/compile_cost.py
+# 冻结之后的实际启动时间见 boot.py 打印的 "ready ... ms after reset" 与 "first note ... ms after reset"。
+
+MODULES = (
+    "app.py",
+    "board.py",
+    "mcp4728.py",
+    "midi_handler.py",
+    "midiclock.py",
+    "midiinput.py",
+    "midiparser.py",
+    "modulation.py",
+    "pitchtable.py",
+    "voiceallocator.py",
+)
+
+try:
+    ticks_us = time.ticks_us
+    ticks_diff = time.ticks_diff
+except AttributeError:
+    # CPython 上只用于检查脚本本身，耗时没有参考意义
+    ticks_us = lambda: int(time.perf_counter() * 1000000)
+    ticks_diff = lambda a, b: a - b
+
+
+def source_dir():
+    try:
+        path = __file__.replace('\\', '/')
+    except NameError:
+        # mpremote run 时没有 __file__，源码在控制器的当前目录
+        return ''
+    path = path[:path.rfind('/')] if '/' in path else '.'
+    return path + '/../' if path else '../'
+
+
+def measure(path):
+    """
+    :return: (源码字节数, 读文件 us, 编译 us, 字节码占用的堆字节数)
+    """
+    gc.collect()
+    before = gc.mem_alloc() if hasattr(gc, 'mem_alloc') else 0
+    start = ticks_us()
+    with open(path) as f:
+        source = f.read()
+    read = ticks_diff(ticks_us(), start)
+    start = ticks_us()
+    code = compile(source, path, 'exec')
+    elapsed = ticks_diff(ticks_us(), start)
+    size = len(source)
+    del source
+    gc.collect()
+    heap = (gc.mem_alloc() - before) if hasattr(gc, 'mem_alloc') else 0
+    del code
+    return size, read, elapsed, heap
+
+
+def main():
+    directory = source_dir()
+    total = [0, 0, 0, 0]
+    print("%-20s %8s %8s %10s %8s" % ("module", "bytes", "read us", "compile us", "heap"))
+    for name in MODULES:
+        try:
+            result = measure(directory + name)
+        except OSError:
+            print("%-20s missing" % name)
+            continue
+        print("%-20s %8d %8d %10d %8d" % ((name,) + result))
+        for i in range(4):
+            total[i] += result[i]
+    print("%-20s %8d %8d %10d %8d" % ("total", total[0], total[1], total[2], total[3]))
+    print("boot time saved by freezing: about %d ms" % ((total[1] + total[2]) // 1000))
+
+
+main()
@@ -0,0 +1,247 @@
+import sys
+import time
+
+_path = __file__.replace('\\', '/')
+sys.path.insert(0, _path[:_path.rfind('/')] + '/..' if '/' in _path else '..')
+from midiparser import MidiParser, NOTE_ON, NOTE_OFF, CONTROL_CHANGE, PITCH_BEND, PROGRAM_CHANGE, CLOCK
+
+# MIDI 解析基准测试（上位机）
+# 生成一段高密度的 MIDI 字节流：和弦音符（运行状态）、弯音扫动、CC、程序变换（2 字节消息）、
+# 夹在消息中间的 0xF8 时钟、偶尔的 SysEx，分别用原来 boot.py 的读取方式和 midiparser 解析，
+# 比较解析速度、正确解出的消息数和内存分配。
+# 可以在 CPython 上运行，也可以在 MicroPython unix 版上运行（此时用 gc.mem_alloc 统计分配字节数）：
+#   python tools/midi_bench.py --messages 20000
+#   micropython -X heapsize=32M tools/midi_bench.py
+
+CHUNK = 32   # 模拟串口每次到达的字节数
+
+
+class Lcg:
+    """确定性的伪随机数，两种解释器上生成相同的字节流"""
+
+    def __init__(self, seed=1):
+        self.state = seed
+
+    def next(self, n):
+        self.state = (self.state * 1103515245 + 12345) & 0x7FFFFFFF
+        return (self.state >> 8) % n
+
+
+def make_stream(count, clock_every=6, sysex_every=500, running_status=True, seed=1):
+    """
+    生成测试字节流
+
+    :param count: 通道消息条数
+    :param clock_every: 平均每多少个字节插入一个 0xF8 时钟，0 表示不插入
+    :param sysex_every: 每多少条消息插入一段 SysEx，0 表示不插入
+    :param running_status: 是否使用运行状态和 2 字节消息；False 时全部为 3 字节消息，原解析方式也能正确处理
+    :return: (字节流, 期望解出的通道消息列表 [(status, data1, data2)])
+    """
+    rng = Lcg(seed)
+    out = bytearray()
+    expected = []
+    running = 0
+    held = []
+    for i in range(count):
+        kind = rng.next(10)
+        channel = rng.next(2)
+        if kind < 6:
+            if held and (len(held) >= 6 or rng.next(2)):
+                note = held.pop(0)
+                if rng.next(2):
+                    # note on 力度 0 表示 note off
+                    message = (NOTE_ON | channel, note, 0)
+                else:
+                    message = (NOTE_OFF | channel, note, 64)
+            else:
+                note = 36 + rng.next(48)
+                held.append(note)
+                message = (NOTE_ON | channel, note, 1 + rng.next(127))
+        elif kind < 8:
+            message = (PITCH_BEND | channel, rng.next(128), rng.next(128))
+        elif kind < 9:
+            message = (CONTROL_CHANGE | channel, 1, rng.next(128))
+        elif running_status:
+            message = (PROGRAM_CHANGE | channel, rng.next(128), 0)
+        else:
+            message = (CONTROL_CHANGE | channel, 7, rng.next(128))
+        expected.append(message)
+        status, data1, data2 = message
+        parts = [data1] if status & 0xF0 == PROGRAM_CHANGE else [data1, data2]
+        if status != running or not running_status:
+            parts.insert(0, status)
+            running = status
+        for byte in parts:
+            if clock_every and rng.next(clock_every) == 0:
+                out.append(CLOCK)
+            out.append(byte)
+        if sysex_every and i % sysex_every == sysex_every - 1:
+            out.extend(b'\xf0\x7e\x7f\x06\x01\xf7')
+            running = 0
+    return bytes(out), expected
+
+
+class LegacyMessage:
+    """原 midi_handler.MidiMessage 的校验部分"""
+
+    def __init__(self, status, data1=0, data2=0):
+        self.status = int(status)
+        self.data1 = int(data1)
+        self.data2 = int(data2)
+        if not (0x80 <= self.status <= 0xEF):
+            raise ValueError("Invalid MIDI status byte")
+        if not (0 <= self.data1 <= 127) or not (0 <= self.data2 <= 127):
+            raise ValueError("Data values must be in the range 0-127")
+
+
+def split(stream):
+    """按串口每次到达的字节数切分，切分不计入测量"""
+    return [stream[start:start + CHUNK] for start in range(0, len(stream), CHUNK)]
+
+
+def run_legacy(chunks, out):
+    """按原 boot.py 的方式解析：每次读 3 字节，切片后构造消息对象，出错时清空串口中剩余的数据"""
+    buffer = bytearray()
+    errors = 0
+    for fifo in chunks:
+        while fifo:
+            data = fifo[:3]
+            fifo = fifo[3:]
+            buffer.extend(data)
+            while len(buffer) >= 3:
+                midi_message = buffer[:3]
+                try:
+                    data = list(midi_message)
+                    message = LegacyMessage(data[0], data[1], data[2])
+                    if out is not None:
+                        out.append((message.status, message.data1, message.data2))
+                except Exception:
+                    errors += 1
+                    fifo = b''
+                buffer = buffer[3:]
+    return errors
+
+
+def run_parser(chunks, out):
+    """用 midiparser 解析，每块数据相当于一次 readinto 读到的内容"""
+    parser = MidiParser(CHUNK)
+    Recorder(out).attach(parser)
+    for chunk in chunks:
+        parser.feed(chunk, len(chunk))
+    return parser.stray
+
+
+class Recorder:
+    """记录解出的通道消息；out 为 None 时只计数，用于测量分配"""
+
+    def __init__(self, out):
+        self.out = out
+        self.count = 0
+        self.clocks = 0
+
+    def attach(self, parser):
+        for command in (NOTE_OFF, NOTE_ON, CONTROL_CHANGE, PROGRAM_CHANGE, PITCH_BEND):
+            parser.on(command, self.make_handler(command))
+        parser.on_realtime(CLOCK, self.on_clock)
+
+    def make_handler(self, command):
+        def handler(channel, data1, data2):
+            self.count += 1
+            if self.out is not None:
+                self.out.append((command | channel, data1, data2))
+        return handler
+
+    def on_clock(self):
+        self.clocks += 1
+
+
+def normalize(messages):
+    """note on 力度 0 视为 note off，便于两种解析结果与期望值比较"""
+    return [(NOTE_OFF | (s & 0x0F), d1, 0) if s & 0xF0 == NOTE_ON and d2 == 0 or s & 0xF0 == NOTE_OFF else (s, d1, d2)
+            for s, d1, d2 in messages]
+
+
+def count_matched(decoded, expected):
+    """按顺序与期望的消息逐条对齐，统计正确解出的条数"""
+    matched = 0
+    j = 0
+    for message in decoded:
+        k = j
+        while k < len(expected) and k < j + 8 and expected[k] != message:
+            k += 1
+        if k < len(expected) and expected[k] == message:
+            matched += 1
+            j = k + 1
+    return matched
+
+
+def ticks():
+    if hasattr(time, 'ticks_us'):
+        return time.ticks_us() / 1e6
+    return time.perf_counter()
+
+
+def allocated(func, chunks):
+    """func 运行期间分配的字节数（MicroPython）或峰值内存（CPython）"""
+    try:
+        import gc
+        gc.collect()
+        gc.disable()
+        before = gc.mem_alloc()
+        try:
+            func(chunks, None)
+            used = gc.mem_alloc() - before
+        except MemoryError:
+            used = -1
+        gc.enable()
+        return used, "allocated"
+    except AttributeError:
+        import tracemalloc
+        tracemalloc.start()
+        func(chunks, None)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak, "peak"
+
+
+def bench(name, func, chunks, expected, repeat):
+    size = sum(len(chunk) for chunk in chunks)
+    out = []
+    errors = func(chunks, out)
+    matched = count_matched(normalize(out), expected)
+    start = ticks()
+    for _ in range(repeat):
+        func(chunks, None)
+    elapsed = (ticks() - start) / repeat
+    mem, kind = allocated(func, chunks)
+    print("%-8s %8.1f ms %8.0f kB/s %6.2f us/msg  decoded %6d  matched %6d/%d  errors %5d  %s %d B" % (
+        name, elapsed * 1e3, size / elapsed / 1e3, elapsed * 1e6 / len(expected),
+        len(out), matched, len(expected), errors, kind, mem))
+
+
+def main():
+    messages = 5000
+    repeat = 3
+    try:
+        import argparse
+        parser = argparse.ArgumentParser(description="midi2cv MIDI 解析基准测试")
+        parser.add_argument('--messages', type=int, default=20000, help="通道消息条数")
+        parser.add_argument('--repeat', type=int, default=5, help="计时重复次数")
+        parser.add_argument('--clock-every', type=int, default=6, help="平均每多少字节插入一个时钟，0 表示不插入")
+        args = parser.parse_args()
+        messages, repeat, clock_every = args.messages, args.repeat, args.clock_every
+    except ImportError:
+        clock_every = 6
+    for title, (stream, expected) in (
+            ("plain 3-byte messages", make_stream(messages, 0, 0, False)),
+            ("dense: running status, clock, sysex", make_stream(messages, clock_every))):
+        expected = normalize(expected)
+        print("%s: %d bytes, %d channel messages, 31250 baud = %.1f s of MIDI" % (
+            title, len(stream), len(expected), len(stream) * 10 / 31250))
+        chunks = split(stream)
+        bench("legacy", run_legacy, chunks, expected, repeat)
+        bench("parser", run_parser, chunks, expected, repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import argparse
+import sys
+
+_path = __file__.replace('\\', '/')
+sys.path.insert(0, _path[:_path.rfind('/')] + '/..' if '/' in _path else '..')
+from pitchtable import PitchTables, note_millivolts, BASE_NOTE, DAC_MAX
+
+# 音高表生成与检查（上位机）
+# 由各通道的实测标定点生成 pitch.bin（上传到控制器根目录即可，与控制器上 calibrate() 保存的格式相同），
+# 或读取已有的 pitch.bin 打印音高表和误差。例如：
+#   python tools/pitch_tables.py --channels 4 --point 0 500 498.7 3500 3512.2 --out pitch.bin
+#   python tools/pitch_tables.py --channels 4 --load pitch.bin --print
+# 自检见 tests/test_pitchtable.py：python -m pytest -q tests
+
+
+def table_error(points, table, base_note=BASE_NOTE):
+    """
+    按标定直线换算每个音符实际输出的电压与目标电压之差
+
+    :return: (DAC 范围内的最大误差（音分）, 范围内的音符数)
+    """
+    code1, mv1, code2, mv2 = points
+    mv_per_code = (mv2 - mv1) / (code2 - code1)
+    worst = 0.0
+    count = 0
+    for note in range(128):
+        code = table[note]
+        if code in (0, DAC_MAX):
+            continue
+        actual = mv1 + (code - code1) * mv_per_code
+        cents = abs(actual - note_millivolts(note, base_note)) * 1.2
+        worst = max(worst, cents)
+        count += 1
+    return worst, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="midi2cv 1V/oct 音高表生成与检查")
+    parser.add_argument('--channels', type=int, default=4, help="音高通道数，C3 版 4，S3 版 6")
+    parser.add_argument('--base-note', type=int, default=BASE_NOTE, help="输出 0V 的音符")
+    parser.add_argument('--point', nargs=5, action='append', default=[], metavar=('CH', 'CODE1', 'MV1', 'CODE2', 'MV2'),
+                        help="一个通道的两点标定：输出码与实测电压（mV），可重复")
+    parser.add_argument('--load', help="读取已有的标定文件")
+    parser.add_argument('--out', help="写出标定文件")
+    parser.add_argument('--print', action='store_true', help="打印各通道的音高表")
+    args = parser.parse_args()
+
+    tables = PitchTables(args.channels, args.base_note)
+    if args.load:
+        with open(args.load, 'rb') as f:
+            tables.unpack(f.read())
+    for channel, code1, mv1, code2, mv2 in args.point:
+        tables.set_points(int(channel), int(code1), float(mv1), int(code2), float(mv2))
+    for channel, (points, table) in enumerate(zip(tables.points, tables.tables)):
+        worst, count = table_error(points, table, tables.base_note)
+        print("channel %d: points %s, %d notes in range, max error %.2f cents" % (channel, points, count, worst))
+        if args.print:
+            for octave in range(0, 128, 12):
+                print("  %3d: %s" % (octave, ' '.join('%4d' % code for code in table[octave:octave + 12])))
+    if args.out:
+        with open(args.out, 'wb') as f:
+            f.write(tables.pack())
+        print("written", args.out)
+
+
+if __name__ == "__main__":
+    main()
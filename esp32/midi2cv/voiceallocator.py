@@ -0,0 +1,199 @@
+# 复音分配
+# 把 note on/off 分配到固定数量的声部（音高 CV + 门控），所有状态保存在预分配的 bytearray 中，
+# 每次 note on/off 的查找、分配、抢占都是 O(1)：
+#   * 音符 -> 声部、声部 -> 音符两张表，note off 不再遍历声部
+#   * 空闲声部：轮流方式用环形队列（最早释放的先用），其余方式用位图加最低位查表
+#   * 发声中的声部按开始时间串成双向链表，声部不够时抢占最早的一个
+#   * 后按优先和齐奏方式下被抢占的音符压入等待栈（双向链表，按住期间松开也是 O(1) 移除），
+#     有声部释放时立即恢复栈顶的音符，门控保持打开（legato）
+# 分配方式：
+#   ROUND_ROBIN  轮流使用各声部，适合包络在 note off 后仍有释音的音源
+#   LOWEST_FREE  使用编号最小的空闲声部（原来的行为）
+#   LAST_NOTE    同 LOWEST_FREE，但被抢占的音符在有声部空出时恢复；1 个声部即单音后按优先
+#   UNISON       所有输出声部演奏同一个音符，后按优先
+# 调用方根据 note_on/note_off 的返回值更新音高、力度和门控，见 midi_handler.py。
+
+ROUND_ROBIN = 0
+LOWEST_FREE = 1
+LAST_NOTE = 2
+UNISON = 3
+
+NONE = 0xFF          # 空闲声部 / 没有分配声部的音符
+MAX_VOICES = 8       # 空闲位图按一个字节查表
+
+# 字节中最低的置位位的序号
+_LOWEST_BIT = bytearray(256)
+for _mask in range(1, 256):
+    _bit = 0
+    while not (_mask >> _bit) & 1:
+        _bit += 1
+    _LOWEST_BIT[_mask] = _bit
+
+
+class VoiceAllocator:
+    """
+    :param voices: 输出声部数，由音高 DAC 通道数和门控数决定
+    :param policy: ROUND_ROBIN、LOWEST_FREE、LAST_NOTE 或 UNISON
+    """
+
+    def __init__(self, voices, policy=LOWEST_FREE):
+        if not 0 < voices <= MAX_VOICES:
+            raise ValueError("voices must be 1-%d" % MAX_VOICES)
+        if not ROUND_ROBIN <= policy <= UNISON:
+            raise ValueError("unknown voice policy")
+        self.voices = voices
+        self.policy = policy
+        self.unison = policy == UNISON
+        # 齐奏时只有一个逻辑声部，由调用方写到全部输出
+        self.count = 1 if self.unison else voices
+        count = self.count
+        self.note = bytearray(count)        # 声部 -> 音符，NONE 为空闲
+        self.voice_of = bytearray(128)      # 音符 -> 声部，NONE 为没有发声
+        self.older = bytearray(count)       # 发声中声部的链表，按开始时间
+        self.newer = bytearray(count)
+        self.ring = bytearray(count)        # 轮流方式的空闲声部队列
+        self.below = bytearray(128)         # 等待栈，按音符索引的双向链表
+        self.above = bytearray(128)
+        self.waiting = bytearray(128)       # 音符是否在等待栈中
+        self.stolen = 0                     # 被抢占的次数
+        self.reset()
+
+    def reset(self):
+        """释放全部声部，清空等待栈"""
+        count = self.count
+        for i in range(count):
+            self.note[i] = NONE
+            self.ring[i] = i
+        for i in range(128):
+            self.voice_of[i] = NONE
+            self.waiting[i] = 0
+        self.free_head = 0
+        self.free_count = count
+        self.free_mask = (1 << count) - 1
+        self.oldest = NONE
+        self.newest = NONE
+        self.top = NONE
+        self.playing = 0                    # 发声中的声部数
+
+    # 空闲声部
+
+    def _take(self):
+        if self.policy == ROUND_ROBIN:
+            if not self.free_count:
+                return NONE
+            voice = self.ring[self.free_head]
+            self.free_head = (self.free_head + 1) % self.count
+            self.free_count -= 1
+            return voice
+        mask = self.free_mask
+        if not mask:
+            return NONE
+        self.free_mask = mask & (mask - 1)
+        return _LOWEST_BIT[mask]
+
+    def _give(self, voice):
+        if self.policy == ROUND_ROBIN:
+            self.ring[(self.free_head + self.free_count) % self.count] = voice
+            self.free_count += 1
+        else:
+            self.free_mask |= 1 << voice
+
+    # 发声中的声部，按开始时间
+
+    def _link(self, voice):
+        self.older[voice] = self.newest
+        self.newer[voice] = NONE
+        if self.newest == NONE:
+            self.oldest = voice
+        else:
+            self.newer[self.newest] = voice
+        self.newest = voice
+        self.playing += 1
+
+    def _unlink(self, voice):
+        older = self.older[voice]
+        newer = self.newer[voice]
+        if older == NONE:
+            self.oldest = newer
+        else:
+            self.newer[older] = newer
+        if newer == NONE:
+            self.newest = older
+        else:
+            self.older[newer] = older
+        self.playing -= 1
+
+    # 等待栈
+
+    def _push(self, note):
+        self.below[note] = self.top
+        self.above[note] = NONE
+        if self.top != NONE:
+            self.above[self.top] = note
+        self.top = note
+        self.waiting[note] = 1
+
+    def _remove(self, note):
+        below = self.below[note]
+        above = self.above[note]
+        if below != NONE:
+            self.above[below] = above
+        if above == NONE:
+            self.top = below
+        else:
+            self.below[above] = below
+        self.waiting[note] = 0
+
+    def note_on(self, note):
+        """
+        为音符分配声部，没有空闲声部时抢占最早开始的声部
+
+        :return: 声部序号；音符已在发声时返回它原来的声部
+        """
+        voice = self.voice_of[note]
+        if voice != NONE:
+            # 同一音符再次按下：沿用原来的声部，视为最新
+            self._unlink(voice)
+            self._link(voice)
+            return voice
+        if self.waiting[note]:
+            self._remove(note)
+        voice = self._take()
+        if voice == NONE:
+            voice = self.oldest
+            self._unlink(voice)
+            old = self.note[voice]
+            self.voice_of[old] = NONE
+            if self.policy >= LAST_NOTE:
+                self._push(old)
+            self.stolen += 1
+        self.note[voice] = note
+        self.voice_of[note] = voice
+        self._link(voice)
+        return voice
+
+    def note_off(self, note):
+        """
+        释放音符
+
+        :return: 释放的声部序号，音符没有在发声（未按下、已被抢占或重复的 note off）时返回 NONE。
+                 返回后 self.note[声部] 为 NONE 表示关门控，否则为该声部恢复演奏的等待音符
+        """
+        if self.waiting[note]:
+            self._remove(note)
+            return NONE
+        voice = self.voice_of[note]
+        if voice == NONE:
+            return NONE
+        self.voice_of[note] = NONE
+        self._unlink(voice)
+        resumed = self.top
+        if resumed != NONE:
+            self._remove(resumed)
+            self.note[voice] = resumed
+            self.voice_of[resumed] = voice
+            self._link(voice)
+        else:
+            self.note[voice] = NONE
+            self._give(voice)
+        return voice